@@ -1,17 +1,21 @@
 """ContractManager knows binaries and ABI of contracts."""
 import enum
 import json
+import math
+import re
 from copy import deepcopy
 from json import JSONDecodeError
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TypedDict, cast
 
 from eth_typing import HexStr
 from eth_typing.evm import ChecksumAddress
+from eth_utils import encode_hex, keccak
 from web3.types import ABI, ABIEvent
 
 from raiden_contracts.constants import ID_TO_CHAINNAME, DeploymentModule
 from raiden_contracts.utils.file_ops import load_json_from_path
+from raiden_contracts.utils.profiling import phase
 from raiden_contracts.utils.type_aliases import ChainID
 from raiden_contracts.utils.versions import contracts_version_provides_services
 
@@ -61,7 +65,7 @@ class ContractManager:
         path: path to a precompiled contract JSON file,
         """
         try:
-            with path.open() as precompiled_file:
+            with phase("load contracts"), path.open() as precompiled_file:
                 precompiled_content = json.load(precompiled_file)
         except (JSONDecodeError, UnicodeDecodeError) as ex:
             raise ContractManagerLoadError(f"Can't load precompiled smart contracts: {ex}") from ex
@@ -119,6 +123,16 @@ class ContractManager:
         """
         return "0x" + self.contracts[contract_name]["bin-runtime"]
 
+    def get_runtime_code_hash(self, contract_name: str) -> HexStr:
+        """The keccak of the runtime code, as in the codeHash of a deployed contract
+
+        contracts.json files compiled before the hash was stored get it computed.
+        """
+        compiled = cast(Dict[str, str], self.contracts[contract_name])
+        if "bin-runtime-hash" not in compiled:
+            compiled["bin-runtime-hash"] = encode_hex(keccak(hexstr=compiled["bin-runtime"]))
+        return HexStr(compiled["bin-runtime-hash"])
+
 
 def contracts_data_path(version: Optional[str] = None) -> Path:
     """Returns the deployment data directory for a version."""
@@ -146,6 +160,83 @@ def gas_measurements(version: Optional[str] = None) -> Dict[str, int]:
         return json.load(gas_file)
 
 
+# Measurements of one function for several numbers of items, e.g.
+# "TokenNetwork.unlock 6 locks" or "SecretRegistry.registerSecretBatch3"
+_BATCH_MEASUREMENT = re.compile(r"^(?P<function>[\w.]+?)(?: (?P<items>\d+) \w+|(?P<batch>\d+))$")
+
+
+class LinearGasCost(NamedTuple):
+    """Gas of a call handling `items` locks, IOUs or secrets: base + per_item * items"""
+
+    base: int
+    per_item: int
+
+    def gas(self, items: int) -> int:
+        return self.base + self.per_item * items
+
+    def max_items(self, gas_budget: int) -> int:
+        """The largest number of items a call with `gas_budget` can handle"""
+        if self.per_item <= 0:
+            raise ValueError("The number of items does not change the gas of this call")
+        return max((gas_budget - self.base) // self.per_item, 0)
+
+
+def fit_linear_gas_cost(points: List[Tuple[int, int]]) -> LinearGasCost:
+    """Least squares fit of the (items, gas) points
+
+    Both coefficients are rounded so that the cost of every measured point is
+    at least its measured gas.
+    """
+    items = [count for count, _ in points]
+    if len(set(items)) < 2:
+        raise ValueError(f"At least two different numbers of items are needed, got {items}")
+    mean_items = sum(items) / len(points)
+    mean_gas = sum(gas for _, gas in points) / len(points)
+    slope = sum((count - mean_items) * (gas - mean_gas) for count, gas in points) / sum(
+        (count - mean_items) ** 2 for count in items
+    )
+    per_item = math.ceil(slope)
+    base = max(gas - per_item * count for count, gas in points)
+    return LinearGasCost(base=base, per_item=per_item)
+
+
+class GasModel:
+    """Gas of the calls handling many items, fitted from the measurements in gas.json
+
+    Predicts the gas of e.g. ``TokenNetwork.unlock`` for any number of locks
+    and tells how many locks fit into a gas budget.
+    """
+
+    def __init__(self, measurements: Dict[str, int]) -> None:
+        points: Dict[str, List[Tuple[int, int]]] = {}
+        for name, gas in measurements.items():
+            match = _BATCH_MEASUREMENT.match(name)
+            if match:
+                count = int(match.group("items") or match.group("batch"))
+                points.setdefault(match.group("function"), []).append((count, gas))
+        self.costs: Dict[str, LinearGasCost] = {
+            function: fit_linear_gas_cost(function_points)
+            for function, function_points in points.items()
+            if len({count for count, _ in function_points}) > 1
+        }
+
+    @classmethod
+    def from_version(cls, version: Optional[str] = None) -> "GasModel":
+        return cls(gas_measurements(version))
+
+    def cost(self, function: str) -> LinearGasCost:
+        if function not in self.costs:
+            raise KeyError(f"No gas model for {function}, only for {sorted(self.costs)}")
+        return self.costs[function]
+
+    def gas(self, function: str, items: int) -> int:
+        """Gas of calling `function`, e.g. "OneToN.bulkClaim", with `items` items"""
+        return self.cost(function).gas(items)
+
+    def max_items(self, function: str, gas_budget: int) -> int:
+        return self.cost(function).max_items(gas_budget)
+
+
 class ContractDevEnvironment(enum.Enum):
     DEMO = "demo"
     UNSTABLE = "unstable"
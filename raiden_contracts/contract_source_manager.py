@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Dict, Optional, Tuple
 
 import solcx
+from eth_utils import encode_hex, keccak
 
 from raiden_contracts.constants import PRECOMPILED_DATA_FIELDS, DeploymentModule
 from raiden_contracts.contract_manager import ContractManager, contracts_data_path
@@ -70,6 +71,7 @@ class ContractSourceManager:
         finally:
             chdir(old_working_dir)
         check_runtime_codesize(ret)
+        add_runtime_code_hashes(ret)
         return ret
 
     def compile_contracts(self, target_path: Path) -> ContractManager:
@@ -178,6 +180,12 @@ def check_runtime_codesize(d: Dict) -> None:
             raise RuntimeError(f"{name}'s runtime code is too big ({runtime_code_len} bytes).")
 
 
+def add_runtime_code_hashes(d: Dict) -> None:
+    """Store the keccak of the runtime code, which is the codeHash of a deployed contract"""
+    for compilation in d.values():
+        compilation["bin-runtime-hash"] = encode_hex(keccak(hexstr=compilation["bin-runtime"]))
+
+
 def _verify_single_precompiled_checksum(
     checked_checksums: Dict[str, str], contract_name: str, expected_checksum: str
 ) -> None:
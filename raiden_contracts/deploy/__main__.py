@@ -6,27 +6,37 @@ import json
 import logging
 from logging import getLogger
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import click
 from click import BadParameter, Context, IntRange, Option, Parameter
 from eth_typing import URI
 from eth_typing.evm import ChecksumAddress, HexAddress
 from eth_utils import is_address, to_checksum_address
-from web3 import HTTPProvider, Web3
-from web3.middleware import geth_poa_middleware
 
 from raiden_contracts.constants import (
     CONTRACT_CUSTOM_TOKEN,
     CONTRACT_TOKEN_NETWORK_REGISTRY,
     DEPLOY_SETTLE_TIMEOUT,
 )
-from raiden_contracts.contract_manager import DeployedContracts, contracts_deployed_path
-from raiden_contracts.deploy.contract_deployer import ContractDeployer
+from raiden_contracts.deploy.contract_deployer import (
+    ContractDeployer,
+    TokenRegistration,
+    token_networks_from_receipts,
+)
 from raiden_contracts.deploy.contract_verifier import ContractVerifier
+from raiden_contracts.deploy.multichain import deploy_chains, load_manifest
+from raiden_contracts.deploy.offline import (
+    BundleSigner,
+    broadcast_bundle,
+    deployment_from_receipts,
+    load_bundle,
+)
 from raiden_contracts.utils.private_key import get_private_key
+from raiden_contracts.utils.profiling import profile_command
+from raiden_contracts.utils.rpc import connect
 from raiden_contracts.utils.signature import private_key_to_address
-from raiden_contracts.utils.type_aliases import ChainID
+from raiden_contracts.utils.type_aliases import PrivateKey
 from raiden_contracts.utils.versions import contracts_version_with_max_token_networks
 
 LOG = getLogger(__name__)
@@ -44,6 +54,28 @@ def validate_address(
         raise click.BadParameter("must be a valid ethereum address")
 
 
+def validate_token_registrations(
+    _: Context, _param: Union[Option, Parameter], values: Tuple[str, ...]
+) -> List[TokenRegistration]:
+    """Parse ADDRESS:CHANNEL_PARTICIPANT_DEPOSIT_LIMIT:TOKEN_NETWORK_DEPOSIT_LIMIT values"""
+    registrations = []
+    for value in values:
+        try:
+            address, participant_limit, network_limit = value.split(":")
+            registrations.append(
+                TokenRegistration(
+                    token_address=to_checksum_address(address),
+                    channel_participant_deposit_limit=int(participant_limit),
+                    token_network_deposit_limit=int(network_limit),
+                )
+            )
+        except ValueError:
+            raise click.BadParameter(
+                f"{value} is not of the form ADDRESS:PARTICIPANT_LIMIT:NETWORK_LIMIT"
+            )
+    return registrations
+
+
 def error_removed_option(message: str) -> Callable:
     """Takes a message and returns a callback that raises NoSuchOption
 
@@ -89,6 +121,122 @@ def common_options(func: Callable) -> Callable:
     return wrapper
 
 
+def offline_options(func: Callable) -> Callable:
+    """Options for signing the transactions of a command without a node"""
+
+    @click.option(
+        "--sign-only",
+        "bundle_file",
+        default=None,
+        type=click.Path(dir_okay=False),
+        callback=lambda ctx, param, value: Path(value) if value is not None else None,
+        help="Do not connect to a node. Sign the transactions and add them to this bundle "
+        "file, to be sent later with the broadcast command.",
+    )
+    @click.option("--chain-id", type=int, help="Chain ID for a new --sign-only bundle")
+    @click.option(
+        "--nonce", type=int, help="Nonce of the first transaction of a new --sign-only bundle"
+    )
+    @functools.wraps(func)
+    def wrapper(*args: List, **kwargs: Dict) -> Any:
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+class DeploySession:
+    """What the chained subcommands of one invocation share
+
+    The keystore is decrypted once, and subcommands with the same connection and
+    transaction parameters use the same ContractDeployer, with its web3
+    connection, ContractManager and nonce management. Deployed addresses are
+    passed on to the following subcommands with the same RPC provider, so that
+    an address is never used on another chain.
+    """
+
+    def __init__(self) -> None:
+        self.private_keys: Dict[Tuple[Path, Optional[Path]], PrivateKey] = {}
+        self.deployers: Dict[Tuple, ContractDeployer] = {}
+        self.deployed_contracts: Dict[URI, Dict[str, Any]] = {}
+
+    @staticmethod
+    def of(ctx: click.Context) -> "DeploySession":
+        # The meta dict is shared by all contexts of an invocation
+        return ctx.meta.setdefault("raiden_contracts.deploy.session", DeploySession())
+
+    def private_key(self, private_key: str, password_file: Optional[Path]) -> PrivateKey:
+        key = (Path(private_key).expanduser(), password_file)
+        if key not in self.private_keys:
+            private_key_string = get_private_key(key[0], password_file)
+            if not private_key_string:
+                raise RuntimeError("Could not access the private key.")
+            self.private_keys[key] = private_key_string
+        return self.private_keys[key]
+
+    def deployer(
+        self,
+        private_key: PrivateKey,
+        rpc_provider: URI,
+        wait: int,
+        gas_price: int,
+        gas_limit: int,
+        contracts_version: Optional[str],
+        journal_path: Optional[Path],
+    ) -> ContractDeployer:
+        key = (
+            private_key,
+            rpc_provider,
+            wait,
+            gas_price,
+            gas_limit,
+            contracts_version,
+            journal_path,
+        )
+        if key in self.deployers:
+            return self.deployers[key]
+
+        web3 = connect(rpc_provider)
+        print("Web3 provider is", web3.provider)
+        owner = private_key_to_address(private_key)
+        # pylint: disable=E1101
+        if web3.eth.get_balance(owner) == 0:
+            raise RuntimeError("Account with insufficient funds.")
+        self.deployers[key] = ContractDeployer(
+            web3=web3,
+            private_key=private_key,
+            gas_limit=gas_limit,
+            gas_price=gas_price,
+            wait=wait,
+            contracts_version=contracts_version,
+            journal_path=journal_path,
+        )
+        return self.deployers[key]
+
+
+def setup_signer(
+    ctx: click.Context,
+    private_key: str,
+    password_file: Optional[Path],
+    bundle_file: Path,
+    chain_id: Optional[int],
+    nonce: Optional[int],
+    gas_price: int,
+    gas_limit: int,
+    contracts_version: Optional[str] = None,
+) -> BundleSigner:
+    """Set up signing into a bundle file, instead of deploying through a node"""
+    private_key_string = DeploySession.of(ctx).private_key(private_key, password_file)
+    return BundleSigner(
+        private_key=private_key_string,
+        bundle_path=bundle_file,
+        gas_limit=gas_limit,
+        gas_price=gas_price,
+        chain_id=chain_id,
+        nonce=nonce,
+        contracts_version=contracts_version,
+    )
+
+
 # pylint: disable=R0913
 def setup_ctx(
     ctx: click.Context,
@@ -99,6 +247,7 @@ def setup_ctx(
     gas_price: int,
     gas_limit: int,
     contracts_version: Optional[str] = None,
+    journal_path: Optional[Path] = None,
 ) -> None:
     """Set up deployment context according to common options (shared among all
     subcommands).
@@ -108,35 +257,36 @@ def setup_ctx(
     logging.getLogger("web3").setLevel(logging.INFO)
     logging.getLogger("urllib3").setLevel(logging.INFO)
 
-    web3 = Web3(HTTPProvider(rpc_provider, request_kwargs={"timeout": 60}))
-    web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-    print("Web3 provider is", web3.provider)
-    private_key_string = get_private_key(Path(private_key).expanduser(), password_file)
-    if not private_key_string:
-        raise RuntimeError("Could not access the private key.")
-    owner = private_key_to_address(private_key_string)
-    # pylint: disable=E1101
-    if web3.eth.get_balance(owner) == 0:
-        raise RuntimeError("Account with insufficient funds.")
-    deployer = ContractDeployer(
-        web3=web3,
-        private_key=private_key_string,
-        gas_limit=gas_limit,
-        gas_price=gas_price,
+    session = DeploySession.of(ctx)
+    deployer = session.deployer(
+        private_key=session.private_key(private_key, password_file),
+        rpc_provider=rpc_provider,
         wait=wait,
+        gas_price=gas_price,
+        gas_limit=gas_limit,
         contracts_version=contracts_version,
+        journal_path=journal_path,
     )
     ctx.obj = {
         "deployer": deployer,
-        "deployed_contracts": {},
+        "deployed_contracts": session.deployed_contracts.setdefault(rpc_provider, {}),
         "token_type": "CustomToken",
         "wait": wait,
     }
 
 
 @click.group(chain=True)
-def main() -> int:
-    pass
+@click.option("--profile", is_flag=True, help="Print RPC and phase timings when done.")
+@click.option(
+    "--profile-json",
+    type=click.Path(dir_okay=False),
+    help="Write RPC and phase timings as JSON to this file.",
+    callback=lambda ctx, param, value: Path(value) if value is not None else None,
+)
+@click.pass_context
+def main(ctx: click.Context, profile: bool, profile_json: Optional[Path]) -> None:
+    if profile or profile_json:
+        profile_command(ctx, print_report=profile, json_path=profile_json)
 
 
 def check_version_dependent_parameters(
@@ -162,12 +312,21 @@ def check_version_dependent_parameters(
 
 @main.command()
 @common_options
+@offline_options
 @click.option("--save-info/--no-save-info", default=True, help="Save deployment info to a file.")
 @click.option(
     "--max-token-networks",
     help="The maximum number of tokens that can be registered.",
     type=int,
 )
+@click.option(
+    "--journal",
+    "journal_path",
+    type=click.Path(dir_okay=False),
+    callback=lambda ctx, param, value: Path(value) if value is not None else None,
+    help="Record the deployment in this file. If the same deployment was interrupted, "
+    "it is continued instead of starting again.",
+)
 @click.option(
     "--secret-registry-from-deployment-file",
     type=click.Path(exists=True),
@@ -195,12 +354,37 @@ def raiden(
     contracts_version: Optional[str],
     max_token_networks: Optional[int],
     secret_registry_from_deployment_file: Optional[str],
+    journal_path: Optional[Path],
+    bundle_file: Optional[Path],
+    chain_id: Optional[int],
+    nonce: Optional[int],
 ) -> None:
     check_version_dependent_parameters(contracts_version, max_token_networks)
     secret_registry_from_deployment_path: Optional[Path] = None
     if secret_registry_from_deployment_file:
         secret_registry_from_deployment_path = Path(secret_registry_from_deployment_file)
 
+    if bundle_file:
+        signer = setup_signer(
+            ctx=ctx,
+            private_key=private_key,
+            password_file=password_file,
+            bundle_file=bundle_file,
+            chain_id=chain_id,
+            nonce=nonce,
+            gas_price=gas_price,
+            gas_limit=gas_limit,
+            contracts_version=contracts_version,
+        )
+        future_addresses = signer.sign_raiden_contracts(
+            max_num_of_token_networks=max_token_networks,
+            reuse_secret_registry_from_deploy_file=secret_registry_from_deployment_path,
+            settle_timeout=settle_timeout,
+        )
+        signer.save()
+        print(json.dumps(future_addresses, indent=4))
+        return
+
     setup_ctx(
         ctx=ctx,
         private_key=private_key,
@@ -210,6 +394,7 @@ def raiden(
         gas_price=gas_price,
         gas_limit=gas_limit,
         contracts_version=contracts_version,
+        journal_path=journal_path,
     )
     deployer = ctx.obj["deployer"]
     deployed_contracts_info = deployer.deploy_raiden_contracts(
@@ -235,6 +420,7 @@ def raiden(
 
 @main.command()
 @common_options
+@offline_options
 @click.option(
     "--token-address",
     default="0x255Aa6DF07540Cb5d3d297f0D0D4D84cb52bc8e6",
@@ -303,6 +489,14 @@ def raiden(
     callback=validate_address,
     help="Address of TokenNetworkRegistry that MS contract looks at",
 )
+@click.option(
+    "--journal",
+    "journal_path",
+    type=click.Path(dir_okay=False),
+    callback=lambda ctx, param, value: Path(value) if value is not None else None,
+    help="Record the deployment in this file. If the same deployment was interrupted, "
+    "it is continued instead of starting again.",
+)
 @click.option(
     "--service-registry-from-deployment-file",
     type=click.Path(exists=True),
@@ -331,11 +525,45 @@ def services(
     service_registration_duration: int,
     token_network_registry_address: HexAddress,
     service_registry_from_deployment_file: Optional[str],
+    journal_path: Optional[Path],
+    bundle_file: Optional[Path],
+    chain_id: Optional[int],
+    nonce: Optional[int],
 ) -> None:
     service_registry_from_deployment_path: Optional[Path] = None
     if service_registry_from_deployment_file:
         service_registry_from_deployment_path = Path(service_registry_from_deployment_file)
 
+    if bundle_file:
+        signer = setup_signer(
+            ctx=ctx,
+            private_key=private_key,
+            password_file=password_file,
+            bundle_file=bundle_file,
+            chain_id=chain_id,
+            nonce=nonce,
+            gas_price=gas_price,
+            gas_limit=gas_limit,
+            contracts_version=contracts_version,
+        )
+        future_addresses = signer.sign_service_contracts(
+            token_address=token_address,
+            user_deposit_whole_balance_limit=user_deposit_whole_limit,
+            user_deposit_withdraw_timeout=user_deposit_withdraw_timeout,
+            service_registry_controller=service_registry_controller,
+            initial_service_deposit_price=initial_service_deposit_price,
+            service_deposit_bump_numerator=service_deposit_bump_numerator,
+            service_deposit_bump_denominator=service_deposit_bump_denominator,
+            decay_constant=service_deposit_decay_constant,
+            min_price=service_deposit_min_price,
+            registration_duration=service_registration_duration,
+            token_network_registry_address=token_network_registry_address,
+            reuse_service_registry_from_deploy_file=service_registry_from_deployment_path,
+        )
+        signer.save()
+        print(json.dumps(future_addresses, indent=4))
+        return
+
     setup_ctx(
         ctx=ctx,
         private_key=private_key,
@@ -345,6 +573,7 @@ def services(
         gas_price=gas_price,
         gas_limit=gas_limit,
         contracts_version=contracts_version,
+        journal_path=journal_path,
     )
     deployer: ContractDeployer = ctx.obj["deployer"]
 
@@ -390,6 +619,7 @@ def services(
 
 @main.command()
 @common_options
+@offline_options
 @click.option(
     "--token-supply",
     default=10000000,
@@ -412,7 +642,33 @@ def token(
     token_name: str,
     token_decimals: int,
     token_symbol: str,
+    bundle_file: Optional[Path],
+    chain_id: Optional[int],
+    nonce: Optional[int],
 ) -> None:
+    if bundle_file:
+        signer = setup_signer(
+            ctx=ctx,
+            private_key=private_key,
+            password_file=password_file,
+            bundle_file=bundle_file,
+            chain_id=chain_id,
+            nonce=nonce,
+            gas_price=gas_price,
+            gas_limit=gas_limit,
+            contracts_version=contracts_version,
+        )
+        future_addresses = signer.sign_token_contract(
+            token_supply * 10**token_decimals,
+            token_decimals,
+            token_name,
+            token_symbol,
+            token_type=CONTRACT_CUSTOM_TOKEN,
+        )
+        signer.save()
+        print(json.dumps(future_addresses, indent=4))
+        return
+
     setup_ctx(
         ctx=ctx,
         private_key=private_key,
@@ -438,6 +694,7 @@ def token(
 
 @main.command()
 @common_options
+@offline_options
 @click.option(
     "--token-address",
     default=None,
@@ -467,6 +724,14 @@ def token(
     type=int,
     help="Address of token network registry",
 )
+@click.option(
+    "--token",
+    "tokens",
+    multiple=True,
+    callback=validate_token_registrations,
+    help="Register ADDRESS:PARTICIPANT_LIMIT:NETWORK_LIMIT. Can be given many times to "
+    "register all tokens at once. Replaces --token-address and the deposit limit options.",
+)
 @click.pass_context
 def register(
     ctx: Context,
@@ -481,9 +746,47 @@ def register(
     token_network_registry_address: HexAddress,
     channel_participant_deposit_limit: int,
     token_network_deposit_limit: int,
+    tokens: List[TokenRegistration],
     registry_address: Optional[HexAddress],
+    bundle_file: Optional[Path],
+    chain_id: Optional[int],
+    nonce: Optional[int],
 ) -> None:
     assert registry_address is None  # No longer used option
+    if bundle_file:
+        if not token_network_registry_address:
+            raise RuntimeError(
+                "No TokenNetworkRegistry was specified. "
+                "Add --token-network-registry-address <address>."
+            )
+        if not tokens:
+            if not token_address:
+                raise RuntimeError("No token was specified. Add --token-address <address>.")
+            tokens = [
+                TokenRegistration(
+                    token_address=to_checksum_address(token_address),
+                    channel_participant_deposit_limit=channel_participant_deposit_limit,
+                    token_network_deposit_limit=token_network_deposit_limit,
+                )
+            ]
+        signer = setup_signer(
+            ctx=ctx,
+            private_key=private_key,
+            password_file=password_file,
+            bundle_file=bundle_file,
+            chain_id=chain_id,
+            nonce=nonce,
+            gas_price=gas_price,
+            gas_limit=gas_limit,
+            contracts_version=contracts_version,
+        )
+        signer.sign_token_network_registrations(
+            token_registry_address=to_checksum_address(token_network_registry_address),
+            registrations=tokens,
+        )
+        signer.save()
+        return
+
     setup_ctx(
         ctx=ctx,
         private_key=private_key,
@@ -510,8 +813,17 @@ def register(
             "Add --token-network-registry-address <address>."
         )
 
-    assert token_type in ctx.obj["deployed_contracts"]
     abi = deployer.contract_manager.get_contract_abi(CONTRACT_TOKEN_NETWORK_REGISTRY)
+    if tokens:
+        token_networks = deployer.register_token_networks(
+            token_registry_abi=abi,
+            token_registry_address=ctx.obj["deployed_contracts"][CONTRACT_TOKEN_NETWORK_REGISTRY],
+            registrations=tokens,
+        )
+        deployer.store_and_verify_token_networks(token_networks)
+        return
+
+    assert token_type in ctx.obj["deployed_contracts"]
     token_network = deployer.register_token_network(
         token_registry_abi=abi,
         token_registry_address=ctx.obj["deployed_contracts"][CONTRACT_TOKEN_NETWORK_REGISTRY],
@@ -519,22 +831,109 @@ def register(
         channel_participant_deposit_limit=channel_participant_deposit_limit,
         token_network_deposit_limit=token_network_deposit_limit,
     )
-    _add_token_network_deploy_info(token_network, deployer, contracts_version)
+    deployer.store_and_verify_token_networks([token_network])
 
 
-def _add_token_network_deploy_info(
-    token_network: Dict[str, Any], deployer: ContractDeployer, contracts_version: str
-) -> None:
-    """Add deploy info dict to the deploy_*.json file"""
-    deployment_file_path = contracts_deployed_path(
-        chain_id=ChainID(deployer.web3.eth.chain_id), version=contracts_version
+@main.command()
+@click.option(
+    "--rpc-provider",
+    default="http://127.0.0.1:8545",
+    help="Address of the Ethereum RPC provider",
+)
+@click.option(
+    "--bundle",
+    "bundle_file",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Bundle file written by deploy commands with --sign-only",
+)
+@click.option("--wait", default=300, help="Max tx wait time in s.")
+@click.option("--save-info/--no-save-info", default=True, help="Save deployment info to a file.")
+def broadcast(rpc_provider: URI, bundle_file: str, wait: int, save_info: bool) -> None:
+    """Send all transactions of a bundle and store the deployment info from the receipts"""
+    web3 = connect(rpc_provider)
+    print("Web3 provider is", web3.provider)
+    bundle = load_bundle(Path(bundle_file))
+    contracts_version = bundle["contracts_version"]
+    verifier = ContractVerifier(web3=web3, contracts_version=contracts_version)
+
+    receipts_of_sections = broadcast_bundle(web3, bundle, timeout=wait)
+    for section, receipts in zip(bundle["sections"], receipts_of_sections):
+        if section["command"] == "register":
+            token_network_registry = web3.eth.contract(
+                abi=verifier.contract_manager.get_contract_abi(CONTRACT_TOKEN_NETWORK_REGISTRY),
+                address=section["transactions"][0]["address"],
+            )
+            token_networks = token_networks_from_receipts(
+                token_network_registry=token_network_registry,
+                registrations=[TokenRegistration(*tx["args"]) for tx in section["transactions"]],
+                receipts=receipts,
+                controller=bundle["sender"],
+            )
+            if save_info:
+                verifier.store_and_verify_token_networks(token_networks)
+            print(json.dumps(token_networks, indent=4))
+            continue
+
+        deployed_contracts_info = deployment_from_receipts(section, receipts)
+        if save_info and section["command"] == "raiden":
+            verifier.store_and_verify_deployment_info_raiden(
+                deployed_contracts_info=deployed_contracts_info
+            )
+        elif save_info and section["command"] == "services":
+            verifier.store_and_verify_deployment_info_services(
+                deployed_contracts_info=deployed_contracts_info, **section["parameters"]
+            )
+        print(
+            json.dumps(
+                {
+                    contract_name: info["address"]
+                    for contract_name, info in deployed_contracts_info["contracts"].items()
+                },
+                indent=4,
+            )
+        )
+
+
+@main.command()
+@click.option("--private-key", required=True, help="Path to a private key store.")
+@click.option(
+    "--password-file",
+    help="Text file containing the password for the provided account",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    callback=lambda ctx, param, value: Path(value) if value is not None else None,
+)
+@click.option(
+    "--manifest",
+    "manifest_file",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON file with the chains, their RPC providers and what to deploy on them",
+)
+def multichain(private_key: str, password_file: Optional[Path], manifest_file: str) -> None:
+    """Deploy and verify the contracts on all chains of a manifest in parallel"""
+    logging.basicConfig(
+        level=logging.INFO, format="%(threadName)s %(levelname)s %(name)s: %(message)s"
     )
-    with deployment_file_path.open() as f:
-        deployed_contracts_info: DeployedContracts = json.load(f)
-    deployed_contracts_info.setdefault("token_networks", []).append(token_network)
-    deployer.store_and_verify_deployment_info_raiden(
-        deployed_contracts_info=deployed_contracts_info
+    logging.getLogger("web3").setLevel(logging.INFO)
+    logging.getLogger("urllib3").setLevel(logging.INFO)
+
+    manifest = load_manifest(Path(manifest_file))
+    private_key_string = get_private_key(Path(private_key).expanduser(), password_file)
+    if not private_key_string:
+        raise RuntimeError("Could not access the private key.")
+
+    results = deploy_chains(manifest, private_key_string)
+    failed = [label for label, result in results.items() if isinstance(result, Exception)]
+    print(
+        json.dumps(
+            {label: result for label, result in results.items() if label not in failed},
+            indent=4,
+        )
     )
+    if failed:
+        raise click.ClickException(f"Deployment failed on {', '.join(failed)}")
 
 
 @main.command()
@@ -549,8 +948,7 @@ def _add_token_network_deploy_info(
 )
 @click.pass_context
 def verify(_: Any, rpc_provider: URI, contracts_version: Optional[str]) -> None:
-    web3 = Web3(HTTPProvider(rpc_provider, request_kwargs={"timeout": 60}))
-    web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    web3 = connect(rpc_provider)
     print("Web3 provider is", web3.provider)
 
     verifier = ContractVerifier(web3=web3, contracts_version=contracts_version)
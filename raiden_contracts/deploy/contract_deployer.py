@@ -1,17 +1,17 @@
-import time
 from copy import deepcopy
 from logging import getLogger
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type, Union
 
 from eth_typing import ChecksumAddress, HexAddress
 from eth_utils import encode_hex, is_address, to_checksum_address
 from eth_utils.units import units
 from hexbytes import HexBytes
 from web3 import Web3
+from web3._utils.rpc_abi import RPC
 from web3.contract import Contract, ContractFunction
 from web3.middleware import construct_sign_and_send_raw_middleware
-from web3.types import ABI, TxParams, TxReceipt, Wei
+from web3.types import ABI, ABIEvent, Nonce, TxData, TxParams, TxReceipt, Wei
 
 from raiden_contracts.constants import (
     CONTRACT_MONITORING_SERVICE,
@@ -22,20 +22,26 @@ from raiden_contracts.constants import (
     CONTRACT_USER_DEPOSIT,
     CONTRACTS_VERSION,
     DEPLOY_SETTLE_TIMEOUT,
+    EVENT_TOKEN_NETWORK_CREATED,
     ID_TO_CHAINNAME,
-    DeploymentModule,
-)
-from raiden_contracts.contract_manager import (
-    CompiledContract,
-    DeployedContract,
-    DeployedContracts,
-    get_contracts_deployment_info,
 )
+from raiden_contracts.contract_manager import CompiledContract, DeployedContract, DeployedContracts
 from raiden_contracts.contract_source_manager import ContractSourceManager, contracts_source_path
 from raiden_contracts.deploy.contract_verifier import ContractVerifier
+from raiden_contracts.deploy.deployment_plan import (
+    CallStep,
+    Deployed,
+    DeploymentPlan,
+    DeployStep,
+    PlannedTransaction,
+    Step,
+)
+from raiden_contracts.deploy.journal import DeploymentJournal
 from raiden_contracts.utils.file_ops import load_json_from_path
+from raiden_contracts.utils.logs import get_event_decoder
+from raiden_contracts.utils.rpc import batch_request
 from raiden_contracts.utils.signature import private_key_to_address
-from raiden_contracts.utils.transaction import check_successful_tx
+from raiden_contracts.utils.transaction import TransactionPipeline
 from raiden_contracts.utils.type_aliases import ChainID, PrivateKey
 from raiden_contracts.utils.versions import (
     contracts_version_monitoring_service_takes_token_network_registry,
@@ -44,6 +50,26 @@ from raiden_contracts.utils.versions import (
 LOG = getLogger(__name__)
 
 
+class TokenRegistration(NamedTuple):
+    token_address: ChecksumAddress
+    channel_participant_deposit_limit: int
+    token_network_deposit_limit: int
+
+
+def is_arbitrum_chain(chain_id: ChainID) -> bool:
+    return "arbitrum" in ID_TO_CHAINNAME.get(chain_id, "")
+
+
+def chain_gas_limit(chain_id: ChainID, gas_limit: int) -> int:
+    """The gas limit for transactions on `chain_id`
+
+    Gas usage on Arbitrum is different than EVM gas usage, so the limit is increased there.
+    """
+    if is_arbitrum_chain(chain_id):
+        return 1_000_000_000
+    return gas_limit
+
+
 class ContractDeployer(ContractVerifier):
     def __init__(
         self,
@@ -53,10 +79,12 @@ class ContractDeployer(ContractVerifier):
         gas_price: int,
         wait: int = 10,
         contracts_version: Optional[str] = None,
+        journal_path: Optional[Path] = None,
     ):
         # pylint: disable=E1101
         super(ContractDeployer, self).__init__(web3=web3, contracts_version=contracts_version)
         self.wait = wait
+        self.journal = DeploymentJournal(journal_path) if journal_path else None
         self.owner = private_key_to_address(private_key)
         self.transaction = TxParams(
             {
@@ -68,58 +96,31 @@ class ContractDeployer(ContractVerifier):
         self._adjust_chain_settings()
 
         self.web3.middleware_onion.add(construct_sign_and_send_raw_middleware(private_key))
+        self.pipeline = TransactionPipeline(web3=self.web3, sender=self.owner, timeout=wait)
 
-        # Check that the precompiled data matches the source code
-        # Only for current version, because this is the only one with source code
-        if self.contracts_version in [None, CONTRACTS_VERSION]:
-            contract_manager_source = ContractSourceManager(
-                contracts_source_path(contracts_version=contracts_version)
-            )
-            contract_manager_source.verify_precompiled_checksums(self.precompiled_path)
-        else:
-            LOG.info("Skipped checks against the source code because it is not available.")
+        check_precompiled_against_source(self.contracts_version, self.precompiled_path)
 
     @property
     def is_connected_to_arbitrum_chain(self) -> bool:
-        chain_id = ChainID(self.web3.eth.chain_id)
-        return "arbitrum" in ID_TO_CHAINNAME.get(chain_id, "")
+        return is_arbitrum_chain(ChainID(self.web3.eth.chain_id))
 
     def _adjust_chain_settings(self) -> None:
-        # Gas usage on Arbitrum is different that EVM gas usage, so increase the limit here
-        if self.is_connected_to_arbitrum_chain:
-            gas_limit = Wei(1_000_000_000)
-            self.transaction["gas"] = gas_limit
+        gas_limit = chain_gas_limit(ChainID(self.web3.eth.chain_id), self.transaction["gas"])
+        if gas_limit != self.transaction["gas"]:
+            self.transaction["gas"] = Wei(gas_limit)
             LOG.info(f"Adapting transaction parameters for Arbitrum: gas_limit = {gas_limit}")
 
     def deploy(self, contract_name: str, args: Optional[List] = None) -> TxReceipt:
-        if args is None:
-            args = list()
         contract_interface: CompiledContract = self.contract_manager.get_contract(contract_name)
-
-        abi = contract_interface["abi"]
-        bytecode = contract_interface["bin"]
-        bytecode_runtime = None
-
-        # Instantiate and deploy contract
-        if bytecode_runtime:
-            contract = self.web3.eth.contract(
-                abi=abi, bytecode=bytecode, bytecode_runtime=bytecode_runtime
-            )
-        else:
-            contract = self.web3.eth.contract(
-                abi=abi,
-                bytecode=bytecode,
-            )
-
-        # Get transaction hash from deployed contract
-        txhash = self.send_deployment_transaction(contract=contract, args=args)
-
-        # Get tx receipt to get contract address
+        contract = self.web3.eth.contract(
+            abi=contract_interface["abi"], bytecode=contract_interface["bin"]
+        )
+        txhash = self.send_deployment_transaction(contract=contract, args=args or [])
         LOG.debug(
             f"Deploying {contract_name} txHash={encode_hex(txhash)}, "
             f"contracts version {self.contract_manager.contracts_version}"
         )
-        receipt, tx = check_successful_tx(web3=self.web3, txid=txhash, timeout=self.wait)
+        ((receipt, tx),) = self.pipeline.wait([txhash])
         if not receipt["contractAddress"]:  # happens with Parity
             receipt["contractAddress"] = tx["creates"]  # type: ignore
         LOG.info(
@@ -131,16 +132,29 @@ class ContractDeployer(ContractVerifier):
 
     def transact(self, contract_method: ContractFunction) -> TxReceipt:
         """A wrapper around to_be_called.transact() that waits until the transaction succeeds."""
-        txhash = contract_method.transact(self.transaction)
-        LOG.debug(f"Sending txHash={encode_hex(txhash)}")
-        receipt, _ = check_successful_tx(web3=self.web3, txid=txhash, timeout=self.wait)
-        return receipt
-
-    def send_deployment_transaction(self, contract: Type[Contract], args: List) -> HexBytes:
+        return self.transact_many([contract_method])[0]
+
+    def transact_many(self, contract_methods: Sequence[ContractFunction]) -> List[TxReceipt]:
+        """Send independent transactions back-to-back and wait until all of them succeed"""
+        txhashes = []
+        for contract_method in contract_methods:
+            txhash = self.pipeline.submit(contract_method.build_transaction(self.transaction))
+            LOG.debug(f"Sending txHash={encode_hex(txhash)}")
+            txhashes.append(txhash)
+        return [receipt for receipt, _ in self.pipeline.wait(txhashes)]
+
+    def send_deployment_transaction(
+        self, contract: Type[Contract], args: List, nonce: Optional[Nonce] = None
+    ) -> HexBytes:
+        transaction = self.transaction.copy()
+        transaction["data"] = contract.constructor(*args).data_in_transaction
+        return self._submit(transaction, nonce)
+
+    def _submit(self, transaction: TxParams, nonce: Optional[Nonce] = None) -> HexBytes:
         txhash = None
         while txhash is None:
             try:
-                txhash = contract.constructor(*args).transact(self.transaction)
+                txhash = self.pipeline.submit(transaction, nonce)
             except ValueError as ex:
                 # pylint: disable=E1126
                 if ex.args[0]["code"] == -32015:
@@ -181,64 +195,165 @@ class ContractDeployer(ContractVerifier):
             the call to the constructor of TokenNetworkRegistry.
         """
 
-        deployed_contracts: DeployedContracts = {
-            "contracts_version": self.contract_manager.contracts_version,
-            "chain_id": self.web3.eth.chain_id,
-            "contracts": {},
-        }
+        plan, deployed_contracts = raiden_deployment_plan(
+            contracts_version=self.contract_manager.contracts_version,
+            chain_id=ChainID(self.web3.eth.chain_id),
+            max_num_of_token_networks=max_num_of_token_networks,
+            reuse_secret_registry_from_deploy_file=reuse_secret_registry_from_deploy_file,
+            settle_timeout=settle_timeout,
+        )
+        self.execute_plan(plan, deployed_contracts)
 
-        if reuse_secret_registry_from_deploy_file:
-            reused_doc = DeployedContracts(  # type: ignore
-                load_json_from_path(reuse_secret_registry_from_deploy_file)
-            )
-            if not reused_doc:
-                raise RuntimeError(
-                    f"{reuse_secret_registry_from_deploy_file} does not contain deployment data."
-                )
-            reused_contracts = reused_doc["contracts"]
+        return deployed_contracts
 
-            secret_registry = self.contract_instance_from_deployment_data(
-                reused_doc, CONTRACT_SECRET_REGISTRY
-            )
+    def execute_plan(
+        self, plan: DeploymentPlan, deployed_contracts: DeployedContracts
+    ) -> List[TxReceipt]:
+        """Send all transactions of `plan` without waiting in between, then check them
 
-            deployed_contracts["contracts"][CONTRACT_SECRET_REGISTRY] = deepcopy(
-                reused_contracts[CONTRACT_SECRET_REGISTRY]
-            )
-        else:
-            secret_registry = self._deploy_and_remember(
-                contract_name=CONTRACT_SECRET_REGISTRY,
-                arguments=[],
-                deployed_contracts=deployed_contracts,
-            )
+        The deployed contracts are stored in `deployed_contracts`. Every
+        transaction is sent with its planned nonce, so the predicted addresses
+        hold. If one cannot be sent, none of the following ones are.
 
-        token_network_registry_args = [
-            secret_registry.address,
-            settle_timeout,
-            max_num_of_token_networks,
-        ]
-        self._deploy_and_remember(
-            contract_name=CONTRACT_TOKEN_NETWORK_REGISTRY,
-            arguments=token_network_registry_args,
-            deployed_contracts=deployed_contracts,
-        )
+        With a journal, an interrupted run of the same plan is continued. Its
+        mined transactions are not sent again.
+        """
+        # Only without transactions in flight the plan gets consecutive nonces
+        self.pipeline.wait(self.pipeline.in_flight())
+        run_id = None
+        resumed: List[Tuple[TxReceipt, TxData]] = []
+        first_nonce = self.pipeline.next_nonce()
+        if self.journal:
+            run_id = self.journal.run_id(
+                self.web3.eth.chain_id, self.owner, self.contract_manager.contracts_version, plan
+            )
+            resumable = self._resume_run(run_id)
+            if resumable:
+                first_nonce, resumed = resumable
+            else:
+                self.journal.started(run_id, first_nonce)
+        planned = plan.resolve(self.owner, first_nonce)
+
+        txhashes = []
+        for index, transaction in enumerate(planned[len(resumed) :], start=len(resumed)):
+            step = transaction.step
+            if isinstance(step, DeployStep):
+                contract_interface = self.contract_manager.get_contract(step.contract_name)
+                contract = self.web3.eth.contract(
+                    abi=contract_interface["abi"], bytecode=contract_interface["bin"]
+                )
+                txhash = self.send_deployment_transaction(
+                    contract=contract, args=transaction.args, nonce=transaction.nonce
+                )
+                LOG.debug(
+                    f"Deploying {step.contract_name} to {transaction.address} "
+                    f"txHash={encode_hex(txhash)}"
+                )
+            else:
+                instance = self.web3.eth.contract(
+                    abi=self.contract_manager.get_contract_abi(step.contract_name),
+                    address=transaction.address,
+                )
+                function = instance.get_function_by_name(step.function_name)(*transaction.args)
+                txhash = self._submit(
+                    function.build_transaction(self.transaction), transaction.nonce
+                )
+                LOG.debug(
+                    f"Calling {step.contract_name}.{step.function_name} "
+                    f"txHash={encode_hex(txhash)}"
+                )
+            if self.journal and run_id:
+                self.journal.sent(run_id, index, transaction.nonce, txhash)
+            txhashes.append(txhash)
+
+        try:
+            results = resumed + self.pipeline.wait(txhashes)
+            if self.journal and run_id:
+                for index, (receipt, _) in enumerate(results[len(resumed) :], start=len(resumed)):
+                    self.journal.mined(run_id, index, receipt)
+            receipts = self._check_plan_results(planned, results, deployed_contracts)
+        except Exception as ex:
+            if self.journal and run_id:
+                self.journal.failed(run_id, str(ex))
+            raise
+        if self.journal and run_id:
+            self.journal.completed(run_id)
+        return receipts
+
+    @staticmethod
+    def _check_plan_results(
+        planned: List[PlannedTransaction],
+        results: List[Tuple[TxReceipt, TxData]],
+        deployed_contracts: DeployedContracts,
+    ) -> List[TxReceipt]:
+        """Check that the transactions got the planned nonces and addresses and store them"""
+        receipts = []
+        for transaction, (receipt, tx) in zip(planned, results):
+            if tx["nonce"] != transaction.nonce:
+                raise RuntimeError(
+                    f"{transaction.step} was sent with nonce {tx['nonce']} instead of "
+                    f"{transaction.nonce}. Was the account used by someone else?"
+                )
+            if isinstance(transaction.step, DeployStep):
+                if not receipt["contractAddress"]:  # happens with Parity
+                    receipt["contractAddress"] = tx["creates"]  # type: ignore
+                if receipt["contractAddress"] != transaction.address:
+                    raise RuntimeError(
+                        f"{transaction.step.contract_name} was deployed to "
+                        f"{receipt['contractAddress']} instead of {transaction.address}"
+                    )
+                LOG.info(
+                    "{0} address: {1}. Gas used: {2}".format(
+                        transaction.step.contract_name,
+                        receipt["contractAddress"],
+                        receipt["gasUsed"],
+                    )
+                )
+                deployed_contracts["contracts"][
+                    transaction.step.contract_name
+                ] = _deployed_data_from_receipt(
+                    receipt=receipt, constructor_arguments=transaction.args
+                )
+            receipts.append(receipt)
+        return receipts
 
-        return deployed_contracts
+    def _resume_run(self, run_id: str) -> Optional[Tuple[Nonce, List[Tuple[TxReceipt, TxData]]]]:
+        """First nonce and mined transactions of an interrupted run, if it can be continued
 
-    def _deploy_and_remember(
-        self,
-        contract_name: str,
-        arguments: List,
-        deployed_contracts: DeployedContracts,
-    ) -> Contract:
-        """Deploys contract_name with arguments and store the result in deployed_contracts."""
-        receipt = self.deploy(contract_name, arguments)
-        deployed_contracts["contracts"][contract_name] = _deployed_data_from_receipt(
-            receipt=receipt, constructor_arguments=arguments
-        )
-        return self.web3.eth.contract(
-            abi=self.contract_manager.get_contract_abi(contract_name),
-            address=deployed_contracts["contracts"][contract_name]["address"],
+        Transactions of the run that are still pending are waited for. The run
+        can be continued if its transactions were mined in order and the
+        account has not been used since.
+        """
+        assert self.journal
+        run = self.journal.find_run(run_id)
+        if run is None or run.completed:
+            return None
+        txhashes: List[HexBytes] = []
+        while len(txhashes) in run.sent:
+            txhashes.append(run.sent[len(txhashes)])
+        found = batch_request(
+            self.web3,
+            [(RPC.eth_getTransactionByHash, [encode_hex(txhash)]) for txhash in txhashes],
         )
+        # Transactions are mined in nonce order, so only the known ones at the start count
+        known = []
+        for txhash, tx in zip(txhashes, found):
+            if tx is None:
+                break
+            known.append(txhash)
+        results = self.pipeline.tracker.wait(known)
+
+        next_nonce = self.pipeline.next_nonce()
+        if next_nonce != run.first_nonce + len(results):
+            if not results:
+                return None
+            raise RuntimeError(
+                f"The interrupted deployment {run_id} would continue with nonce "
+                f"{run.first_nonce + len(results)}, but the next nonce is {next_nonce}. "
+                "Was the account used by someone else?"
+            )
+        LOG.info(f"Continuing deployment {run_id} after {len(results)} mined transactions")
+        return run.first_nonce, results
 
     def register_token_network(
         self,
@@ -249,51 +364,51 @@ class ContractDeployer(ContractVerifier):
         token_network_deposit_limit: int,
     ) -> Dict[str, Any]:
         """Register token with a TokenNetworkRegistry contract."""
+        return self.register_token_networks(
+            token_registry_abi=token_registry_abi,
+            token_registry_address=token_registry_address,
+            registrations=[
+                TokenRegistration(
+                    token_address=token_address,
+                    channel_participant_deposit_limit=channel_participant_deposit_limit,
+                    token_network_deposit_limit=token_network_deposit_limit,
+                )
+            ],
+        )[0]
+
+    def register_token_networks(
+        self,
+        token_registry_abi: ABI,
+        token_registry_address: ChecksumAddress,
+        registrations: Sequence[TokenRegistration],
+    ) -> List[Dict[str, Any]]:
+        """Register many tokens with a TokenNetworkRegistry contract
+
+        All createERC20TokenNetwork transactions are sent before waiting for
+        any of them. The address of every new TokenNetwork is taken from the
+        TokenNetworkCreated event in the receipt. Returns one entry per
+        registration, in the given order, as `register_token_network()`.
+        """
         token_network_registry = self.web3.eth.contract(
             abi=token_registry_abi, address=token_registry_address
         )
-
-        command = token_network_registry.functions.createERC20TokenNetwork(
-            token_address, channel_participant_deposit_limit, token_network_deposit_limit
+        receipts = self.transact_many(
+            [
+                token_network_registry.functions.createERC20TokenNetwork(
+                    registration.token_address,
+                    registration.channel_participant_deposit_limit,
+                    registration.token_network_deposit_limit,
+                )
+                for registration in registrations
+            ]
         )
-        self.transact(command)
 
         LOG.debug("Collecting constructor parameters for later verification")
-        chain_id = ChainID(self.web3.eth.chain_id)
-        deployment_data = get_contracts_deployment_info(
-            chain_id=chain_id,
-            version=self.contract_manager.contracts_version,
-            module=DeploymentModule.RAIDEN,
-        )
-        assert deployment_data
-        secret_registry = self.contract_instance_from_deployment_data(
-            deployment_data, CONTRACT_SECRET_REGISTRY
-        )
-        token_network_registry = self.contract_instance_from_deployment_data(
-            deployment_data, CONTRACT_TOKEN_NETWORK_REGISTRY
-        )
-        settle_timeout = token_network_registry.functions.settle_timeout().call()
-        constructor_arguments = dict(
-            _token_address=token_address,
-            _secret_registry=secret_registry.address,
-            _chain_id=chain_id,
-            _settle_timeout=settle_timeout,
-            _controller=self.owner,
-            _channel_participant_deposit_limit=channel_participant_deposit_limit,
-            _token_network_deposit_limit=token_network_deposit_limit,
-        )
-
-        LOG.debug("Getting address of new token network")
-        token_network_address = "0x0"
-        while int(token_network_address, 16) == 0:
-            token_network_address = token_network_registry.functions.token_to_token_networks(
-                token_address
-            ).call()
-            time.sleep(2)
-        LOG.debug(f"TokenNetwork address: {token_network_address}")
-        return dict(
-            token_network_address=token_network_address,
-            constructor_arguments=constructor_arguments,
+        return token_networks_from_receipts(
+            token_network_registry=token_network_registry,
+            registrations=registrations,
+            receipts=receipts,
+            controller=self.owner,
         )
 
     def deploy_service_contracts(
@@ -312,39 +427,144 @@ class ContractDeployer(ContractVerifier):
         reuse_service_registry_from_deploy_file: Optional[Path],
     ) -> DeployedContracts:
         """Deploy 3rd party service contracts"""
-        if not contracts_version_monitoring_service_takes_token_network_registry(
-            self.contract_manager.contracts_version
-        ):
-            raise RuntimeError("Deployment of older service contracts is not suppported.")
-
-        chain_id = self.web3.eth.chain_id
-        deployed_contracts: DeployedContracts = {
-            "contracts_version": self.contract_manager.contracts_version,
-            "chain_id": chain_id,
-            "contracts": {},
-        }
-
-        if reuse_service_registry_from_deploy_file:
-            reused_doc = DeployedContracts(  # type: ignore
-                load_json_from_path(reuse_service_registry_from_deploy_file)
-            )
-            if not reused_doc:
-                raise RuntimeError(
-                    f"{reuse_service_registry_from_deploy_file} does not contain deployment data."
-                )
-            reused_contracts = reused_doc["contracts"]
+        plan, deployed_contracts = service_deployment_plan(
+            contracts_version=self.contract_manager.contracts_version,
+            chain_id=ChainID(self.web3.eth.chain_id),
+            token_address=token_address,
+            user_deposit_whole_balance_limit=user_deposit_whole_balance_limit,
+            user_deposit_withdraw_timeout=user_deposit_withdraw_timeout,
+            service_registry_controller=service_registry_controller,
+            initial_service_deposit_price=initial_service_deposit_price,
+            service_deposit_bump_numerator=service_deposit_bump_numerator,
+            service_deposit_bump_denominator=service_deposit_bump_denominator,
+            decay_constant=decay_constant,
+            min_price=min_price,
+            registration_duration=registration_duration,
+            token_network_registry_address=token_network_registry_address,
+            reuse_service_registry_from_deploy_file=reuse_service_registry_from_deploy_file,
+        )
+        self.execute_plan(plan, deployed_contracts)
 
-            service_registry = self.contract_instance_from_deployment_data(
-                reused_doc, CONTRACT_SERVICE_REGISTRY
-            )
+        return deployed_contracts
 
-            deployed_contracts["contracts"][CONTRACT_SERVICE_REGISTRY] = deepcopy(
-                reused_contracts[CONTRACT_SERVICE_REGISTRY]
-            )
-        else:
-            service_registry = self._deploy_and_remember(
-                contract_name=CONTRACT_SERVICE_REGISTRY,
-                arguments=[
+
+def _deployed_data_from_receipt(
+    receipt: TxReceipt, constructor_arguments: List
+) -> DeployedContract:
+    assert receipt["contractAddress"] is not None
+    return {
+        "address": to_checksum_address(receipt["contractAddress"]),
+        "transaction_hash": encode_hex(receipt["transactionHash"]),
+        "block_number": receipt["blockNumber"],
+        "gas_cost": receipt["gasUsed"],
+        "constructor_arguments": constructor_arguments,
+    }
+
+
+def check_precompiled_against_source(
+    contracts_version: Optional[str], precompiled_path: Path
+) -> None:
+    """Check that the precompiled data matches the source code
+
+    Only for current version, because this is the only one with source code.
+    """
+    if contracts_version in [None, CONTRACTS_VERSION]:
+        contract_manager_source = ContractSourceManager(
+            contracts_source_path(contracts_version=contracts_version)
+        )
+        contract_manager_source.verify_precompiled_checksums(precompiled_path)
+    else:
+        LOG.info("Skipped checks against the source code because it is not available.")
+
+
+def _reused_contract(
+    deploy_file: Path, contract_name: str, deployed_contracts: DeployedContracts
+) -> ChecksumAddress:
+    """Copy `contract_name` from an earlier deployment file and return its address"""
+    reused_doc = DeployedContracts(load_json_from_path(deploy_file))  # type: ignore
+    if not reused_doc:
+        raise RuntimeError(f"{deploy_file} does not contain deployment data.")
+    reused_contract = reused_doc["contracts"][contract_name]
+    deployed_contracts["contracts"][contract_name] = deepcopy(reused_contract)
+    return to_checksum_address(reused_contract["address"])
+
+
+def raiden_deployment_plan(
+    contracts_version: str,
+    chain_id: ChainID,
+    max_num_of_token_networks: Optional[int],
+    reuse_secret_registry_from_deploy_file: Optional[Path],
+    settle_timeout: int = DEPLOY_SETTLE_TIMEOUT,
+) -> Tuple[DeploymentPlan, DeployedContracts]:
+    """Plan the deployment of the raiden contracts
+
+    Returns the plan and the deployment data, which contains only the reused
+    contracts until the plan is executed.
+    """
+    deployed_contracts: DeployedContracts = {
+        "contracts_version": contracts_version,
+        "chain_id": chain_id,
+        "contracts": {},
+    }
+
+    secret_registry: Union[Deployed, ChecksumAddress] = Deployed(CONTRACT_SECRET_REGISTRY)
+    steps: List[Step] = []
+    if reuse_secret_registry_from_deploy_file:
+        secret_registry = _reused_contract(
+            reuse_secret_registry_from_deploy_file, CONTRACT_SECRET_REGISTRY, deployed_contracts
+        )
+    else:
+        steps.append(DeployStep(CONTRACT_SECRET_REGISTRY, []))
+
+    steps.append(
+        DeployStep(
+            CONTRACT_TOKEN_NETWORK_REGISTRY,
+            [secret_registry, settle_timeout, max_num_of_token_networks],
+        )
+    )
+    return DeploymentPlan(steps), deployed_contracts
+
+
+def service_deployment_plan(
+    contracts_version: str,
+    chain_id: ChainID,
+    token_address: HexAddress,
+    user_deposit_whole_balance_limit: int,
+    user_deposit_withdraw_timeout: int,
+    service_registry_controller: HexAddress,
+    initial_service_deposit_price: int,
+    service_deposit_bump_numerator: int,
+    service_deposit_bump_denominator: int,
+    decay_constant: int,
+    min_price: int,
+    registration_duration: int,
+    token_network_registry_address: HexAddress,
+    reuse_service_registry_from_deploy_file: Optional[Path],
+) -> Tuple[DeploymentPlan, DeployedContracts]:
+    """Plan the deployment of the 3rd party service contracts
+
+    Returns the plan and the deployment data, as `raiden_deployment_plan()`.
+    """
+    if not contracts_version_monitoring_service_takes_token_network_registry(contracts_version):
+        raise RuntimeError("Deployment of older service contracts is not suppported.")
+
+    deployed_contracts: DeployedContracts = {
+        "contracts_version": contracts_version,
+        "chain_id": chain_id,
+        "contracts": {},
+    }
+
+    service_registry: Union[Deployed, ChecksumAddress] = Deployed(CONTRACT_SERVICE_REGISTRY)
+    steps: List[Step] = []
+    if reuse_service_registry_from_deploy_file:
+        service_registry = _reused_contract(
+            reuse_service_registry_from_deploy_file, CONTRACT_SERVICE_REGISTRY, deployed_contracts
+        )
+    else:
+        steps.append(
+            DeployStep(
+                CONTRACT_SERVICE_REGISTRY,
+                [
                     token_address,
                     service_registry_controller,
                     initial_service_deposit_price,
@@ -354,60 +574,81 @@ class ContractDeployer(ContractVerifier):
                     min_price,
                     registration_duration,
                 ],
-                deployed_contracts=deployed_contracts,
             )
-
-        user_deposit = self._deploy_and_remember(
-            contract_name=CONTRACT_USER_DEPOSIT,
-            arguments=[
-                token_address,
-                user_deposit_whole_balance_limit,
-                user_deposit_withdraw_timeout,
-            ],
-            deployed_contracts=deployed_contracts,
-        )
-
-        monitoring_service_constructor_args = [
-            token_address,
-            deployed_contracts["contracts"][CONTRACT_SERVICE_REGISTRY]["address"],
-            deployed_contracts["contracts"][CONTRACT_USER_DEPOSIT]["address"],
-            token_network_registry_address,
-        ]
-        msc = self._deploy_and_remember(
-            contract_name=CONTRACT_MONITORING_SERVICE,
-            arguments=monitoring_service_constructor_args,
-            deployed_contracts=deployed_contracts,
-        )
-
-        one_to_n = self._deploy_and_remember(
-            contract_name=CONTRACT_ONE_TO_N,
-            arguments=[user_deposit.address, chain_id, service_registry.address],
-            deployed_contracts=deployed_contracts,
         )
 
+    user_deposit = Deployed(CONTRACT_USER_DEPOSIT)
+    msc = Deployed(CONTRACT_MONITORING_SERVICE)
+    one_to_n = Deployed(CONTRACT_ONE_TO_N)
+    steps += [
+        DeployStep(
+            CONTRACT_USER_DEPOSIT,
+            [token_address, user_deposit_whole_balance_limit, user_deposit_withdraw_timeout],
+        ),
+        DeployStep(
+            CONTRACT_MONITORING_SERVICE,
+            [token_address, service_registry, user_deposit, token_network_registry_address],
+        ),
+        DeployStep(CONTRACT_ONE_TO_N, [user_deposit, chain_id, service_registry]),
         # Tell the UserDeposit instance about other contracts.
-        LOG.debug(
-            "Calling UserDeposit.init() with "
-            f"msc_address={msc.address} "
-            f"one_to_n_address={one_to_n.address}"
-        )
-        self.transact(
-            user_deposit.functions.init(
-                _msc_address=msc.address, _one_to_n_address=one_to_n.address
+        CallStep(CONTRACT_USER_DEPOSIT, "init", [msc, one_to_n]),
+    ]
+    return DeploymentPlan(steps), deployed_contracts
+
+
+def token_networks_from_receipts(
+    token_network_registry: Contract,
+    registrations: Sequence[TokenRegistration],
+    receipts: Sequence[TxReceipt],
+    controller: ChecksumAddress,
+) -> List[Dict[str, Any]]:
+    """Deployment info of the TokenNetworks created by createERC20TokenNetwork transactions
+
+    The address of every new TokenNetwork is taken from the TokenNetworkCreated
+    event in the receipt of its registration.
+    """
+    web3 = token_network_registry.web3
+    chain_id = ChainID(web3.eth.chain_id)
+    secret_registry_address = token_network_registry.functions.secret_registry_address().call()
+    settle_timeout = token_network_registry.functions.settle_timeout().call()
+    created_event = [
+        entry
+        for entry in token_network_registry.abi
+        if entry["type"] == "event" and entry.get("name") == EVENT_TOKEN_NETWORK_CREATED
+    ][0]
+    decoder = get_event_decoder(web3.codec, ABIEvent(created_event))  # type: ignore
+
+    token_networks = []
+    for registration, receipt in zip(registrations, receipts):
+        token_network_address = None
+        for log in receipt["logs"]:
+            if log["address"] != token_network_registry.address:
+                continue
+            if not log["topics"] or HexBytes(log["topics"][0]) != decoder.topic:
+                continue
+            args = decoder.decode_args(log)
+            if args["token_address"] == registration.token_address:
+                token_network_address = args["token_network_address"]
+        if token_network_address is None:
+            raise RuntimeError(
+                f"No {EVENT_TOKEN_NETWORK_CREATED} event for token "
+                f"{registration.token_address} in {encode_hex(receipt['transactionHash'])}"
+            )
+        LOG.debug(f"TokenNetwork address: {token_network_address}")
+        token_networks.append(
+            dict(
+                token_network_address=token_network_address,
+                constructor_arguments=dict(
+                    _token_address=registration.token_address,
+                    _secret_registry=secret_registry_address,
+                    _chain_id=chain_id,
+                    _settle_timeout=settle_timeout,
+                    _controller=controller,
+                    _channel_participant_deposit_limit=(
+                        registration.channel_participant_deposit_limit
+                    ),
+                    _token_network_deposit_limit=registration.token_network_deposit_limit,
+                ),
             )
         )
-
-        return deployed_contracts
-
-
-def _deployed_data_from_receipt(
-    receipt: TxReceipt, constructor_arguments: List
-) -> DeployedContract:
-    assert receipt["contractAddress"] is not None
-    return {
-        "address": to_checksum_address(receipt["contractAddress"]),
-        "transaction_hash": encode_hex(receipt["transactionHash"]),
-        "block_number": receipt["blockNumber"],
-        "gas_cost": receipt["gasUsed"],
-        "constructor_arguments": constructor_arguments,
-    }
+    return token_networks
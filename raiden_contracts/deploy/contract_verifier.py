@@ -1,16 +1,23 @@
 import json
-from typing import Any, List, Optional, Tuple
-
-from eth_typing.evm import HexAddress
-from eth_utils import to_checksum_address
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from eth_typing import HexStr
+from eth_typing.evm import ChecksumAddress, HexAddress
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
 from web3 import Web3
+from web3._utils.rpc_abi import RPC
 from web3.contract import Contract
+from web3.types import TxReceipt
 
 from raiden_contracts.constants import (
     CONTRACT_MONITORING_SERVICE,
     CONTRACT_ONE_TO_N,
     CONTRACT_SECRET_REGISTRY,
     CONTRACT_SERVICE_REGISTRY,
+    CONTRACT_TOKEN_NETWORK,
     CONTRACT_TOKEN_NETWORK_REGISTRY,
     CONTRACT_USER_DEPOSIT,
     DeploymentModule,
@@ -22,8 +29,66 @@ from raiden_contracts.contract_manager import (
     contracts_precompiled_path,
     get_contracts_deployment_info,
 )
+from raiden_contracts.utils.contract_reads import decode_call_result
+from raiden_contracts.utils.rpc import RPCCall, batch_request
 from raiden_contracts.utils.type_aliases import ChainID
 
+# The constant getters that are checked for every deployed contract
+RAIDEN_GETTERS: Dict[str, List[str]] = {
+    CONTRACT_SECRET_REGISTRY: [],
+    CONTRACT_TOKEN_NETWORK_REGISTRY: ["secret_registry_address", "settle_timeout"],
+}
+SERVICE_GETTERS: Dict[str, List[str]] = {
+    CONTRACT_SERVICE_REGISTRY: ["token", "controller"],
+    CONTRACT_USER_DEPOSIT: [
+        "token",
+        "whole_balance_limit",
+        "withdraw_timeout",
+        "one_to_n_address",
+        "msc_address",
+    ],
+    CONTRACT_ONE_TO_N: ["deposit_contract"],
+    CONTRACT_MONITORING_SERVICE: [
+        "token",
+        "service_registry",
+        "user_deposit",
+        "token_network_registry",
+    ],
+}
+
+TOKEN_NETWORK_GETTERS = [
+    "token",
+    "secret_registry",
+    "settle_timeout",
+    "controller",
+    "channel_participant_deposit_limit",
+    "token_network_deposit_limit",
+]
+# The deposit limits of a TokenNetwork after removeLimits()
+NO_DEPOSIT_LIMIT = 2**256 - 1
+
+
+class ContractRead(NamedTuple):
+    """What to read about a deployed contract"""
+
+    contract_name: str
+    instance: Contract
+    # The deployment transaction, if its receipt is to be checked
+    transaction_hash: Optional[HexStr]
+    function_names: List[str]
+
+
+class OnchainContract(NamedTuple):
+    """What the chain knows about a deployed contract"""
+
+    instance: Contract
+    # The receipt of the deployment, if it was read
+    receipt: Optional[TxReceipt]
+    # keccak of the runtime code
+    code_hash: HexBytes
+    # Results of the constant getters, by function name. Empty if the code is wrong.
+    values: Dict[str, Any]
+
 
 class ContractVerifier:
     def __init__(self, web3: Web3, contracts_version: Optional[str] = None):
@@ -31,6 +96,11 @@ class ContractVerifier:
         self.contracts_version = contracts_version
         self.precompiled_path = contracts_precompiled_path(self.contracts_version)
         self.contract_manager = ContractManager(self.precompiled_path)
+        # Whether the node provides the codeHash of an account with eth_getProof
+        self.use_proofs = True
+        self.code_hashes: Dict[ChecksumAddress, HexBytes] = {}
+        # Guards use_proofs and code_hashes, as reads can run in several threads
+        self._lock = threading.Lock()
 
     def verify_deployed_contracts_in_filesystem(self) -> None:
         chain_id = ChainID(self.web3.eth.chain_id)
@@ -106,6 +176,18 @@ class ContractVerifier:
             token_network_registry_address=token_network_registry_address,
         )
 
+    def store_and_verify_token_networks(self, token_networks: List[Dict[str, Any]]) -> None:
+        """Add TokenNetworks to the raiden deployment file, writing it once"""
+        deployment_file_path = contracts_deployed_path(
+            chain_id=ChainID(self.web3.eth.chain_id), version=self.contracts_version
+        )
+        with deployment_file_path.open() as f:
+            deployed_contracts_info: DeployedContracts = json.load(f)
+        deployed_contracts_info.setdefault("token_networks", []).extend(token_networks)
+        self.store_and_verify_deployment_info_raiden(
+            deployed_contracts_info=deployed_contracts_info
+        )
+
     def _store_deployment_info(self, services: bool, deployment_info: DeployedContracts) -> None:
         deployment_file_path = contracts_deployed_path(
             chain_id=ChainID(self.web3.eth.chain_id),
@@ -125,17 +207,23 @@ class ContractVerifier:
         if self.contract_manager.contracts_version != deployment_data["contracts_version"]:
             raise RuntimeError("Version string mismatch.")
 
+        onchain = self.read_deployed_contracts(deployment_data, RAIDEN_GETTERS)
         secret_registry, _ = self._verify_deployed_contract(
-            deployment_data=deployment_data, contract_name=CONTRACT_SECRET_REGISTRY
+            deployment_data=deployment_data,
+            contract_name=CONTRACT_SECRET_REGISTRY,
+            onchain=onchain[CONTRACT_SECRET_REGISTRY],
         )
 
         token_network_registry, constructor_arguments = self._verify_deployed_contract(
-            deployment_data=deployment_data, contract_name=CONTRACT_TOKEN_NETWORK_REGISTRY
+            deployment_data=deployment_data,
+            contract_name=CONTRACT_TOKEN_NETWORK_REGISTRY,
+            onchain=onchain[CONTRACT_TOKEN_NETWORK_REGISTRY],
         )
+        token_network_registry_values = onchain[CONTRACT_TOKEN_NETWORK_REGISTRY].values
 
         # We need to also check the constructor parameters against the chain
         if (
-            to_checksum_address(token_network_registry.functions.secret_registry_address().call())
+            to_checksum_address(token_network_registry_values["secret_registry_address"])
             != secret_registry.address
         ):
             raise RuntimeError("secret_registry_address onchain has an unexpected value.")
@@ -147,32 +235,194 @@ class ContractVerifier:
             raise RuntimeError(
                 "TokenNetworkRegistry's constructor received a different SecretRegistry address."
             )
-        assert token_network_registry.functions.settle_timeout().call() == constructor_arguments[1]
+        assert token_network_registry_values["settle_timeout"] == constructor_arguments[1]
+
+        if deployment_data.get("token_networks"):
+            self.verify_token_networks(deployment_data)
 
         return True
 
+    def read_deployed_contracts(
+        self, deployment_data: DeployedContracts, getters: Dict[str, List[str]]
+    ) -> Dict[str, OnchainContract]:
+        """Read everything needed to verify the contracts in `getters` in one batch request"""
+        contracts = deployment_data["contracts"]
+        reads = [
+            ContractRead(
+                contract_name=contract_name,
+                instance=self.contract_instance_from_deployment_data(
+                    deployment_data, contract_name
+                ),
+                transaction_hash=contracts[contract_name]["transaction_hash"],
+                function_names=function_names,
+            )
+            for contract_name, function_names in getters.items()
+        ]
+        return dict(zip(getters, self.read_contracts(reads)))
+
+    def read_contracts(self, reads: List[ContractRead]) -> List[OnchainContract]:
+        """Read the receipts, the hashes of the runtime code and the getters in one batch
+
+        The getters of a contract with wrong code are not decoded, as there is
+        nothing to verify them against.
+        """
+        with self._lock:
+            use_proofs = self.use_proofs
+        try:
+            return self._read_contracts(reads, use_proofs)
+        except _ProofsUnsupported:
+            # The node does not know eth_getProof, so the code has to be downloaded
+            with self._lock:
+                self.use_proofs = False
+            return self._read_contracts(reads, use_proofs=False)
+
+    def _read_contracts(
+        self, reads: List[ContractRead], use_proofs: bool
+    ) -> List[OnchainContract]:
+        with self._lock:
+            known_code_hashes = dict(self.code_hashes)
+        calls: List[RPCCall] = []
+        for read in reads:
+            address = read.instance.address
+            if read.transaction_hash is not None:
+                calls.append((RPC.eth_getTransactionReceipt, [read.transaction_hash]))
+            if address not in known_code_hashes:
+                if use_proofs:
+                    calls.append((RPC.eth_getProof, [address, [], "latest"]))
+                else:
+                    calls.append((RPC.eth_getCode, [address, "latest"]))
+            calls.extend(
+                (
+                    RPC.eth_call,
+                    [
+                        {"to": address, "data": read.instance.encodeABI(fn_name=function_name)},
+                        "latest",
+                    ],
+                )
+                for function_name in read.function_names
+            )
+        # Getters of a contract with wrong code may fail, without spoiling the other results
+        results = iter(batch_request(self.web3, calls, return_errors=True))
+
+        onchain = []
+        for read in reads:
+            receipt = None
+            if read.transaction_hash is not None:
+                receipt = _raise_error(next(results))
+                if receipt is None:
+                    # Still pending, so wait for it like for any other deployment
+                    receipt = self.web3.eth.wait_for_transaction_receipt(read.transaction_hash)
+            code_hash = known_code_hashes.get(read.instance.address)
+            if code_hash is None:
+                account_or_code = next(results)
+                if use_proofs and _is_method_not_found(account_or_code):
+                    raise _ProofsUnsupported(account_or_code)
+                account_or_code = _raise_error(account_or_code)
+                if use_proofs:
+                    code_hash = HexBytes(account_or_code["codeHash"])
+                else:
+                    code_hash = HexBytes(keccak(account_or_code))
+            call_results = [next(results) for _ in read.function_names]
+            values = {}
+            compiled_code_hash = self.contract_manager.get_runtime_code_hash(read.contract_name)
+            if code_hash == HexBytes(compiled_code_hash):
+                # Deployed code does not change, so there is no need to read it again
+                known_code_hashes[read.instance.address] = code_hash
+                with self._lock:
+                    self.code_hashes[read.instance.address] = code_hash
+                values = {
+                    function_name: decode_call_result(
+                        self.web3, read.instance, function_name, _raise_error(result)
+                    )
+                    for function_name, result in zip(read.function_names, call_results)
+                }
+            onchain.append(
+                OnchainContract(
+                    instance=read.instance, receipt=receipt, code_hash=code_hash, values=values
+                )
+            )
+        return onchain
+
+    def verify_token_networks(
+        self, deployment_data: DeployedContracts, batch_size: int = 100, max_workers: int = 8
+    ) -> None:
+        """Verify the code and the settings of every TokenNetwork in `deployment_data`
+
+        The TokenNetworks are read in batches of `batch_size`, up to
+        `max_workers` batches at the same time. The first batch, which also
+        reads the controller of the TokenNetworkRegistry, is read alone, so
+        that the other ones know whether the node provides eth_getProof.
+        """
+        token_networks = deployment_data.get("token_networks", [])
+        secret_registry_address = deployment_data["contracts"][CONTRACT_SECRET_REGISTRY]["address"]
+        settle_timeout = deployment_data["contracts"][CONTRACT_TOKEN_NETWORK_REGISTRY][
+            "constructor_arguments"
+        ][1]
+        abi = self.contract_manager.get_contract_abi(CONTRACT_TOKEN_NETWORK)
+        reads = [
+            ContractRead(
+                contract_name=CONTRACT_TOKEN_NETWORK,
+                instance=self.web3.eth.contract(
+                    abi=abi, address=token_network["token_network_address"]
+                ),
+                transaction_hash=None,
+                function_names=TOKEN_NETWORK_GETTERS,
+            )
+            for token_network in token_networks
+        ]
+        registry_read = ContractRead(
+            contract_name=CONTRACT_TOKEN_NETWORK_REGISTRY,
+            instance=self.contract_instance_from_deployment_data(
+                deployment_data, CONTRACT_TOKEN_NETWORK_REGISTRY
+            ),
+            transaction_hash=None,
+            function_names=["controller"],
+        )
+        registry, *onchain = self.read_contracts([registry_read] + reads[:batch_size])
+        batches = [reads[i : i + batch_size] for i in range(batch_size, len(reads), batch_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            onchain.extend(
+                onchain_token_network
+                for batch in executor.map(self.read_contracts, batches)
+                for onchain_token_network in batch
+            )
+        registry_controller = registry.values.get("controller")
+
+        for token_network, onchain_token_network in zip(token_networks, onchain):
+            self._verify_code_hash(
+                CONTRACT_TOKEN_NETWORK,
+                onchain_token_network.instance.address,
+                onchain_token_network.code_hash,
+            )
+            _verify_token_network_deployment(
+                token_network=onchain_token_network.values,
+                address=onchain_token_network.instance.address,
+                constructor_arguments=token_network["constructor_arguments"],
+                secret_registry_address=secret_registry_address,
+                settle_timeout=settle_timeout,
+                registry_controller=registry_controller,
+            )
+        print(f"{len(token_networks)} TokenNetworks match the compiled data and their settings")
+
     def _verify_deployed_contract(
-        self, deployment_data: DeployedContracts, contract_name: str
+        self, deployment_data: DeployedContracts, contract_name: str, onchain: OnchainContract
     ) -> Tuple[Contract, List[Any]]:
-        """Verify deployment info against the chain
+        """Verify deployment info against what was read from the chain
 
         Verifies:
-        - the runtime bytecode - precompiled data against the chain
+        - the hash of the runtime bytecode - precompiled data against the chain
         - information stored in deployment_*.json against the chain,
         except for the constructor arguments, which have to be checked
         separately.
 
         Returns: (onchain_instance, constructor_arguments)
         """
-        contract_instance = self.contract_instance_from_deployment_data(
-            deployment_data, contract_name
-        )
+        contract_instance = onchain.instance
         contracts = deployment_data["contracts"]
 
         # Check blockchain transaction hash & block information
-        receipt = self.web3.eth.wait_for_transaction_receipt(
-            contracts[contract_name]["transaction_hash"]
-        )
+        receipt = onchain.receipt
+        assert receipt is not None
         if receipt["blockNumber"] != contracts[contract_name]["block_number"]:
             raise RuntimeError(
                 f'We have block_number {contracts[contract_name]["block_number"]} in the '
@@ -191,19 +441,28 @@ class ContractVerifier:
             )
 
         # Check that the deployed bytecode matches the precompiled data
-        blockchain_bytecode = self.web3.eth.get_code(contract_instance.address).hex()
-        compiled_bytecode = self.contract_manager.get_runtime_hexcode(contract_name)
-
-        if blockchain_bytecode == compiled_bytecode:
-            print(
-                f"{contract_name} at {contract_instance.address} "
-                f"matches the compiled data from contracts.json"
-            )
-        else:
-            raise RuntimeError(f"{contract_name} at {contract_instance.address} has wrong code")
+        self._verify_code_hash(contract_name, contract_instance.address, onchain.code_hash)
+        print(
+            f"{contract_name} at {contract_instance.address} "
+            f"matches the compiled data from contracts.json"
+        )
 
         return contract_instance, contracts[contract_name]["constructor_arguments"]
 
+    def _verify_code_hash(
+        self, contract_name: str, address: ChecksumAddress, code_hash: HexBytes
+    ) -> None:
+        compiled_code_hash = HexBytes(self.contract_manager.get_runtime_code_hash(contract_name))
+        if code_hash != compiled_code_hash:
+            # Only download the code to tell what is wrong with it
+            blockchain_bytecode = self.web3.eth.get_code(address)
+            compiled_bytecode = self.contract_manager.get_runtime_hexcode(contract_name)
+            raise RuntimeError(
+                f"{contract_name} at {address} has wrong code: "
+                f"{len(blockchain_bytecode)} bytes onchain, "
+                f"{(len(compiled_bytecode) - 2) // 2} bytes compiled"
+            )
+
     def contract_instance_from_deployment_data(
         self, deployment_data: DeployedContracts, contract_name: str
     ) -> Contract:
@@ -230,28 +489,37 @@ class ContractVerifier:
         if chain_id != deployed_contracts_info["chain_id"]:
             raise RuntimeError("chain_id mismatch")
 
+        onchain = self.read_deployed_contracts(deployed_contracts_info, SERVICE_GETTERS)
         (
             service_registry,
             service_registry_constructor_arguments,
         ) = self._verify_deployed_contract(
-            deployment_data=deployed_contracts_info, contract_name=CONTRACT_SERVICE_REGISTRY
+            deployment_data=deployed_contracts_info,
+            contract_name=CONTRACT_SERVICE_REGISTRY,
+            onchain=onchain[CONTRACT_SERVICE_REGISTRY],
         )
         (user_deposit, user_deposit_constructor_arguments,) = self._verify_deployed_contract(
-            deployment_data=deployed_contracts_info, contract_name=CONTRACT_USER_DEPOSIT
+            deployment_data=deployed_contracts_info,
+            contract_name=CONTRACT_USER_DEPOSIT,
+            onchain=onchain[CONTRACT_USER_DEPOSIT],
         )
         one_to_n, one_to_n_constructor_arguments = self._verify_deployed_contract(
-            deployment_data=deployed_contracts_info, contract_name=CONTRACT_ONE_TO_N
+            deployment_data=deployed_contracts_info,
+            contract_name=CONTRACT_ONE_TO_N,
+            onchain=onchain[CONTRACT_ONE_TO_N],
         )
         monitoring_service, ms_constructor_arguments = self._verify_deployed_contract(
-            deployed_contracts_info, CONTRACT_MONITORING_SERVICE
+            deployed_contracts_info,
+            CONTRACT_MONITORING_SERVICE,
+            onchain[CONTRACT_MONITORING_SERVICE],
         )
         _verify_service_registry_deployment(
-            service_registry=service_registry,
+            service_registry=onchain[CONTRACT_SERVICE_REGISTRY].values,
             constructor_arguments=service_registry_constructor_arguments,
             token_address=token_address,
         )
         _verify_user_deposit_deployment(
-            user_deposit=user_deposit,
+            user_deposit=onchain[CONTRACT_USER_DEPOSIT].values,
             constructor_arguments=user_deposit_constructor_arguments,
             token_address=token_address,
             user_deposit_whole_balance_limit=user_deposit_whole_balance_limit,
@@ -260,7 +528,7 @@ class ContractVerifier:
             monitoring_service_address=monitoring_service.address,
         )
         _verify_monitoring_service_deployment(
-            monitoring_service=monitoring_service,
+            monitoring_service=onchain[CONTRACT_MONITORING_SERVICE].values,
             constructor_arguments=ms_constructor_arguments,
             token_address=token_address,
             service_registry_address=service_registry.address,
@@ -268,7 +536,7 @@ class ContractVerifier:
             token_network_registry_address=token_network_registry_address,
         )
         _verify_one_to_n_deployment(
-            one_to_n=one_to_n,
+            one_to_n=onchain[CONTRACT_ONE_TO_N].values,
             constructor_arguments=one_to_n_constructor_arguments,
             user_deposit_address=user_deposit.address,
             chain_id=chain_id,
@@ -277,8 +545,70 @@ class ContractVerifier:
         return True
 
 
+def _raise_error(result: Any) -> Any:
+    if isinstance(result, ValueError):
+        raise result
+    return result
+
+
+class _ProofsUnsupported(Exception):
+    """The node does not provide eth_getProof"""
+
+
+def _is_method_not_found(result: Any) -> bool:
+    """Whether `result` is the error of a call to a method the node does not provide"""
+    if not isinstance(result, ValueError) or not result.args:
+        return False
+    error = result.args[0]
+    if isinstance(error, dict):
+        if error.get("code") == -32601:
+            return True
+        error = error.get("message", "")
+    message = str(error).lower()
+    # eth-tester does not follow JSON-RPC here
+    return "method not found" in message or "has not been implemented" in message
+
+
+def _verify_token_network_deployment(
+    token_network: Dict[str, Any],
+    address: ChecksumAddress,
+    constructor_arguments: Dict[str, Any],
+    secret_registry_address: HexAddress,
+    settle_timeout: int,
+    registry_controller: Optional[ChecksumAddress] = None,
+) -> None:
+    """Check the onchain values of a TokenNetwork against its registration
+
+    The controller can be changed. It is accepted if it is the one of the
+    registration or the current controller of the TokenNetworkRegistry.
+    """
+    if to_checksum_address(token_network["token"]) != constructor_arguments["_token_address"]:
+        raise RuntimeError(f"TokenNetwork {address} has a wrong token address onchain.")
+    if to_checksum_address(token_network["secret_registry"]) != secret_registry_address:
+        raise RuntimeError(f"TokenNetwork {address} has a wrong SecretRegistry address onchain.")
+    if secret_registry_address != constructor_arguments["_secret_registry"]:
+        raise RuntimeError(
+            f"TokenNetwork {address} received a wrong SecretRegistry address during construction."
+        )
+    if token_network["settle_timeout"] != settle_timeout:
+        raise RuntimeError(f"TokenNetwork {address} has a wrong settle timeout onchain.")
+    if settle_timeout != constructor_arguments["_settle_timeout"]:
+        raise RuntimeError(
+            f"TokenNetwork {address} received a wrong settle timeout during construction."
+        )
+    controllers = {constructor_arguments["_controller"]}
+    if registry_controller is not None:
+        controllers.add(to_checksum_address(registry_controller))
+    if to_checksum_address(token_network["controller"]) not in controllers:
+        raise RuntimeError(f"TokenNetwork {address} has a wrong controller onchain.")
+    # The controller can remove the deposit limits
+    for limit in ["channel_participant_deposit_limit", "token_network_deposit_limit"]:
+        if token_network[limit] not in (constructor_arguments[f"_{limit}"], NO_DEPOSIT_LIMIT):
+            raise RuntimeError(f"TokenNetwork {address} has a wrong {limit} onchain.")
+
+
 def _verify_user_deposit_deployment(
-    user_deposit: Contract,
+    user_deposit: Dict[str, Any],
     constructor_arguments: List,
     token_address: HexAddress,
     user_deposit_whole_balance_limit: int,
@@ -286,24 +616,24 @@ def _verify_user_deposit_deployment(
     one_to_n_address: HexAddress,
     monitoring_service_address: HexAddress,
 ) -> None:
-    """Check an onchain deployment of UserDeposit and constructor arguments at deployment time"""
+    """Check the onchain values of UserDeposit and constructor arguments at deployment time"""
     if len(constructor_arguments) != 3:
         raise RuntimeError("UserDeposit has a wrong number of constructor arguments.")
     if token_address != constructor_arguments[0]:
         raise RuntimeError("UserDeposit received a wrong token address during construction.")
-    if to_checksum_address(user_deposit.functions.token().call()) != token_address:
+    if to_checksum_address(user_deposit["token"]) != token_address:
         raise RuntimeError("UserDeposit has a wrong token address onchain.")
-    if user_deposit.functions.whole_balance_limit().call() != user_deposit_whole_balance_limit:
+    if user_deposit["whole_balance_limit"] != user_deposit_whole_balance_limit:
         raise RuntimeError("UserDeposit has a wrong whole_balance_limit onchain")
     if user_deposit_whole_balance_limit != constructor_arguments[1]:
         raise RuntimeError("UserDeposit received a wrong whole_balance_limit during construction.")
-    if user_deposit.functions.withdraw_timeout().call() != user_deposit_withdraw_timeout:
+    if user_deposit["withdraw_timeout"] != user_deposit_withdraw_timeout:
         raise RuntimeError("UserDeposit has a wrong withdraw_timeout onchain")
     if user_deposit_withdraw_timeout != constructor_arguments[2]:
         raise RuntimeError("UserDeposit received a wrong withdraw_timeout during construction.")
-    if to_checksum_address(user_deposit.functions.one_to_n_address().call()) != one_to_n_address:
+    if to_checksum_address(user_deposit["one_to_n_address"]) != one_to_n_address:
         raise RuntimeError("UserDeposit has a wrong OneToN address onchain.")
-    onchain_msc_address = to_checksum_address(user_deposit.functions.msc_address().call())
+    onchain_msc_address = to_checksum_address(user_deposit["msc_address"])
     if onchain_msc_address != monitoring_service_address:
         raise RuntimeError(
             f"MSC address found onchain: {onchain_msc_address}, "
@@ -312,39 +642,33 @@ def _verify_user_deposit_deployment(
 
 
 def _verify_monitoring_service_deployment(
-    monitoring_service: Contract,
+    monitoring_service: Dict[str, Any],
     constructor_arguments: List,
     token_address: HexAddress,
     service_registry_address: HexAddress,
     user_deposit_address: HexAddress,
     token_network_registry_address: HexAddress,
 ) -> None:
-    """Check an onchain deployment of MonitoringService and constructor arguments"""
+    """Check the onchain values of MonitoringService and constructor arguments"""
     if len(constructor_arguments) != 4:
         raise RuntimeError("MonitoringService has a wrong number of constructor arguments.")
-    if to_checksum_address(monitoring_service.functions.token().call()) != token_address:
+    if to_checksum_address(monitoring_service["token"]) != token_address:
         raise RuntimeError("MonitoringService has a wrong token address onchain.")
     if token_address != constructor_arguments[0]:
         raise RuntimeError("MonitoringService received a wrong token address during construction")
 
-    if (
-        to_checksum_address(monitoring_service.functions.service_registry().call())
-        != service_registry_address
-    ):
+    if to_checksum_address(monitoring_service["service_registry"]) != service_registry_address:
         raise RuntimeError("MonitoringService has a wrong ServiceRegistry address onchain.")
     if service_registry_address != constructor_arguments[1]:
         raise RuntimeError("MonitoringService received a wrong address during construction.")
-    if (
-        to_checksum_address(monitoring_service.functions.user_deposit().call())
-        != user_deposit_address
-    ):
+    if to_checksum_address(monitoring_service["user_deposit"]) != user_deposit_address:
         raise RuntimeError("MonitoringService has a wrong UserDeposit address onchain.")
     if user_deposit_address != constructor_arguments[2]:
         raise RuntimeError(
             "MonitoringService received a wrong UserDeposit address during construction."
         )
     if (
-        to_checksum_address(monitoring_service.functions.token_network_registry().call())
+        to_checksum_address(monitoring_service["token_network_registry"])
         != token_network_registry_address
     ):
         raise RuntimeError("MonitoringService has a wrong TokenNetworkRegistry address onchain.")
@@ -355,14 +679,14 @@ def _verify_monitoring_service_deployment(
 
 
 def _verify_one_to_n_deployment(
-    one_to_n: Contract,
+    one_to_n: Dict[str, Any],
     constructor_arguments: List,
     user_deposit_address: HexAddress,
     service_registry_address: HexAddress,
     chain_id: int,
 ) -> None:
-    """Check an onchain deployment of OneToN and constructor arguments"""
-    if to_checksum_address(one_to_n.functions.deposit_contract().call()) != user_deposit_address:
+    """Check the onchain values of OneToN and constructor arguments"""
+    if to_checksum_address(one_to_n["deposit_contract"]) != user_deposit_address:
         raise RuntimeError("OneToN has a wrong UserDeposit address onchain.")
     if user_deposit_address != constructor_arguments[0]:
         raise RuntimeError("OneToN received a wrong UserDeposit address during construction.")
@@ -375,14 +699,14 @@ def _verify_one_to_n_deployment(
 
 
 def _verify_service_registry_deployment(
-    service_registry: Contract, constructor_arguments: List, token_address: HexAddress
+    service_registry: Dict[str, Any], constructor_arguments: List, token_address: HexAddress
 ) -> None:
-    """Check an onchain deployment of ServiceRegistry and constructor arguments"""
+    """Check the onchain values of ServiceRegistry and constructor arguments"""
     if len(constructor_arguments) != 8:
         raise RuntimeError(
             "ServiceRegistry was deployed with a wrong number of constructor arguments"
         )
-    if to_checksum_address(service_registry.functions.token().call()) != token_address:
+    if to_checksum_address(service_registry["token"]) != token_address:
         raise RuntimeError("ServiceRegistry has a wrong token address")
     if token_address != constructor_arguments[0]:
         raise RuntimeError(
@@ -390,7 +714,7 @@ def _verify_service_registry_deployment(
             f"but the constructor argument for {CONTRACT_SERVICE_REGISTRY} is "
             f"{constructor_arguments[0]}"
         )
-    controller_onchain = to_checksum_address(service_registry.functions.controller().call())
+    controller_onchain = to_checksum_address(service_registry["controller"])
     if controller_onchain != constructor_arguments[1]:
         raise RuntimeError(
             f"the deployment data contains the controller address {constructor_arguments[1]} "
@@ -0,0 +1,141 @@
+"""Plan deployments whose transactions can all be sent without waiting
+
+The address of a contract created by a plain transaction only depends on the
+sender and the nonce of the transaction. When the nonces of all transactions
+of a deployment are known in advance, the addresses of the new contracts can be
+passed to constructors and function calls before the contracts exist. The
+transactions are executed in nonce order, so every contract exists by the time
+a later transaction uses it.
+"""
+import heapq
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+
+from eth_typing.evm import ChecksumAddress, HexAddress
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+from web3.types import Nonce
+
+
+class Deployed(NamedTuple):
+    """Placeholder for the address of a contract deployed in the same plan"""
+
+    contract_name: str
+
+
+class DeployStep(NamedTuple):
+    contract_name: str
+    args: List[Any]
+
+
+class CallStep(NamedTuple):
+    """Call of a function of a contract deployed in the same plan, or at `address`"""
+
+    contract_name: str
+    function_name: str
+    args: List[Any]
+    address: Optional[ChecksumAddress] = None
+
+
+Step = Union[DeployStep, CallStep]
+
+
+class PlannedTransaction(NamedTuple):
+    step: Step
+    nonce: Nonce
+    # Arguments with all Deployed placeholders replaced by addresses
+    args: List[Any]
+    # Address of the called or the created contract
+    address: ChecksumAddress
+
+
+def contract_address_at(sender: HexAddress, nonce: int) -> ChecksumAddress:
+    """Address of the contract created by `sender` with a transaction of `nonce`
+
+    This is keccak(rlp([sender, nonce]))[12:]. The RLP encoding of this short
+    list is built by hand.
+    """
+    if nonce == 0:
+        encoded_nonce = b"\x80"
+    elif nonce < 0x80:
+        encoded_nonce = bytes([nonce])
+    else:
+        nonce_bytes = nonce.to_bytes((nonce.bit_length() + 7) // 8, "big")
+        encoded_nonce = bytes([0x80 + len(nonce_bytes)]) + nonce_bytes
+    payload = b"\x94" + to_canonical_address(sender) + encoded_nonce
+    return to_checksum_address(keccak(bytes([0xC0 + len(payload)]) + payload)[12:])
+
+
+def _references(args: Sequence[Any]) -> List[str]:
+    return [arg.contract_name for arg in args if isinstance(arg, Deployed)]
+
+
+class DeploymentPlan:
+    """An ordered set of contract deployments and calls between them
+
+    Steps are ordered so that every contract is deployed before a step refers
+    to it. Apart from that, the given order is kept.
+    """
+
+    def __init__(self, steps: Sequence[Step]) -> None:
+        deployed = [step.contract_name for step in steps if isinstance(step, DeployStep)]
+        if len(deployed) != len(set(deployed)):
+            raise ValueError(f"A contract is deployed twice in {deployed}")
+
+        dependencies: List[List[int]] = []
+        step_of_contract = {
+            step.contract_name: index
+            for index, step in enumerate(steps)
+            if isinstance(step, DeployStep)
+        }
+        for step in steps:
+            names = _references(step.args)
+            if isinstance(step, CallStep) and step.address is None:
+                names.append(step.contract_name)
+            unknown = [name for name in names if name not in step_of_contract]
+            if unknown:
+                raise ValueError(f"{step} refers to contracts not deployed in the plan: {unknown}")
+            dependencies.append([step_of_contract[name] for name in names])
+
+        self.steps = [steps[index] for index in _topological_order(dependencies)]
+
+    def resolve(self, sender: HexAddress, first_nonce: Nonce) -> List[PlannedTransaction]:
+        """Assign consecutive nonces, starting at `first_nonce`, and fill in the addresses"""
+        addresses: Dict[str, ChecksumAddress] = {}
+        planned = []
+        for offset, step in enumerate(self.steps):
+            nonce = Nonce(first_nonce + offset)
+            args = [
+                addresses[arg.contract_name] if isinstance(arg, Deployed) else arg
+                for arg in step.args
+            ]
+            if isinstance(step, DeployStep):
+                address = contract_address_at(sender, nonce)
+                addresses[step.contract_name] = address
+            elif step.address is not None:
+                address = step.address
+            else:
+                address = addresses[step.contract_name]
+            planned.append(PlannedTransaction(step=step, nonce=nonce, args=args, address=address))
+        return planned
+
+
+def _topological_order(dependencies: List[List[int]]) -> List[int]:
+    """Order the indices so that each comes after its dependencies, otherwise keeping the order"""
+    dependents: List[List[int]] = [[] for _ in dependencies]
+    missing = [len(set(deps)) for deps in dependencies]
+    for index, deps in enumerate(dependencies):
+        for dependency in set(deps):
+            dependents[dependency].append(index)
+
+    ready = [index for index, count in enumerate(missing) if count == 0]
+    heapq.heapify(ready)
+    order: List[int] = []
+    while ready:
+        index = heapq.heappop(ready)
+        order.append(index)
+        for dependent in dependents[index]:
+            missing[dependent] -= 1
+            if missing[dependent] == 0:
+                heapq.heappush(ready, dependent)
+    if len(order) != len(dependencies):
+        raise ValueError("The deployment steps have circular dependencies")
+    return order
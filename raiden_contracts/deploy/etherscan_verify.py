@@ -1,9 +1,11 @@
 import json
 import pprint
-import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
 
 import click
 import requests
@@ -23,11 +25,20 @@ from raiden_contracts.contract_source_manager import (
     contracts_source_path,
     contracts_source_path_of_deployment_module,
 )
+from raiden_contracts.utils.explorer import USER_AGENT, api_of_chain_id
+from raiden_contracts.utils.join_contracts import SourceGraph
 from raiden_contracts.utils.type_aliases import ChainID
 
 CONTRACT_NAMES_SEPARATED = " | ".join([c.name for c in CONTRACT_LIST])
-USER_AGENT = "curl/7.37.0"  # Etherscan blocks us without this user agent in some cases
 MODULE_OF_CONTRACT = {contract: module for module, contract in CONTRACT_LIST}
+# Results of a submission that mean the source is verified
+VERIFIED_RESULTS = ["Pass - Verified", "Contract source code already verified"]
+
+
+class Submission(NamedTuple):
+    contract_name: str
+    address: str
+    constructor_args: str
 
 
 def validate_contract_name(_ctx: Context, _param: Any, value: Optional[str]) -> Optional[str]:
@@ -52,27 +63,59 @@ def validate_contract_name(_ctx: Context, _param: Any, value: Optional[str]) ->
     " Default is to submit the sources of all contracts.",
     callback=validate_contract_name,
 )
+@click.option(
+    "--rate-limit",
+    default=5.0,
+    show_default=True,
+    help="Maximum number of requests per second to the Etherscan API",
+)
 def etherscan_verify(
-    chain_id: ChainID, apikey: str, guid: Optional[str], contract_name: Optional[str]
+    chain_id: ChainID,
+    apikey: str,
+    guid: Optional[str],
+    contract_name: Optional[str],
+    rate_limit: float,
 ) -> None:
     if guid:
         guid_status(etherscan_api=api_of_chain_id[chain_id], guid=guid, apikey=apikey)
         return
 
+    submissions: List[Submission] = []
     for list_entry in CONTRACT_LIST:
         if contract_name is None or contract_name == list_entry.name:
             if list_entry.name == CONTRACT_TOKEN_NETWORK:
-                _verify_token_networks(chain_id, apikey)
+                submissions.extend(_token_network_submissions(chain_id))
             else:
-                _verify_singleton_contract(
-                    chain_id=chain_id,
-                    apikey=apikey,
-                    source_module=list_entry.module,
-                    contract_name=list_entry.name,
+                submissions.append(
+                    _singleton_contract_submission(
+                        chain_id=chain_id,
+                        source_module=list_entry.module,
+                        contract_name=list_entry.name,
+                    )
                 )
 
+    results = verify_contracts(
+        chain_id=chain_id,
+        apikey=apikey,
+        submissions=submissions,
+        limiter=TokenBucket(rate=rate_limit),
+    )
+    print(summary_table(results))
+    failed = [
+        submission for submission, result in results.items() if result not in VERIFIED_RESULTS
+    ]
+    if failed:
+        etherscan_url = api_of_chain_id[chain_id].replace("api-", "").replace("api", "")
+        joined_files = write_joined_sources(submission.contract_name for submission in failed)
+        raise click.ClickException(
+            f"{len(failed)} of {len(results)} submissions failed. "
+            "Usually a manual submission to Etherscan works.\n"
+            f"Visit {etherscan_url}/verifyContract2?a=ADDRESS\n"
+            f"Use {', '.join(str(path) for path in joined_files)}."
+        )
+
 
-def _verify_token_networks(chain_id: ChainID, apikey: str) -> None:
+def _token_network_submissions(chain_id: ChainID) -> List[Submission]:
     deployment_file_path = contracts_deployed_path(chain_id=chain_id)
     with deployment_file_path.open() as f:
         deployed_contracts_info = json.load(f)
@@ -80,63 +123,57 @@ def _verify_token_networks(chain_id: ChainID, apikey: str) -> None:
 
     with open(contracts_precompiled_path()) as f:
         contract_dict = json.load(f)["contracts"][CONTRACT_TOKEN_NETWORK]
-    metadata = json.loads(contract_dict["metadata"])
     constructor = [func for func in contract_dict["abi"] if func["type"] == "constructor"][0]
     arg_types = [arg["type"] for arg in constructor["inputs"]]
     arg_names = [arg["name"] for arg in constructor["inputs"]]
 
-    for tn in token_networks:
-        args = [tn["constructor_arguments"][arg_name] for arg_name in arg_names]
-        etherscan_verify_contract(
-            chain_id=chain_id,
-            apikey=apikey,
-            address=tn["token_network_address"],
+    return [
+        Submission(
             contract_name=CONTRACT_TOKEN_NETWORK,
-            metadata=metadata,
-            constructor_args=encode_abi(arg_types, args).hex(),
+            address=tn["token_network_address"],
+            constructor_args=encode_abi(
+                arg_types, [tn["constructor_arguments"][arg_name] for arg_name in arg_names]
+            ).hex(),
         )
+        for tn in token_networks
+    ]
 
 
-api_of_chain_id = {
-    1: "https://api.etherscan.io/api",
-    3: "https://api-ropsten.etherscan.io/api",
-    4: "https://api-rinkeby.etherscan.io/api",
-    5: "https://api-goerli.etherscan.io/api",
-    42: "https://api-kovan.etherscan.io/api",
-    42161: "https://api.arbiscan.io/api",
-}
+@lru_cache(maxsize=None)
+def source_graph() -> SourceGraph:
+    """The sources of the current contracts, parsed once per process"""
+    return SourceGraph(
+        import_map={
+            module: str(path)
+            for module, path in contracts_source_path(contracts_version=None).items()
+        }
+    )
 
 
+@lru_cache(maxsize=None)
 def join_sources(source_module: DeploymentModule, contract_name: str) -> str:
-    """Use join_contracts.py to concatenate all imported Solidity files.
+    """Concatenate the Solidity file of a contract with all files it imports
+
+    The result is kept, so all instances of a contract get the same string.
 
     Args:
         source_module: a module name to look up contracts_source_path()
         contract_name: 'TokenNetworkRegistry', 'SecretRegistry' etc.
     """
-    joined_file = Path(__file__).parent.joinpath("joined.sol")
-    remapping = {
-        module: str(path) for module, path in contracts_source_path(contracts_version=None).items()
-    }
-    command = [
-        "./utils/join_contracts.py",
-        "--import-map",
-        json.dumps(remapping),
-        str(
-            contracts_source_path_of_deployment_module(source_module).joinpath(
-                contract_name + ".sol"
-            )
-        ),
-        str(joined_file),
-    ]
-    working_dir = Path(__file__).parent.parent
-    try:
-        subprocess.check_call(command, cwd=working_dir)
-    except subprocess.CalledProcessError as ex:
-        print(f"cd {str(working_dir)}; {subprocess.list2cmdline(command)} failed.")
-        raise ex
+    contract_path = contracts_source_path_of_deployment_module(source_module).joinpath(
+        contract_name + ".sol"
+    )
+    return source_graph().flatten(str(contract_path))
+
 
-    return joined_file.read_text()
+def write_joined_sources(contract_names: Iterable[str]) -> List[Path]:
+    """Write the joined sources for a manual submission, one file per contract"""
+    paths = []
+    for contract_name in sorted(set(contract_names)):
+        joined_file = Path(__file__).parent.joinpath(f"joined_{contract_name}.sol")
+        joined_file.write_text(join_sources(MODULE_OF_CONTRACT[contract_name], contract_name))
+        paths.append(joined_file)
+    return paths
 
 
 def get_constructor_args(
@@ -155,17 +192,122 @@ def get_constructor_args(
     return constructor_args
 
 
-def etherscan_verify_contract(
+class TokenBucket:
+    """Lets through `rate` requests per second on average, and bursts of `capacity`
+
+    Shared by all threads talking to the same API.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self) -> None:
+        """Wait until a request may be made"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                self._sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1
+                self._updated = self._clock()
+            self._tokens -= 1
+
+
+def verify_contracts(
     chain_id: ChainID,
     apikey: str,
-    address: str,
-    contract_name: str,
-    metadata: Dict,
-    constructor_args: str,
-) -> None:
-    source = (
-        join_sources(source_module=MODULE_OF_CONTRACT[contract_name], contract_name=contract_name),
-    )
+    submissions: List[Submission],
+    limiter: TokenBucket,
+    max_workers: int = 8,
+    retries: int = 10,
+    poll_interval: float = 5,
+) -> Dict[Submission, str]:
+    """Submit the sources of all `submissions` at once and wait until they are verified
+
+    Submissions go out concurrently, limited by `limiter`. Then all pending
+    GUIDs are polled together, every `poll_interval` seconds, up to `retries`
+    times. Returns the last result from Etherscan for every submission.
+    """
+    etherscan_api = api_of_chain_id[chain_id]
+    # Join the sources before the threads start, all instances of a contract share them
+    sources = {
+        contract_name: join_sources(MODULE_OF_CONTRACT[contract_name], contract_name)
+        for contract_name in {submission.contract_name for submission in submissions}
+    }
+    contract_manager = ContractManager(contracts_precompiled_path())
+    metadata = {
+        contract_name: json.loads(contract_manager.contracts[contract_name]["metadata"])
+        for contract_name in sources
+    }
+
+    def submit(submission: Submission) -> str:
+        limiter.take()
+        try:
+            return submit_contract(
+                etherscan_api=etherscan_api,
+                apikey=apikey,
+                submission=submission,
+                source=sources[submission.contract_name],
+                metadata=metadata[submission.contract_name],
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            return f"Fail - {ex}"
+
+    def poll(guid: str) -> Dict:
+        limiter.take()
+        try:
+            return guid_status(etherscan_api=etherscan_api, guid=guid, apikey=apikey)
+        except Exception as ex:  # pylint: disable=broad-except
+            # Try again in the next round
+            return {"status": "0", "result": f"Pending - {ex}"}
+
+    results: Dict[Submission, str] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        guids: Dict[Submission, str] = {}
+        for submission, guid_or_result in zip(submissions, executor.map(submit, submissions)):
+            if guid_or_result in VERIFIED_RESULTS or guid_or_result.startswith("Fail"):
+                results[submission] = guid_or_result
+            else:
+                guids[submission] = guid_or_result
+
+        for poll_round in range(retries):
+            if not guids:
+                break
+            if poll_round > 0:
+                time.sleep(poll_interval)
+            pending = list(guids)
+            for submission, status in zip(pending, executor.map(poll, guids.values())):
+                if status["result"] == "Pass - Verified" or status["result"].startswith("Fail"):
+                    results[submission] = status["result"]
+                    del guids[submission]
+                elif status["status"] == "1":
+                    results[submission] = f"Fail - {status['result']}"
+                    del guids[submission]
+        for submission in guids:
+            results[submission] = f"Fail - still pending after {retries} polls"
+    return {submission: results[submission] for submission in submissions}
+
+
+def submit_contract(
+    etherscan_api: str, apikey: str, submission: Submission, source: str, metadata: Dict
+) -> str:
+    """Submit the source of a contract, returns the GUID of the verification job
+
+    Returns the result of Etherscan instead if the source is verified already.
+    """
     optimization_details = metadata["settings"]["optimizer"].get("details")
     data = {
         # A valid API-Key is required
@@ -174,72 +316,52 @@ def etherscan_verify_contract(
         "module": "contract",
         # Do not change
         "action": "verifysourcecode",
-        "contractaddress": address,
+        "contractaddress": submission.address,
         "sourceCode": source,
-        "contractname": contract_name,
+        "contractname": submission.contract_name,
         "compilerversion": "v" + metadata["compiler"]["version"],
         # 0 = Optimization used, 1 = No Optimization
         "optimizationUsed": 0 if optimization_details is not None else 1,
         "runs": metadata["settings"]["optimizer"]["runs"],
         # Typo is intentional. Etherscan does not like the correct spelling.
-        "constructorArguements": constructor_args,
+        "constructorArguements": submission.constructor_args,
     }
     pprint.pprint({k: v for k, v in data.items() if k != "sourceCode"})
 
-    etherscan_api = api_of_chain_id[chain_id]
     response = requests.post(etherscan_api, data=data, headers={"User-Agent": USER_AGENT})
     try:
         content = response.json()
     except json.decoder.JSONDecodeError:
         print(response.text)
         raise
-    print(content)
     print(f'Status: {content["status"]}; {content["message"]} ; GUID = {content["result"]}')
 
-    etherscan_url = etherscan_api.replace("api-", "").replace("api", "")
-    etherscan_url += "/verifyContract2?a=" + data["contractaddress"]
-    manual_submission_guide = f"""Usually a manual submission to Etherscan works.
-    Visit {etherscan_url}
-    Use raiden_contracts/deploy/joined.sol."""
-
     if content["status"] != "1":
         if content["result"] == "Contract source code already verified":
-            return
-        else:
-            raise ValueError(
-                "Etherscan submission failed for an unknown reason\n" + manual_submission_guide
-            )
+            return content["result"]
+        raise ValueError(f"Etherscan submission failed: {content['result']}")
+    return content["result"]
 
-    # submission succeeded, obtained GUID
-    guid = content["result"]
-    status = "0"
-    retries = 10
-    while status == "0" and retries > 0:
-        retries -= 1
-        r = guid_status(etherscan_api=etherscan_api, guid=guid, apikey=apikey)
-        status = r["status"]
-        if r["result"] == "Fail - Unable to verify":
-            raise ValueError(manual_submission_guide)
-        if r["result"] == "Pass - Verified":
-            return
-        print("Retrying...")
-        time.sleep(5)
-    raise TimeoutError(manual_submission_guide)
-
-
-def _verify_singleton_contract(
-    chain_id: ChainID,
-    apikey: str,
-    source_module: DeploymentModule,
-    contract_name: str,
-) -> None:
-    """Calls Etherscan API for verifying the Solidity source of a contract.
+
+def summary_table(results: Dict[Submission, str]) -> str:
+    """One line with the result of every submission"""
+    lines = [f"{'Contract':<24} {'Address':<42} Result"]
+    lines.extend(
+        f"{submission.contract_name:<24} {submission.address:<42} {result}"
+        for submission, result in results.items()
+    )
+    return "\n".join(lines)
+
+
+def _singleton_contract_submission(
+    chain_id: ChainID, source_module: DeploymentModule, contract_name: str
+) -> Submission:
+    """What to submit to Etherscan for verifying the Solidity source of a contract.
 
     This function can only be used to verify contracts which are only deployed
     once. E.g. `TokenNetworkRegistry`, but not `TokenNetwork`.
     Args:
         chain_id: EIP-155 chain id of the Ethereum chain
-        apikey: key for calling Etherscan API
         source_module: a module name to look up contracts_source_path()
         contract_name: 'TokenNetworkRegistry', 'SecretRegistry' etc.
     """
@@ -247,19 +369,14 @@ def _verify_singleton_contract(
     deployment_info = get_contracts_deployment_info(chain_id=chain_id, module=source_module)
     assert deployment_info
     contract_manager = ContractManager(contracts_precompiled_path())
-    metadata = json.loads(contract_manager.contracts[contract_name]["metadata"])
     constructor_args = get_constructor_args(
         deployment_info=deployment_info,
         contract_name=contract_name,
         contract_manager=contract_manager,
     )
-    contract_deploy_info = deployment_info["contracts"][contract_name]
-    etherscan_verify_contract(
-        chain_id=chain_id,
-        apikey=apikey,
-        address=contract_deploy_info["address"],
+    return Submission(
         contract_name=contract_name,
-        metadata=metadata,
+        address=deployment_info["contracts"][contract_name]["address"],
         constructor_args=constructor_args,
     )
 
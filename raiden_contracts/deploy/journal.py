@@ -0,0 +1,118 @@
+"""Append-only journal of deployment runs
+
+A deployment run is the execution of one deployment plan. The journal records
+when a run starts, every transaction sent and mined for it, and when it is
+completed or why it failed. It is a JSON Lines file, written line by line, so
+that a crash loses at most the line being written.
+
+When the same plan is executed again, the journal tells which transactions of
+the interrupted run were already sent. The chain tells which of them were mined.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+from eth_typing import ChecksumAddress
+from eth_utils import encode_hex, keccak
+from hexbytes import HexBytes
+from web3.types import Nonce, TxReceipt
+
+from raiden_contracts.deploy.deployment_plan import DeploymentPlan
+
+
+class JournaledRun(NamedTuple):
+    first_nonce: Nonce
+    # Hashes of the sent transactions, by index of the step in the plan
+    sent: Dict[int, HexBytes]
+    completed: bool
+    # Why the last attempt of the run failed, if it did
+    error: Optional[str] = None
+
+
+class DeploymentJournal:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @staticmethod
+    def run_id(
+        chain_id: int, sender: ChecksumAddress, contracts_version: str, plan: DeploymentPlan
+    ) -> str:
+        """Identifies the runs of the same plan by the same account on the same chain"""
+        description = json.dumps([chain_id, sender, contracts_version, plan.steps])
+        return encode_hex(keccak(text=description))
+
+    def find_run(self, run_id: str) -> Optional[JournaledRun]:
+        """The last run with `run_id`, if any"""
+        run: Optional[JournaledRun] = None
+        for entry in self._entries():
+            if entry["run"] != run_id:
+                continue
+            if entry["event"] == "started":
+                run = JournaledRun(first_nonce=entry["first_nonce"], sent={}, completed=False)
+            elif run is None:
+                continue
+            elif entry["event"] in ("sent", "mined"):
+                # A resent transaction can be mined with another hash
+                run.sent[entry["index"]] = HexBytes(entry["transaction_hash"])
+            elif entry["event"] == "completed":
+                run = run._replace(completed=True, error=None)
+            elif entry["event"] == "failed":
+                run = run._replace(error=entry["error"])
+        return run
+
+    def started(self, run_id: str, first_nonce: Nonce) -> None:
+        self._append({"event": "started", "run": run_id, "first_nonce": first_nonce})
+
+    def sent(self, run_id: str, index: int, nonce: Nonce, txhash: HexBytes) -> None:
+        self._append(
+            {
+                "event": "sent",
+                "run": run_id,
+                "index": index,
+                "nonce": nonce,
+                "transaction_hash": encode_hex(txhash),
+            }
+        )
+
+    def mined(self, run_id: str, index: int, receipt: TxReceipt) -> None:
+        self._append(
+            {
+                "event": "mined",
+                "run": run_id,
+                "index": index,
+                "transaction_hash": encode_hex(receipt["transactionHash"]),
+                "block_number": receipt["blockNumber"],
+                "contract_address": receipt["contractAddress"],
+            }
+        )
+
+    def completed(self, run_id: str) -> None:
+        self._append({"event": "completed", "run": run_id})
+
+    def failed(self, run_id: str, error: str) -> None:
+        """The run stopped with `error`. It is not completed and can be run again."""
+        self._append({"event": "failed", "run": run_id, "error": error})
+
+    def _entries(self) -> Iterator[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with self.path.open() as journal_file:
+            for line in journal_file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A line is incomplete if writing it was interrupted
+                    continue
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with self.path.open("a+") as journal_file:
+            line = json.dumps(entry) + "\n"
+            # Do not continue an interrupted line
+            if journal_file.tell() > 0:
+                journal_file.seek(journal_file.tell() - 1)
+                if journal_file.read(1) != "\n":
+                    line = "\n" + line
+            journal_file.write(line)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
@@ -0,0 +1,284 @@
+"""Deploy and verify the contracts on several chains at once
+
+A manifest lists the chains with their RPC providers and what to do on each of
+them. Every chain gets its own web3 instance and ContractDeployer, so that the
+nonces of the deployment account are managed per chain, and all chains are
+processed in parallel threads. Deployment files are written per chain, like by
+the single chain commands.
+
+A manifest looks like::
+
+    {
+        "gas_price": 5,
+        "chains": [
+            {
+                "chain": "goerli",
+                "rpc_provider": "http://127.0.0.1:8545",
+                "raiden": {"max_num_of_token_networks": 100},
+                "register": {"tokens": [{"token_address": "0x...",
+                                         "channel_participant_deposit_limit": 1000,
+                                         "token_network_deposit_limit": 10000}]},
+                "services": {"token_address": "0x...", ...},
+                "verify": true
+            }
+        ]
+    }
+
+The parameters of "raiden" and "services" are the arguments of
+`ContractDeployer.deploy_raiden_contracts()` and
+`ContractDeployer.deploy_service_contracts()`. The TokenNetworkRegistry
+deployed by "raiden" is used by "register" and "services", unless they get a
+`token_network_registry_address`.
+
+Every chain may only appear once, since the deployment files are per chain.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypedDict
+
+from eth_utils import to_checksum_address
+from web3 import Web3
+
+from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK_REGISTRY, ID_TO_CHAINNAME
+from raiden_contracts.deploy.contract_deployer import ContractDeployer, TokenRegistration
+from raiden_contracts.utils.rpc import connect
+from raiden_contracts.utils.type_aliases import ChainID, PrivateKey
+
+LOG = getLogger(__name__)
+
+
+class ChainManifest(TypedDict, total=False):
+    chain: str
+    rpc_provider: str
+    gas_price: int
+    gas_limit: int
+    raiden: Dict[str, Any]
+    register: Dict[str, Any]
+    services: Dict[str, Any]
+    verify: bool
+
+
+class Manifest(TypedDict, total=False):
+    gas_price: int
+    gas_limit: int
+    wait: int
+    contracts_version: Optional[str]
+    chains: List[ChainManifest]
+
+
+def load_manifest(path: Path) -> Manifest:
+    """Read a manifest and check that every chain can be told apart and reached"""
+    with path.open() as manifest_file:
+        manifest: Manifest = json.load(manifest_file)
+    if not manifest.get("chains"):
+        raise ValueError(f"{path} does not list any chains")
+    chain_names = set(ID_TO_CHAINNAME.values())
+    labels = []
+    for chain in manifest["chains"]:
+        if "rpc_provider" not in chain:
+            raise ValueError(f"No rpc_provider for {chain}")
+        if "chain" in chain and chain["chain"] not in chain_names:
+            raise ValueError(f"Unknown chain {chain['chain']}")
+        if "raiden" not in chain:
+            # Without a new TokenNetworkRegistry, the steps need an existing one
+            steps = {"register": chain.get("register"), "services": chain.get("services")}
+            for step, parameters in steps.items():
+                if parameters is not None and "token_network_registry_address" not in parameters:
+                    raise ValueError(
+                        f"No token_network_registry_address for {step} on {chain_label(chain)}"
+                    )
+        labels.append(chain_label(chain))
+    if len(labels) != len(set(labels)):
+        raise ValueError(f"A chain appears twice in {labels}")
+    return manifest
+
+
+def chain_label(chain: ChainManifest) -> str:
+    return chain.get("chain") or chain["rpc_provider"]
+
+
+class ChainProgress:
+    """Keeps the stage of every chain and shows all of them on every change"""
+
+    def __init__(self, labels: List[str], echo: Callable[[str], None] = print) -> None:
+        self.echo = echo
+        self.stages: Dict[str, str] = {label: "waiting" for label in labels}
+        self._lock = threading.Lock()
+
+    def update(self, label: str, stage: str) -> None:
+        with self._lock:
+            self.stages[label] = stage
+            self.echo(self.summary())
+
+    def summary(self) -> str:
+        return " | ".join(f"{label}: {stage}" for label, stage in self.stages.items())
+
+
+def deploy_chain(
+    chain: ChainManifest,
+    private_key: PrivateKey,
+    manifest: Manifest,
+    progress: ChainProgress,
+    web3: Optional[Web3] = None,
+) -> Dict[str, Any]:
+    """Do everything the manifest lists for `chain` and return the new addresses"""
+    label = chain_label(chain)
+    threading.current_thread().name = label
+    progress.update(label, "connecting")
+    web3 = web3 or connect(chain["rpc_provider"])
+    chain_id = ChainID(web3.eth.chain_id)
+    if "chain" in chain and ID_TO_CHAINNAME.get(chain_id) != chain["chain"]:
+        raise RuntimeError(f"{chain['rpc_provider']} is connected to chain {chain_id}")
+
+    deployer = ContractDeployer(
+        web3=web3,
+        private_key=private_key,
+        gas_limit=chain.get("gas_limit", manifest.get("gas_limit", 5_500_000)),
+        gas_price=chain.get("gas_price", manifest.get("gas_price", 5)),
+        wait=manifest.get("wait", 300),
+        contracts_version=manifest.get("contracts_version"),
+    )
+    result: Dict[str, Any] = {}
+    token_network_registry_address = None
+
+    if "raiden" in chain:
+        progress.update(label, "deploying raiden contracts")
+        raiden_parameters: Dict[str, Any] = {
+            "reuse_secret_registry_from_deploy_file": None,
+            **chain["raiden"],
+        }
+        raiden_info = deployer.deploy_raiden_contracts(**raiden_parameters)
+        deployer.store_and_verify_deployment_info_raiden(deployed_contracts_info=raiden_info)
+        result["raiden"] = {
+            name: info["address"] for name, info in raiden_info["contracts"].items()
+        }
+        token_network_registry_address = result["raiden"][CONTRACT_TOKEN_NETWORK_REGISTRY]
+
+    if "register" in chain:
+        progress.update(label, "registering tokens")
+        registrations = [
+            TokenRegistration(
+                token_address=to_checksum_address(token["token_address"]),
+                channel_participant_deposit_limit=token["channel_participant_deposit_limit"],
+                token_network_deposit_limit=token["token_network_deposit_limit"],
+            )
+            for token in chain["register"]["tokens"]
+        ]
+        token_networks = deployer.register_token_networks(
+            token_registry_abi=deployer.contract_manager.get_contract_abi(
+                CONTRACT_TOKEN_NETWORK_REGISTRY
+            ),
+            token_registry_address=to_checksum_address(
+                chain["register"].get(
+                    "token_network_registry_address", token_network_registry_address
+                )
+            ),
+            registrations=registrations,
+        )
+        deployer.store_and_verify_token_networks(token_networks)
+        result["token_networks"] = [
+            token_network["token_network_address"] for token_network in token_networks
+        ]
+
+    services_parameters: Optional[Dict[str, Any]] = None
+    if "services" in chain:
+        progress.update(label, "deploying service contracts")
+        services_parameters = {
+            "token_network_registry_address": token_network_registry_address,
+            "reuse_service_registry_from_deploy_file": None,
+            **chain["services"],
+        }
+        services_info = deployer.deploy_service_contracts(**services_parameters)
+        deployer.store_and_verify_deployment_info_services(
+            deployed_contracts_info=services_info,
+            token_address=services_parameters["token_address"],
+            user_deposit_whole_balance_limit=services_parameters[
+                "user_deposit_whole_balance_limit"
+            ],
+            user_deposit_withdraw_timeout=services_parameters["user_deposit_withdraw_timeout"],
+            token_network_registry_address=services_parameters["token_network_registry_address"],
+        )
+        result["services"] = {
+            name: info["address"] for name, info in services_info["contracts"].items()
+        }
+
+    if chain.get("verify"):
+        progress.update(label, "verifying")
+        deployer.verify_deployed_contracts_in_filesystem()
+        if services_parameters:
+            deployer.verify_deployed_service_contracts_in_filesystem(
+                token_address=services_parameters["token_address"],
+                user_deposit_whole_balance_limit=services_parameters[
+                    "user_deposit_whole_balance_limit"
+                ],
+                user_deposit_withdraw_timeout=services_parameters["user_deposit_withdraw_timeout"],
+                token_network_registry_address=services_parameters[
+                    "token_network_registry_address"
+                ],
+            )
+
+    progress.update(label, "done")
+    return result
+
+
+def deploy_chains(
+    manifest: Manifest,
+    private_key: PrivateKey,
+    progress: Optional[ChainProgress] = None,
+    web3_factory: Callable[[str], Web3] = connect,
+) -> Dict[str, Any]:
+    """Run `deploy_chain()` for all chains of `manifest` in parallel
+
+    Returns the result of every chain, or the exception that stopped it. A
+    failing chain does not stop the others. All chains are connected to
+    before deploying anything, and a chain whose provider is connected to the
+    same chain ID as an earlier one in the manifest fails.
+    """
+    labels = [chain_label(chain) for chain in manifest["chains"]]
+    chain_progress = progress or ChainProgress(labels)
+    results: Dict[str, Any] = {}
+    connections: Dict[str, Tuple[Web3, ChainID]] = {}
+
+    def fail(label: str, ex: Exception) -> None:
+        results[label] = ex
+        chain_progress.update(label, f"failed: {ex}")
+
+    def connect_chain(chain: ChainManifest) -> None:
+        label = chain_label(chain)
+        try:
+            web3 = web3_factory(chain["rpc_provider"])
+            connections[label] = (web3, ChainID(web3.eth.chain_id))
+        except Exception as ex:  # pylint: disable=broad-except
+            LOG.exception(f"Connecting to {label} failed")
+            fail(label, ex)
+
+    def run(chain: ChainManifest) -> None:
+        label = chain_label(chain)
+        try:
+            results[label] = deploy_chain(
+                chain, private_key, manifest, chain_progress, connections[label][0]
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            LOG.exception(f"Deployment on {label} failed")
+            fail(label, ex)
+
+    with ThreadPoolExecutor(max_workers=len(labels)) as executor:
+        list(executor.map(connect_chain, manifest["chains"]))
+        label_of_chain_id: Dict[ChainID, str] = {}
+        for label in labels:
+            if label not in connections:
+                continue
+            chain_id = connections[label][1]
+            first = label_of_chain_id.setdefault(chain_id, label)
+            if first != label:
+                del connections[label]
+                fail(label, RuntimeError(f"{first} is already connected to chain {chain_id}"))
+        list(
+            executor.map(
+                run, [chain for chain in manifest["chains"] if chain_label(chain) in connections]
+            )
+        )
+    return {label: results[label] for label in labels}
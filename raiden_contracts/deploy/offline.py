@@ -0,0 +1,385 @@
+"""Sign deployment transactions offline and broadcast them later
+
+For deployment keys that never touch a networked machine, a deployment is split
+in two phases. `BundleSigner` turns deployment plans into signed raw
+transactions without any RPC connection. The chain ID, the first nonce and the
+gas parameters are given. The nonces of the following transactions and the
+addresses of the new contracts follow from them. The signed transactions are
+kept in a bundle file, which grows with every signed command.
+
+`broadcast_bundle()` then sends all transactions of a bundle in one batch from
+a networked machine and waits for their receipts. Transactions the node knows
+already are skipped, so an interrupted broadcast can be repeated.
+"""
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, TypedDict
+
+from eth_account import Account
+from eth_typing import ChecksumAddress, HexAddress, HexStr
+from eth_utils import encode_hex, to_checksum_address
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.rpc_abi import RPC
+from web3.types import Nonce, TxReceipt, Wei
+
+from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK_REGISTRY, DEPLOY_SETTLE_TIMEOUT
+from raiden_contracts.contract_manager import (
+    ContractManager,
+    DeployedContracts,
+    contracts_precompiled_path,
+)
+from raiden_contracts.deploy.contract_deployer import (
+    TokenRegistration,
+    _deployed_data_from_receipt,
+    chain_gas_limit,
+    check_precompiled_against_source,
+    raiden_deployment_plan,
+    service_deployment_plan,
+)
+from raiden_contracts.deploy.deployment_plan import (
+    CallStep,
+    DeploymentPlan,
+    DeployStep,
+    PlannedTransaction,
+)
+from raiden_contracts.utils.profiling import phase
+from raiden_contracts.utils.rpc import batch_request
+from raiden_contracts.utils.transaction import ReceiptTracker
+from raiden_contracts.utils.type_aliases import ChainID, PrivateKey
+
+LOG = getLogger(__name__)
+
+
+class BundledTransaction(TypedDict):
+    contract_name: str
+    # None for the deployment of the contract
+    function_name: Optional[str]
+    # Address of the called or the created contract
+    address: ChecksumAddress
+    args: List[Any]
+    nonce: int
+    hash: HexStr
+    raw_transaction: HexStr
+
+
+class BundleSection(TypedDict):
+    """The transactions of one deploy command"""
+
+    command: str
+    # Deployment data without the contracts deployed by the transactions,
+    # None for sections that deploy nothing
+    deployment: Optional[DeployedContracts]
+    # Values needed to verify the deployment
+    parameters: Dict[str, Any]
+    transactions: List[BundledTransaction]
+
+
+class TransactionBundle(TypedDict):
+    chain_id: int
+    sender: ChecksumAddress
+    contracts_version: str
+    sections: List[BundleSection]
+
+
+def load_bundle(path: Path) -> TransactionBundle:
+    with path.open() as bundle_file:
+        return TransactionBundle(json.load(bundle_file))  # type: ignore
+
+
+class BundleSigner:
+    """Signs deployments into a bundle file, without connecting to a node
+
+    A new bundle needs `chain_id` and `nonce`, the nonce of the first
+    transaction. An existing bundle is extended, continuing its nonces.
+    """
+
+    def __init__(
+        self,
+        private_key: PrivateKey,
+        bundle_path: Path,
+        gas_limit: int,
+        gas_price: int,
+        chain_id: Optional[int] = None,
+        nonce: Optional[int] = None,
+        contracts_version: Optional[str] = None,
+    ) -> None:
+        precompiled_path = contracts_precompiled_path(contracts_version)
+        check_precompiled_against_source(contracts_version, precompiled_path)
+        self.contract_manager = ContractManager(precompiled_path)
+        # Only used to encode transactions, it never connects to a node
+        self.web3 = Web3()
+        self.account = Account.from_key(private_key)
+        self.bundle_path = bundle_path
+        self.gas_limit = gas_limit
+        self.gas_price = Wei(gas_price * 10**9)
+
+        if bundle_path.exists():
+            self.bundle = load_bundle(bundle_path)
+            if self.bundle["sender"] != self.account.address:
+                raise ValueError(
+                    f"{bundle_path} is signed by {self.bundle['sender']}, "
+                    f"not by {self.account.address}"
+                )
+            if chain_id is not None and chain_id != self.bundle["chain_id"]:
+                raise ValueError(f"{bundle_path} is for chain {self.bundle['chain_id']}")
+            if self.bundle["contracts_version"] != self.contract_manager.contracts_version:
+                raise ValueError(
+                    f"{bundle_path} is for contracts version {self.bundle['contracts_version']}"
+                )
+            transactions = self.transactions()
+            self.next_nonce = Nonce(transactions[-1]["nonce"] + 1 if transactions else 0)
+            if nonce is not None and nonce != self.next_nonce:
+                raise ValueError(f"{bundle_path} continues with nonce {self.next_nonce}")
+        else:
+            if chain_id is None or nonce is None:
+                raise ValueError("A new bundle needs the chain ID and the first nonce")
+            self.bundle = TransactionBundle(
+                chain_id=chain_id,
+                sender=self.account.address,
+                contracts_version=self.contract_manager.contracts_version,
+                sections=[],
+            )
+            self.next_nonce = Nonce(nonce)
+
+    @property
+    def chain_id(self) -> ChainID:
+        return ChainID(self.bundle["chain_id"])
+
+    def transactions(self) -> List[BundledTransaction]:
+        return [tx for section in self.bundle["sections"] for tx in section["transactions"]]
+
+    def sign_plan(
+        self,
+        command: str,
+        plan: DeploymentPlan,
+        deployment: Optional[DeployedContracts] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+    ) -> List[PlannedTransaction]:
+        """Sign all transactions of `plan` and add them to the bundle as one section"""
+        planned = plan.resolve(self.account.address, self.next_nonce)
+        self.bundle["sections"].append(
+            BundleSection(
+                command=command,
+                deployment=deployment,
+                parameters=parameters or {},
+                transactions=[self._sign(transaction) for transaction in planned],
+            )
+        )
+        self.next_nonce = Nonce(self.next_nonce + len(planned))
+        return planned
+
+    def _sign(self, transaction: PlannedTransaction) -> BundledTransaction:
+        step = transaction.step
+        tx: Dict[str, Any] = {
+            "nonce": transaction.nonce,
+            "gas": chain_gas_limit(self.chain_id, self.gas_limit),
+            "gasPrice": self.gas_price,
+            "value": 0,
+            "chainId": self.chain_id,
+        }
+        function_name = None
+        if isinstance(step, DeployStep):
+            compiled = self.contract_manager.get_contract(step.contract_name)
+            contract = self.web3.eth.contract(abi=compiled["abi"], bytecode=compiled["bin"])
+            tx["data"] = contract.constructor(*transaction.args).data_in_transaction
+        else:
+            function_name = step.function_name
+            instance = self.web3.eth.contract(
+                abi=self.contract_manager.get_contract_abi(step.contract_name),
+                address=transaction.address,
+            )
+            tx["to"] = transaction.address
+            tx["data"] = instance.encodeABI(fn_name=function_name, args=transaction.args)
+
+        with phase("sign transactions"):
+            signed = self.account.sign_transaction(tx)
+        return BundledTransaction(
+            contract_name=step.contract_name,
+            function_name=function_name,
+            address=transaction.address,
+            args=transaction.args,
+            nonce=transaction.nonce,
+            hash=HexStr(encode_hex(signed.hash)),
+            raw_transaction=HexStr(encode_hex(signed.rawTransaction)),
+        )
+
+    def sign_raiden_contracts(
+        self,
+        max_num_of_token_networks: Optional[int],
+        reuse_secret_registry_from_deploy_file: Optional[Path],
+        settle_timeout: int = DEPLOY_SETTLE_TIMEOUT,
+    ) -> Dict[str, ChecksumAddress]:
+        """Sign the deployment of the raiden contracts and return their future addresses"""
+        plan, deployment = raiden_deployment_plan(
+            contracts_version=self.contract_manager.contracts_version,
+            chain_id=self.chain_id,
+            max_num_of_token_networks=max_num_of_token_networks,
+            reuse_secret_registry_from_deploy_file=reuse_secret_registry_from_deploy_file,
+            settle_timeout=settle_timeout,
+        )
+        return self._sign_deployment("raiden", plan, deployment, {})
+
+    def sign_service_contracts(
+        self,
+        token_address: HexAddress,
+        user_deposit_whole_balance_limit: int,
+        user_deposit_withdraw_timeout: int,
+        service_registry_controller: HexAddress,
+        initial_service_deposit_price: int,
+        service_deposit_bump_numerator: int,
+        service_deposit_bump_denominator: int,
+        decay_constant: int,
+        min_price: int,
+        registration_duration: int,
+        token_network_registry_address: HexAddress,
+        reuse_service_registry_from_deploy_file: Optional[Path],
+    ) -> Dict[str, ChecksumAddress]:
+        """Sign the deployment of the service contracts and return their future addresses"""
+        plan, deployment = service_deployment_plan(
+            contracts_version=self.contract_manager.contracts_version,
+            chain_id=self.chain_id,
+            token_address=token_address,
+            user_deposit_whole_balance_limit=user_deposit_whole_balance_limit,
+            user_deposit_withdraw_timeout=user_deposit_withdraw_timeout,
+            service_registry_controller=service_registry_controller,
+            initial_service_deposit_price=initial_service_deposit_price,
+            service_deposit_bump_numerator=service_deposit_bump_numerator,
+            service_deposit_bump_denominator=service_deposit_bump_denominator,
+            decay_constant=decay_constant,
+            min_price=min_price,
+            registration_duration=registration_duration,
+            token_network_registry_address=token_network_registry_address,
+            reuse_service_registry_from_deploy_file=reuse_service_registry_from_deploy_file,
+        )
+        parameters = dict(
+            token_address=token_address,
+            user_deposit_whole_balance_limit=user_deposit_whole_balance_limit,
+            user_deposit_withdraw_timeout=user_deposit_withdraw_timeout,
+            token_network_registry_address=token_network_registry_address,
+        )
+        return self._sign_deployment("services", plan, deployment, parameters)
+
+    def sign_token_contract(
+        self,
+        token_supply: int,
+        token_decimals: int,
+        token_name: str,
+        token_symbol: str,
+        token_type: str = "CustomToken",
+    ) -> Dict[str, ChecksumAddress]:
+        """Sign the deployment of a token contract and return its future address"""
+        plan = DeploymentPlan(
+            [DeployStep(token_type, [token_supply, token_decimals, token_name, token_symbol])]
+        )
+        deployment: DeployedContracts = {
+            "contracts_version": self.contract_manager.contracts_version,
+            "chain_id": self.chain_id,
+            "contracts": {},
+        }
+        return self._sign_deployment("token", plan, deployment, {})
+
+    def sign_token_network_registrations(
+        self, token_registry_address: ChecksumAddress, registrations: Sequence[TokenRegistration]
+    ) -> None:
+        """Sign createERC20TokenNetwork calls for all `registrations`"""
+        plan = DeploymentPlan(
+            [
+                CallStep(
+                    CONTRACT_TOKEN_NETWORK_REGISTRY,
+                    "createERC20TokenNetwork",
+                    list(registration),
+                    address=token_registry_address,
+                )
+                for registration in registrations
+            ]
+        )
+        self.sign_plan("register", plan)
+
+    def _sign_deployment(
+        self,
+        command: str,
+        plan: DeploymentPlan,
+        deployment: DeployedContracts,
+        parameters: Dict[str, Any],
+    ) -> Dict[str, ChecksumAddress]:
+        planned = self.sign_plan(command, plan, deployment, parameters)
+        addresses = {
+            name: to_checksum_address(info["address"])
+            for name, info in deployment["contracts"].items()
+        }
+        for transaction in planned:
+            if isinstance(transaction.step, DeployStep):
+                addresses[transaction.step.contract_name] = transaction.address
+        return addresses
+
+    def save(self) -> None:
+        """Write the bundle file, replacing it only once it is complete"""
+        tmp_path = self.bundle_path.with_name(self.bundle_path.name + ".tmp")
+        with tmp_path.open("w") as bundle_file:
+            json.dump(self.bundle, bundle_file, indent=2)
+        os.replace(tmp_path, self.bundle_path)
+
+
+def broadcast_bundle(
+    web3: Web3, bundle: TransactionBundle, timeout: int = 180
+) -> List[List[TxReceipt]]:
+    """Send all transactions of `bundle` in one batch and wait until all of them succeed
+
+    Transactions the node already knows, pending or mined, are not sent again,
+    so a broadcast that failed part way can be repeated. Returns the receipts
+    of every section of the bundle.
+    """
+    chain_id = web3.eth.chain_id
+    if chain_id != bundle["chain_id"]:
+        raise RuntimeError(f"The bundle is for chain {bundle['chain_id']}, not for {chain_id}")
+    transactions = [tx for section in bundle["sections"] for tx in section["transactions"]]
+    if not transactions:
+        return [[] for _ in bundle["sections"]]
+    known = batch_request(
+        web3, [(RPC.eth_getTransactionByHash, [tx["hash"]]) for tx in transactions]
+    )
+    unsent = [tx for tx, found in zip(transactions, known) if found is None]
+    if unsent:
+        sender = HexAddress(bundle["sender"])
+        nonce = web3.eth.get_transaction_count(sender, "pending")
+        if nonce != unsent[0]["nonce"]:
+            raise RuntimeError(
+                f"The bundle continues with nonce {unsent[0]['nonce']}, but the next nonce "
+                f"of {sender} is {nonce}. Was the account used after signing?"
+            )
+        batch_request(
+            web3, [(RPC.eth_sendRawTransaction, [tx["raw_transaction"]]) for tx in unsent]
+        )
+    LOG.info(
+        f"Sent {len(unsent)} transactions, {len(transactions) - len(unsent)} were known "
+        "already. Waiting for the receipts"
+    )
+    results = ReceiptTracker(web3, timeout=timeout).wait(
+        [HexBytes(tx["hash"]) for tx in transactions]
+    )
+
+    receipts = iter([receipt for receipt, _ in results])
+    return [[next(receipts) for _ in section["transactions"]] for section in bundle["sections"]]
+
+
+def deployment_from_receipts(
+    section: BundleSection, receipts: Sequence[TxReceipt]
+) -> DeployedContracts:
+    """The deployment data of a section that deploys contracts, after broadcasting it"""
+    assert section["deployment"] is not None
+    deployment: DeployedContracts = json.loads(json.dumps(section["deployment"]))
+    for transaction, receipt in zip(section["transactions"], receipts):
+        if transaction["function_name"] is not None:
+            continue
+        if receipt["contractAddress"] != transaction["address"]:
+            raise RuntimeError(
+                f"{transaction['contract_name']} was deployed to "
+                f"{receipt['contractAddress']} instead of {transaction['address']}"
+            )
+        deployment["contracts"][transaction["contract_name"]] = _deployed_data_from_receipt(
+            receipt=receipt, constructor_arguments=transaction["args"]
+        )
+    return deployment
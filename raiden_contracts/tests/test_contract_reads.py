@@ -0,0 +1,60 @@
+from typing import Callable
+
+from eth_utils import to_checksum_address
+from web3 import Web3
+from web3.contract import Contract
+
+from raiden_contracts.constants import CONTRACT_CUSTOM_TOKEN
+from raiden_contracts.tests.utils import get_random_address
+from raiden_contracts.utils.contract_reads import (
+    ContractCall,
+    read_calls,
+    read_channel_deposits,
+    token_balance_calls,
+    user_deposit_calls,
+)
+
+
+def test_read_calls(
+    web3: Web3,
+    custom_token: Contract,
+    user_deposit_contract: Contract,
+    get_accounts: Callable,
+    deposit_to_udc: Callable,
+) -> None:
+    """Balances of many holders are read in small batches, and failing calls do not spoil them"""
+    holders = get_accounts(3)
+    for i, holder in enumerate(holders):
+        deposit_to_udc(holder, 10 * (i + 1))
+    missing_token = to_checksum_address(get_random_address())
+
+    calls = token_balance_calls([custom_token.address, missing_token], holders)
+    calls += user_deposit_calls(user_deposit_contract.address, holders)
+    # The UserDeposit has no balanceOf, so this call reverts
+    calls.append(
+        ContractCall(
+            CONTRACT_CUSTOM_TOKEN, user_deposit_contract.address, "balanceOf", (holders[0],)
+        )
+    )
+    results = read_calls(web3, calls, batch_size=4)
+
+    assert [result.call for result in results] == calls
+    assert [result.value for result in results[:3]] == [
+        custom_token.functions.balanceOf(holder).call() for holder in holders
+    ]
+    assert all(result.error == f"No contract at {missing_token}" for result in results[3:6])
+    assert [result.value for result in results[6:12]] == [10, 10, 20, 20, 30, 30]
+    assert results[12].value is None and results[12].error
+
+
+def test_read_channel_deposits(
+    web3: Web3,
+    token_network: Contract,
+    get_accounts: Callable,
+    create_channel_and_deposit: Callable,
+) -> None:
+    A, B, C = get_accounts(3)
+    create_channel_and_deposit(A, B, 20, 30)
+
+    results = read_channel_deposits(web3, token_network.address, [(A, B), (B, A), (A, C)])
+    assert [result.value for result in results] == [20, 30, 0]
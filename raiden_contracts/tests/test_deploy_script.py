@@ -14,6 +14,7 @@ from eth_utils import ValidationError, to_checksum_address
 from pyfakefs.fake_filesystem import FakeFilesystem
 from pyfakefs.fake_filesystem_unittest import Patcher
 from web3 import Web3
+from web3._utils.rpc_abi import RPC
 from web3.contract import Contract
 from web3.eth import Eth
 
@@ -34,6 +35,7 @@ from raiden_contracts.deploy.__main__ import (
     ContractVerifier,
     contracts_version_with_max_token_networks,
     error_removed_option,
+    main,
     raiden,
     register,
     services,
@@ -42,6 +44,7 @@ from raiden_contracts.deploy.__main__ import (
     verify,
 )
 from raiden_contracts.deploy.contract_deployer import (
+    TokenRegistration,
     contracts_version_monitoring_service_takes_token_network_registry,
 )
 from raiden_contracts.deploy.contract_verifier import (
@@ -56,6 +59,8 @@ from raiden_contracts.tests.utils.constants import (
     SERVICE_DEPOSIT,
     UINT256_MAX,
 )
+from raiden_contracts.utils.private_key import get_private_key
+from raiden_contracts.utils.rpc import batch_request
 from raiden_contracts.utils.versions import contracts_version_has_initial_service_deposit
 
 GAS_LIMIT = 5860000
@@ -427,19 +432,100 @@ def test_deploy_script_register(
     token_registry_address = deployed_raiden_info["contracts"][CONTRACT_TOKEN_NETWORK_REGISTRY][
         "address"
     ]
-    with patch(
-        "raiden_contracts.deploy.contract_deployer.get_contracts_deployment_info"
-    ) as get_deploy_info_mock:
-        get_deploy_info_mock.return_value = deployed_raiden_info
-        token_network_address = deployer.register_token_network(
-            token_registry_abi=token_registry_abi,
-            token_registry_address=token_registry_address,
-            token_address=token_address,
-            channel_participant_deposit_limit=channel_participant_deposit_limit,
-            token_network_deposit_limit=token_network_deposit_limit,
-        )["token_network_address"]
+    token_network_address = deployer.register_token_network(
+        token_registry_abi=token_registry_abi,
+        token_registry_address=token_registry_address,
+        token_address=token_address,
+        channel_participant_deposit_limit=channel_participant_deposit_limit,
+        token_network_deposit_limit=token_network_deposit_limit,
+    )["token_network_address"]
     assert token_network_address is not None
     assert isinstance(token_network_address, str)
+    token_network_registry = web3.eth.contract(
+        abi=token_registry_abi, address=token_registry_address
+    )
+    assert (
+        token_network_registry.functions.token_to_token_networks(token_address).call()
+        == token_network_address
+    )
+
+
+@pytest.mark.slow
+def test_deploy_script_register_many(
+    web3: Web3,
+    deployer: ContractDeployer,
+    channel_participant_deposit_limit: int,
+    token_network_deposit_limit: int,
+) -> None:
+    """register_token_networks() registers all tokens and reads the addresses from the receipts"""
+    deployed_info = deployer.deploy_raiden_contracts(
+        max_num_of_token_networks=3, reuse_secret_registry_from_deploy_file=None
+    )
+    token_addresses = [
+        deployer.deploy_token_contract(
+            token_supply=TOKEN_SUPPLY,
+            token_decimals=18,
+            token_name=f"TestToken{index}",
+            token_symbol="TTT",
+            token_type="CustomToken",
+        )["CustomToken"]
+        for index in range(3)
+    ]
+    token_registry_abi = deployer.contract_manager.get_contract_abi(
+        CONTRACT_TOKEN_NETWORK_REGISTRY
+    )
+    token_registry_address = deployed_info["contracts"][CONTRACT_TOKEN_NETWORK_REGISTRY]["address"]
+    token_networks = deployer.register_token_networks(
+        token_registry_abi=token_registry_abi,
+        token_registry_address=token_registry_address,
+        registrations=[
+            TokenRegistration(
+                token_address=address,
+                channel_participant_deposit_limit=channel_participant_deposit_limit,
+                token_network_deposit_limit=token_network_deposit_limit,
+            )
+            for address in token_addresses
+        ],
+    )
+
+    token_network_registry = web3.eth.contract(
+        abi=token_registry_abi, address=token_registry_address
+    )
+    assert len(token_networks) == 3
+    for address, token_network in zip(token_addresses, token_networks):
+        assert token_network["constructor_arguments"]["_token_address"] == address
+        assert (
+            token_network["constructor_arguments"]["_secret_registry"]
+            == deployed_info["contracts"][CONTRACT_SECRET_REGISTRY]["address"]
+        )
+        assert (
+            token_network_registry.functions.token_to_token_networks(address).call()
+            == token_network["token_network_address"]
+        )
+
+    # All TokenNetworks are verified with the rest of the deployment
+    deployed_info["token_networks"] = token_networks
+    with patch(
+        "raiden_contracts.deploy.contract_verifier.batch_request", wraps=batch_request
+    ) as mock_batch_request:
+        deployer.verify_token_networks(deployed_info, batch_size=2, max_workers=2)
+    # The first batch also reads the controller of the registry, and its code if needed
+    batch_sizes = {len(call.args[1]) for call in mock_batch_request.call_args_list}
+    assert 7 in batch_sizes
+    assert batch_sizes & {7 * 2 + 1, 7 * 2 + 2}
+    deployer.verify_deployment_data(deployed_info)
+
+    deployed_info_fail = deepcopy(deployed_info)
+    deployed_info_fail["token_networks"][2]["constructor_arguments"][
+        "_token_network_deposit_limit"
+    ] += 1
+    with pytest.raises(RuntimeError, match="token_network_deposit_limit"):
+        deployer.verify_deployment_data(deployed_info_fail)
+
+    deployed_info_fail = deepcopy(deployed_info)
+    deployed_info_fail["token_networks"][1]["token_network_address"] = token_addresses[0]
+    with pytest.raises(RuntimeError, match="wrong code"):
+        deployer.verify_deployment_data(deployed_info_fail)
 
 
 @pytest.mark.slow
@@ -748,6 +834,42 @@ def test_store_and_verify_raiden(
     )
 
 
+@pytest.mark.slow
+def test_verify_reads_the_chain_in_one_batch(
+    deployer: ContractDeployer,
+    deployed_raiden_info: DeployedContracts,
+    deployed_service_info: DeployedContracts,
+    token_address: HexAddress,
+    token_network_registry_contract: Contract,
+) -> None:
+    """Receipts, code hashes and getters of all contracts are read in one batch request"""
+    verifier = ContractVerifier(web3=deployer.web3, contracts_version=deployer.contracts_version)
+    with patch(
+        "raiden_contracts.deploy.contract_verifier.batch_request", wraps=batch_request
+    ) as mock_batch_request, patch.object(Eth, "get_code") as mock_get_code, patch.object(
+        Eth, "call"
+    ) as mock_call:
+        verifier.verify_deployment_data(deployment_data=deployed_raiden_info)
+        # eth-tester does not provide eth_getProof, so the code is read in a second batch
+        assert not verifier.use_proofs
+        assert mock_batch_request.call_count == 2
+        verifier.verify_service_contracts_deployment_data(
+            token_address=token_address,
+            deployed_contracts_info=deployed_service_info,
+            user_deposit_whole_balance_limit=DEPOSIT_LIMIT,
+            user_deposit_withdraw_timeout=WITHDRAW_TIMEOUT,
+            token_network_registry_address=token_network_registry_contract.address,
+        )
+        assert mock_batch_request.call_count == 3
+
+        # The code of verified contracts is not read again
+        verifier.verify_deployment_data(deployment_data=deployed_raiden_info)
+        methods = [method for method, _ in mock_batch_request.call_args.args[1]]
+        assert RPC.eth_getCode not in methods
+    mock_get_code.assert_not_called()
+    mock_call.assert_not_called()
+
+
 @pytest.mark.slow
 def test_store_and_verify_services(
     fs_reload_deployer: FakeFilesystem,
@@ -919,16 +1041,10 @@ def test_deploy_raiden(
 def test_register_script(
     mock_adjust_chain_settings: MagicMock,
     mock_register: MagicMock,
-    deployed_raiden_info: DeployedContracts,
     privkey_file: IO,
 ) -> None:
     """Calling deploy raiden command"""
-    with patch(
-        "raiden_contracts.deploy.contract_deployer.get_contracts_deployment_info"
-    ) as get_deploy_info_mock, patch(
-        "raiden_contracts.deploy.__main__._add_token_network_deploy_info"
-    ) as add_tn_info:
-        get_deploy_info_mock.return_value = deployed_raiden_info
+    with patch.object(ContractVerifier, "store_and_verify_token_networks") as add_tn_info:
         with patch.object(Eth, "get_balance", return_value=1), patch.object(Eth, "chainId", 61):
             runner = CliRunner()
             result = runner.invoke(
@@ -954,8 +1070,164 @@ def test_register_script(
             assert result.exit_code == 0
             mock_adjust_chain_settings.assert_called_once()
             mock_register.assert_called_once()
+            add_tn_info.assert_called_once_with([mock_register.return_value])
+
+
+@patch.object(ContractVerifier, "store_and_verify_deployment_info_raiden")
+@patch.object(ContractDeployer, "deploy_raiden_contracts")
+@patch.object(ContractDeployer, "register_token_network")
+@patch.object(ContractDeployer, "_adjust_chain_settings")
+def test_chained_subcommands_share_session(
+    mock_adjust_chain_settings: MagicMock,
+    mock_register: MagicMock,
+    mock_deploy: MagicMock,
+    mock_verify: MagicMock,
+    privkey_file: IO,
+) -> None:
+    """The key is decrypted once, and register uses the deployer and registry of raiden"""
+    registry_address = "0x90a16f6aEA062c429c85dc4124ee4b24A00bCc9a"
+    mock_deploy.return_value = {
+        "contracts": {CONTRACT_TOKEN_NETWORK_REGISTRY: {"address": registry_address}}
+    }
+    with patch(
+        "raiden_contracts.deploy.__main__.get_private_key", wraps=get_private_key
+    ) as mock_get_private_key, patch.object(
+        ContractVerifier, "store_and_verify_token_networks"
+    ), patch.object(
+        Eth, "get_balance", return_value=1
+    ):
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            [
+                "raiden",
+                "--rpc-provider",
+                "rpc_provider",
+                "--private-key",
+                privkey_file.name,
+                "--max-token-networks",
+                "1",
+                "register",
+                "--rpc-provider",
+                "rpc_provider",
+                "--private-key",
+                privkey_file.name,
+                "--token-address",
+                "0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0",
+                "--channel-participant-deposit-limit",
+                "100",
+                "--token-network-deposit-limit",
+                "200",
+            ],
+            catch_exceptions=False,
+        )
+    assert result.exit_code == 0
+    mock_get_private_key.assert_called_once()
+    mock_adjust_chain_settings.assert_called_once()
+    assert mock_register.call_args.kwargs["token_registry_address"] == registry_address
+
+
+@patch.object(ContractVerifier, "store_and_verify_deployment_info_raiden")
+@patch.object(ContractDeployer, "deploy_raiden_contracts")
+@patch.object(ContractDeployer, "register_token_network")
+@patch.object(ContractDeployer, "_adjust_chain_settings")
+def test_chained_subcommands_keep_addresses_per_provider(
+    mock_adjust_chain_settings: MagicMock,
+    mock_register: MagicMock,
+    mock_deploy: MagicMock,
+    mock_verify: MagicMock,
+    privkey_file: IO,
+) -> None:
+    """register on another RPC provider does not use the registry deployed by raiden"""
+    mock_deploy.return_value = {
+        "contracts": {
+            CONTRACT_TOKEN_NETWORK_REGISTRY: {
+                "address": "0x90a16f6aEA062c429c85dc4124ee4b24A00bCc9a"
+            }
+        }
+    }
+    with patch.object(Eth, "get_balance", return_value=1):
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            [
+                "raiden",
+                "--rpc-provider",
+                "rpc_provider",
+                "--private-key",
+                privkey_file.name,
+                "--max-token-networks",
+                "1",
+                "register",
+                "--rpc-provider",
+                "other_rpc_provider",
+                "--private-key",
+                privkey_file.name,
+                "--token-address",
+                "0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0",
+                "--channel-participant-deposit-limit",
+                "100",
+                "--token-network-deposit-limit",
+                "200",
+            ],
+        )
+    assert isinstance(result.exception, RuntimeError)
+    assert "No TokenNetworkRegistry was specified" in str(result.exception)
+    mock_register.assert_not_called()
+
+
+@patch.object(ContractDeployer, "register_token_networks")
+@patch.object(ContractDeployer, "_adjust_chain_settings")
+def test_register_script_many_tokens(
+    mock_adjust_chain_settings: MagicMock,
+    mock_register: MagicMock,
+    privkey_file: IO,
+) -> None:
+    """Each --token is registered in one call and the deployment file is written once"""
+    token_a = to_checksum_address("0x90a16f6aea062c429c85dc4124ee4b24a00bcc9a")
+    token_b = to_checksum_address("0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0")
+    with patch.object(ContractVerifier, "store_and_verify_token_networks") as add_tn_info:
+        with patch.object(Eth, "get_balance", return_value=1), patch.object(Eth, "chainId", 61):
+            runner = CliRunner()
+            result = runner.invoke(
+                register,
+                [
+                    "--rpc-provider",
+                    "rpc_provider",
+                    "--private-key",
+                    privkey_file.name,
+                    "--token-network-registry-address",
+                    "0x90a16f6aEA062c429c85dc4124ee4b24A00bCc9a",
+                    "--token",
+                    f"{token_a}:100:200",
+                    "--token",
+                    f"{token_b.lower()}:300:400",
+                ],
+                catch_exceptions=False,
+            )
+            assert result.exit_code == 0
+            mock_adjust_chain_settings.assert_called_once()
+            mock_register.assert_called_once()
+            assert mock_register.call_args[1]["registrations"] == [
+                TokenRegistration(token_a, 100, 200),
+                TokenRegistration(token_b, 300, 400),
+            ]
             add_tn_info.assert_called_once()
 
+            result = runner.invoke(
+                register,
+                [
+                    "--rpc-provider",
+                    "rpc_provider",
+                    "--private-key",
+                    privkey_file.name,
+                    "--token",
+                    f"{token_a}:100",
+                ],
+            )
+            assert result.exit_code != 0
+            assert "ADDRESS:PARTICIPANT_LIMIT:NETWORK_LIMIT" in result.output
+
 
 @patch.object(ContractDeployer, "register_token_network")
 @patch.object(ContractDeployer, "_adjust_chain_settings")
@@ -1183,13 +1455,9 @@ def test_verify_script(mock_verify: MagicMock) -> None:
 def test_verify_monitoring_service_deployment_with_wrong_first_constructor_arg(
     token_network_registry_contract: Contract,
 ) -> None:
-    mock_token = MagicMock()
-    mock_token.call.return_value = EMPTY_ADDRESS
-    mock_monitoring_service = MagicMock()
-    mock_monitoring_service.functions.token.return_value = mock_token
     with pytest.raises(RuntimeError):
         _verify_monitoring_service_deployment(
-            monitoring_service=mock_monitoring_service,
+            monitoring_service={"token": EMPTY_ADDRESS},
             constructor_arguments=[FAKE_ADDRESS, 0, 1],
             token_address=EMPTY_ADDRESS,
             service_registry_address=FAKE_ADDRESS,
@@ -1201,13 +1469,9 @@ def test_verify_monitoring_service_deployment_with_wrong_first_constructor_arg(
 def test_verify_monitoring_service_deployment_with_wrong_onchain_token_address(
     token_network_registry_contract: Contract,
 ) -> None:
-    mock_token = MagicMock()
-    mock_token.call.return_value = EMPTY_ADDRESS
-    mock_monitoring_service = MagicMock()
-    mock_monitoring_service.functions.token.return_value = mock_token
     with pytest.raises(RuntimeError):
         _verify_monitoring_service_deployment(
-            monitoring_service=mock_monitoring_service,
+            monitoring_service={"token": EMPTY_ADDRESS},
             constructor_arguments=[FAKE_ADDRESS, 0, 1],
             token_address=FAKE_ADDRESS,
             service_registry_address=EMPTY_ADDRESS,
@@ -1221,14 +1485,9 @@ def test_user_deposit_deployment_with_wrong_one_to_n_address() -> None:
     token_addr = HexAddress(HexStr("0xDa12Dc74D2d0881749CCd9330ac4f0aecda5686a"))
     user_deposit_constructor_arguments = [token_addr, UINT256_MAX]
     wrong_one_to_n_address = FAKE_ADDRESS
-    user_deposit_mock = MagicMock()
-    mock_token_address = MagicMock()
-    mock_token_address.call.return_value = token_addr
-    user_deposit_mock.functions.token.return_value = mock_token_address
-
     with pytest.raises(RuntimeError):
         _verify_user_deposit_deployment(
-            user_deposit=user_deposit_mock,
+            user_deposit={"token": token_addr},
             constructor_arguments=user_deposit_constructor_arguments,
             token_address=token_addr,
             user_deposit_whole_balance_limit=UINT256_MAX,
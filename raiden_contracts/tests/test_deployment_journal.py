@@ -0,0 +1,106 @@
+import json
+from pathlib import Path
+from typing import Any, List
+from unittest.mock import patch
+
+import pytest
+from hexbytes import HexBytes
+from web3 import Web3
+
+from raiden_contracts.constants import CONTRACT_SECRET_REGISTRY, CONTRACT_TOKEN_NETWORK_REGISTRY
+from raiden_contracts.deploy.contract_deployer import ContractDeployer
+from raiden_contracts.deploy.deployment_plan import contract_address_at
+from raiden_contracts.tests.utils.constants import FAUCET_ADDRESS, FAUCET_PRIVATE_KEY
+
+
+def test_interrupted_deployment_is_continued(web3: Web3, tmp_path: Path) -> None:
+    """After a crash, the next run deploys only the missing contracts"""
+    journal_path = tmp_path / "journal.jsonl"
+    first_nonce = web3.eth.get_transaction_count(FAUCET_ADDRESS)
+    deployer = ContractDeployer(
+        web3=web3,
+        private_key=FAUCET_PRIVATE_KEY,
+        gas_limit=5860000,
+        gas_price=1,
+        wait=10,
+        journal_path=journal_path,
+    )
+
+    sent: List[HexBytes] = []
+    send_deployment_transaction = ContractDeployer.send_deployment_transaction
+
+    def crash_after_first(self: ContractDeployer, **kwargs: Any) -> HexBytes:
+        if sent:
+            raise RuntimeError("Deployment interrupted")
+        sent.append(send_deployment_transaction(self, **kwargs))
+        return sent[-1]
+
+    with patch.object(ContractDeployer, "send_deployment_transaction", crash_after_first):
+        with pytest.raises(RuntimeError):
+            deployer.deploy_raiden_contracts(
+                max_num_of_token_networks=1, reuse_secret_registry_from_deploy_file=None
+            )
+
+    deployer = ContractDeployer(
+        web3=web3,
+        private_key=FAUCET_PRIVATE_KEY,
+        gas_limit=5860000,
+        gas_price=1,
+        wait=10,
+        journal_path=journal_path,
+    )
+    deployed = deployer.deploy_raiden_contracts(
+        max_num_of_token_networks=1, reuse_secret_registry_from_deploy_file=None
+    )
+    assert web3.eth.get_transaction_count(FAUCET_ADDRESS) == first_nonce + 2
+    secret_registry = deployed["contracts"][CONTRACT_SECRET_REGISTRY]
+    assert secret_registry["transaction_hash"] == sent[0].hex()
+    assert secret_registry["address"] == contract_address_at(FAUCET_ADDRESS, first_nonce)
+    assert deployed["contracts"][CONTRACT_TOKEN_NETWORK_REGISTRY]["constructor_arguments"][0] == (
+        secret_registry["address"]
+    )
+    deployer.verify_deployment_data(deployed)
+
+    # A completed deployment is not continued, but done again
+    deployer.deploy_raiden_contracts(
+        max_num_of_token_networks=1, reuse_secret_registry_from_deploy_file=None
+    )
+    assert web3.eth.get_transaction_count(FAUCET_ADDRESS) == first_nonce + 4
+
+
+def test_failed_check_is_not_completed(web3: Web3, tmp_path: Path) -> None:
+    """A run whose transactions do not match the plan is journaled as failed, not completed"""
+    journal_path = tmp_path / "journal.jsonl"
+    first_nonce = web3.eth.get_transaction_count(FAUCET_ADDRESS)
+    deployer = ContractDeployer(
+        web3=web3,
+        private_key=FAUCET_PRIVATE_KEY,
+        gas_limit=5860000,
+        gas_price=1,
+        wait=10,
+        journal_path=journal_path,
+    )
+    with patch.object(
+        ContractDeployer,
+        "_check_plan_results",
+        side_effect=RuntimeError("SecretRegistry was deployed to 0x12 instead of 0x34"),
+    ):
+        with pytest.raises(RuntimeError):
+            deployer.deploy_raiden_contracts(
+                max_num_of_token_networks=1, reuse_secret_registry_from_deploy_file=None
+            )
+    assert deployer.journal is not None
+    runs = [
+        deployer.journal.find_run(entry["run"])
+        for entry in map(json.loads, journal_path.read_text().splitlines())
+        if entry["event"] == "failed"
+    ]
+    assert len(runs) == 1 and runs[0] is not None
+    assert not runs[0].completed
+    assert runs[0].error == "SecretRegistry was deployed to 0x12 instead of 0x34"
+
+    # The mined transactions are checked again instead of being sent again
+    deployer.deploy_raiden_contracts(
+        max_num_of_token_networks=1, reuse_secret_registry_from_deploy_file=None
+    )
+    assert web3.eth.get_transaction_count(FAUCET_ADDRESS) == first_nonce + 2
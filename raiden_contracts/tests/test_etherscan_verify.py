@@ -1,7 +1,15 @@
-from typing import Any, Dict, List
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Generator, List
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 
+import pytest
 import requests_mock
 from click.testing import CliRunner
+from eth_utils import to_checksum_address
 from web3.types import ABI
 
 from raiden_contracts.constants import (
@@ -9,6 +17,7 @@ from raiden_contracts.constants import (
     CONTRACT_ONE_TO_N,
     CONTRACT_SECRET_REGISTRY,
     CONTRACT_SERVICE_REGISTRY,
+    CONTRACT_TOKEN_NETWORK,
     CONTRACT_TOKEN_NETWORK_REGISTRY,
     CONTRACT_USER_DEPOSIT,
     DeploymentModule,
@@ -19,13 +28,25 @@ from raiden_contracts.contract_manager import (
     DeployedContracts,
     contracts_precompiled_path,
 )
+from raiden_contracts.contract_source_manager import (
+    contracts_source_path,
+    contracts_source_path_of_deployment_module,
+)
 from raiden_contracts.deploy.etherscan_verify import (
+    Submission,
+    TokenBucket,
     api_of_chain_id,
     etherscan_verify,
     get_constructor_args,
     guid_status,
     join_sources,
+    source_graph,
+    summary_table,
+    verify_contracts,
 )
+from raiden_contracts.tests.utils import FAKE_ADDRESS
+from raiden_contracts.utils.join_contracts import main as join_contracts
+from raiden_contracts.utils.type_aliases import ChainID
 
 contract_name = "DummyContract"
 
@@ -92,6 +113,71 @@ def test_run_join_contracts() -> None:
     join_sources(DeploymentModule.SERVICES, CONTRACT_USER_DEPOSIT)
 
 
+def test_join_sources_in_process(tmp_path: Path) -> None:
+    """join_sources() gives the output of join_contracts.py, once per contract"""
+    join_sources.cache_clear()
+    source_graph.cache_clear()
+    import_map = {
+        module: str(path) for module, path in contracts_source_path(contracts_version=None).items()
+    }
+    contract_path = contracts_source_path_of_deployment_module(DeploymentModule.RAIDEN).joinpath(
+        CONTRACT_TOKEN_NETWORK + ".sol"
+    )
+    joined_file = tmp_path / "joined.sol"
+    result = CliRunner().invoke(
+        join_contracts,
+        ["--import-map", json.dumps(import_map), str(contract_path), str(joined_file)],
+    )
+    assert result.exit_code == 0
+
+    joined = join_sources(DeploymentModule.RAIDEN, CONTRACT_TOKEN_NETWORK)
+    assert joined == joined_file.read_text()
+    assert join_sources(DeploymentModule.RAIDEN, CONTRACT_TOKEN_NETWORK) is joined
+
+    # Files imported by several contracts are parsed once
+    parsed = dict(source_graph().files)
+    join_sources(DeploymentModule.RAIDEN, CONTRACT_TOKEN_NETWORK_REGISTRY)
+    assert all(source_graph().files[path] is source for path, source in parsed.items())
+
+
+def test_standard_json_input(tmp_path: Path) -> None:
+    """The standard-JSON input has every imported file under its import name"""
+    graph = source_graph()
+    contract_path = contracts_source_path_of_deployment_module(DeploymentModule.RAIDEN).joinpath(
+        CONTRACT_TOKEN_NETWORK_REGISTRY + ".sol"
+    )
+    standard_json = graph.standard_json_input(str(contract_path))
+    assert set(standard_json["sources"]) == {
+        "raiden/TokenNetworkRegistry.sol",
+        "raiden/TokenNetwork.sol",
+        "raiden/Token.sol",
+        "raiden/Utils.sol",
+        "raiden/Controllable.sol",
+        "raiden/SecretRegistry.sol",
+        "lib/ECVerify.sol",
+        "lib/MessageType.sol",
+    }
+    assert (
+        standard_json["sources"]["raiden/Token.sol"]["content"]
+        == Path(graph.resolve("raiden/Token.sol")).read_text()
+    )
+    assert standard_json["settings"]["optimizer"] == {"enabled": True, "runs": 200}
+
+    output_file = tmp_path / "input.json"
+    result = CliRunner().invoke(
+        join_contracts,
+        [
+            "--import-map",
+            json.dumps(graph.import_map),
+            "--standard-json",
+            str(contract_path),
+            str(output_file),
+        ],
+    )
+    assert result.exit_code == 0
+    assert json.loads(output_file.read_text()) == standard_json
+
+
 def test_guid_status() -> None:
     with requests_mock.Mocker() as m:
         etherscan_api = api_of_chain_id[3]
@@ -283,3 +369,114 @@ def test_etherscan_verify_fail_unknown_contract() -> None:
     assert result.exit_code != 0
     assert result.exception
     assert "unknown contract name" in result.output
+
+
+class FakeExplorer(ThreadingHTTPServer):
+    """Answers like the Etherscan API, verifying every contract at the second poll"""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeExplorerHandler)
+        self.submitted: List[str] = []
+        self.polls: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api"
+
+
+class FakeExplorerHandler(BaseHTTPRequestHandler):
+    server: FakeExplorer
+
+    def do_POST(self) -> None:
+        data = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        address = data["contractaddress"][0]
+        with self.server.lock:
+            self.server.submitted.append(address)
+        self.respond({"status": "1", "message": "OK", "result": f"guid-{address}"})
+
+    def do_GET(self) -> None:
+        guid = parse_qs(urlparse(self.path).query)["guid"][0]
+        with self.server.lock:
+            self.server.polls[guid] = self.server.polls.get(guid, 0) + 1
+            polls = self.server.polls[guid]
+        if guid == f"guid-{FAKE_ADDRESS}":
+            self.respond({"status": "0", "message": "NOTOK", "result": "Fail - Unable to verify"})
+        elif polls < 2:
+            self.respond({"status": "0", "message": "NOTOK", "result": "Pending in queue"})
+        else:
+            self.respond({"status": "1", "message": "OK", "result": "Pass - Verified"})
+
+    def respond(self, content: Dict[str, str]) -> None:
+        body = json.dumps(content).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_explorer() -> Generator[FakeExplorer, None, None]:
+    server = FakeExplorer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_verify_contracts_concurrently(fake_explorer: FakeExplorer) -> None:
+    """All submissions go out first, then the pending GUIDs are polled together"""
+    chain_id = ChainID(5)
+    token_networks = [
+        Submission(
+            contract_name=CONTRACT_TOKEN_NETWORK,
+            address=to_checksum_address(f"0x{index:040x}"),
+            constructor_args="",
+        )
+        for index in range(1, 11)
+    ]
+    failing = Submission(
+        contract_name=CONTRACT_SECRET_REGISTRY, address=FAKE_ADDRESS, constructor_args=""
+    )
+    with patch.dict(api_of_chain_id, {chain_id: fake_explorer.url}):
+        results = verify_contracts(
+            chain_id=chain_id,
+            apikey="API",
+            submissions=token_networks + [failing],
+            limiter=TokenBucket(rate=100, capacity=10),
+            poll_interval=0.01,
+        )
+
+    assert sorted(fake_explorer.submitted) == sorted(s.address for s in token_networks + [failing])
+    assert all(results[submission] == "Pass - Verified" for submission in token_networks)
+    assert results[failing] == "Fail - Unable to verify"
+    # Every GUID is polled until it has a result, and not more
+    assert set(fake_explorer.polls.values()) == {1, 2}
+    table = summary_table(results)
+    assert len(table.splitlines()) == 12
+    assert f"{FAKE_ADDRESS} Fail - Unable to verify" in table
+
+
+def test_token_bucket() -> None:
+    """After a burst of `capacity`, requests are let through at `rate` per second"""
+    now = [0.0]
+    sleeps: List[float] = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = TokenBucket(rate=5, capacity=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(5):
+        limiter.take()
+    assert sleeps == pytest.approx([0.2, 0.2, 0.2])
+
+    now[0] += 10
+    limiter.take()
+    limiter.take()
+    assert len(sleeps) == 3
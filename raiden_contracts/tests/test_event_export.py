@@ -0,0 +1,74 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+from eth_typing.evm import BlockNumber
+from web3 import Web3
+
+from raiden_contracts.constants import CONTRACT_SECRET_REGISTRY, EVENT_SECRET_REVEALED
+from raiden_contracts.contract_manager import ContractManager, contracts_precompiled_path
+from raiden_contracts.tests.fixtures.contracts import deploy_contract_txhash
+from raiden_contracts.tests.utils import call_and_transact
+from raiden_contracts.tests.utils.constants import DEPLOYER_ADDRESS
+from raiden_contracts.utils.event_export import EventExporter, ExportTarget, arrow_type
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_arrow_type() -> None:
+    assert arrow_type("uint256") == pa.decimal256(76, 0)
+    assert arrow_type("uint64") == pa.uint64()
+    assert arrow_type("int8") == pa.int64()
+    assert arrow_type("address") == pa.string()
+    assert arrow_type("bytes32") == pa.binary(32)
+    assert arrow_type("bytes") == pa.binary()
+    assert arrow_type("uint256[]") == pa.list_(pa.decimal256(76, 0))
+    with pytest.raises(ValueError):
+        arrow_type("fixed128x18")
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_event_export_is_incremental(web3: Web3, tmp_path: Path, file_format: str) -> None:
+    """Events end up in typed columns and a second export only adds newer blocks"""
+    manager = ContractManager(contracts_precompiled_path())
+    txhash, secret_registry = deploy_contract_txhash(
+        web3, manager, DEPLOYER_ADDRESS, CONTRACT_SECRET_REGISTRY
+    )
+    target = ExportTarget(
+        contract_name=CONTRACT_SECRET_REGISTRY,
+        address=secret_registry.address,
+        start_block=web3.eth.get_transaction_receipt(txhash)["blockNumber"],
+    )
+    secrets = [bytes([i]) * 32 for i in range(1, 4)]
+    call_and_transact(secret_registry.functions.registerSecretBatch(secrets[:2]))
+
+    def read(path: Path) -> Any:
+        if file_format == "parquet":
+            return pq.read_table(path)
+        with pa.memory_map(str(path)) as source:
+            return pa.ipc.open_file(source).read_all()
+
+    exporter = EventExporter(web3, manager, tmp_path, file_format, blocks_per_file=4)
+    assert exporter.export([target], to_block=web3.eth.block_number) == {target.address: 2}
+    event_dir = tmp_path / CONTRACT_SECRET_REGISTRY / EVENT_SECRET_REVEALED
+    (first_file,) = event_dir.iterdir()
+    table = read(first_file)
+    assert table.schema.field("secrethash").type == pa.binary(32)
+    assert table.schema.field("secret").type == pa.binary(32)
+    assert table.column("secret").to_pylist() == secrets[:2]
+    assert table.column("address").to_pylist() == [secret_registry.address] * 2
+
+    call_and_transact(secret_registry.functions.registerSecret(secrets[2]))
+    # A new exporter resumes from the state file
+    exporter = EventExporter(web3, manager, tmp_path, file_format, blocks_per_file=4)
+    to_block = BlockNumber(web3.eth.block_number)
+    assert exporter.export([target], to_block=to_block) == {target.address: 1}
+    assert exporter.export([target], to_block=to_block) == {target.address: 0}
+
+    files = sorted(event_dir.iterdir())
+    assert files[0] == first_file
+    assert [read(path).column("secret").to_pylist() for path in files] == [
+        secrets[:2],
+        secrets[2:],
+    ]
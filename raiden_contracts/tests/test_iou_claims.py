@@ -0,0 +1,74 @@
+from typing import Callable
+
+from web3 import Web3
+from web3.contract import Contract
+
+from raiden_contracts.tests.utils import call_and_transact
+from raiden_contracts.utils.iou_claims import iou_from_dict, plan_bulk_claims
+
+
+def test_plan_bulk_claims(
+    web3: Web3,
+    user_deposit_contract: Contract,
+    one_to_n_contract: Contract,
+    service_registry: Contract,
+    deposit_to_udc: Callable,
+    get_accounts: Callable,
+    create_account: Callable,
+    create_service_account: Callable,
+    make_iou: Callable,
+    get_block_timestamp: Callable,
+) -> None:
+    """Only IOUs which can be fully claimed are sent, and all of them succeed"""
+    (A, B, C) = get_accounts(3)
+    deposit_to_udc(A, 30)
+    deposit_to_udc(B, 10)
+    receivers = [create_service_account() for _ in range(4)]
+    unregistered = create_account()
+    now = get_block_timestamp()
+
+    claimed_before = make_iou(A, receivers[3], amount=5)
+    call_and_transact(
+        one_to_n_contract.functions.claim(*claimed_before.values()), {"from": receivers[3]}
+    )
+    ious = [
+        make_iou(A, receivers[0], amount=10),
+        make_iou(A, receivers[1], amount=15),
+        make_iou(B, receivers[0], amount=10),
+        make_iou(B, receivers[1], amount=10, claimable_until=now + 200),
+        make_iou(C, receivers[0], amount=10),
+        make_iou(A, receivers[2], amount=1, claimable_until=now - 1),
+        claimed_before,
+        make_iou(A, unregistered, amount=1),
+        make_iou(receivers[0], receivers[0], amount=1),
+        {**make_iou(B, receivers[2], amount=1), "amount": 2},
+    ]
+
+    plan = plan_bulk_claims(
+        web3,
+        [iou_from_dict(iou) for iou in ious],
+        one_to_n=one_to_n_contract.address,
+        user_deposit=user_deposit_contract.address,
+        service_registry=service_registry.address,
+        now=now,
+        gas_limit=1_000_000,
+    )
+
+    assert len(plan.claims) == 1
+    assert {(iou.sender, iou.receiver) for iou, _ in plan.dropped} == {
+        (B, receivers[1]),
+        (C, receivers[0]),
+        (A, receivers[2]),
+        (A, receivers[3]),
+        (A, unregistered),
+        (receivers[0], receivers[0]),
+        (B, receivers[2]),
+    }
+    call_and_transact(
+        one_to_n_contract.functions.bulkClaim(*plan.claims[0].arguments()),
+        {"from": receivers[0]},
+    )
+    assert user_deposit_contract.functions.balances(A).call() == 0
+    assert user_deposit_contract.functions.balances(B).call() == 0
+    assert user_deposit_contract.functions.balances(receivers[0]).call() == 20
+    assert user_deposit_contract.functions.balances(receivers[1]).call() == 15
@@ -0,0 +1,106 @@
+from typing import List
+
+import pytest
+from pyfakefs.fake_filesystem_unittest import Patcher
+from web3 import Web3
+
+import raiden_contracts.contract_manager
+from raiden_contracts.constants import CONTRACT_SERVICE_REGISTRY, CONTRACT_TOKEN_NETWORK_REGISTRY
+from raiden_contracts.contract_manager import contracts_deployed_path, contracts_precompiled_path
+from raiden_contracts.deploy.contract_deployer import ContractDeployer
+from raiden_contracts.deploy.multichain import ChainProgress, Manifest, deploy_chains
+from raiden_contracts.tests.utils.constants import (
+    FAUCET_ADDRESS,
+    FAUCET_PRIVATE_KEY,
+    SECONDS_PER_DAY,
+)
+from raiden_contracts.utils.type_aliases import ChainID
+
+
+def unreachable(rpc_provider: str) -> Web3:
+    raise ConnectionError(f"{rpc_provider} is down")
+
+
+@pytest.mark.slow
+def test_deploy_chains(web3: Web3) -> None:
+    """Everything listed for a chain is deployed, a failing chain does not stop the others"""
+    token_type = "CustomToken"
+    token_address = ContractDeployer(
+        web3=web3, private_key=FAUCET_PRIVATE_KEY, gas_limit=5860000, gas_price=1, wait=10
+    ).deploy_token_contract(
+        token_supply=10**26,
+        token_decimals=18,
+        token_name="TestToken",
+        token_symbol="TTT",
+        token_type=token_type,
+    )[
+        token_type
+    ]
+    manifest: Manifest = {
+        "gas_limit": 5860000,
+        "gas_price": 1,
+        "wait": 10,
+        "chains": [
+            {
+                "rpc_provider": "tester",
+                "raiden": {"max_num_of_token_networks": 1},
+                "register": {
+                    "tokens": [
+                        {
+                            "token_address": token_address,
+                            "channel_participant_deposit_limit": 100,
+                            "token_network_deposit_limit": 1000,
+                        }
+                    ]
+                },
+                "services": {
+                    "token_address": token_address,
+                    "user_deposit_whole_balance_limit": 10**20,
+                    "user_deposit_withdraw_timeout": 25 * 60,
+                    "service_registry_controller": FAUCET_ADDRESS,
+                    "initial_service_deposit_price": 1000,
+                    "service_deposit_bump_numerator": 6,
+                    "service_deposit_bump_denominator": 5,
+                    "decay_constant": 200 * SECONDS_PER_DAY,
+                    "min_price": 1000,
+                    "registration_duration": 180 * SECONDS_PER_DAY,
+                },
+                "verify": True,
+            },
+            {"rpc_provider": "down", "raiden": {"max_num_of_token_networks": 1}},
+            {"rpc_provider": "tester again", "raiden": {"max_num_of_token_networks": 1}},
+        ],
+    }
+    shown: List[str] = []
+    progress = ChainProgress(["tester", "down", "tester again"], echo=shown.append)
+
+    with Patcher(modules_to_reload=[raiden_contracts.contract_manager]) as patcher:
+        assert patcher.fs is not None
+        patcher.fs.add_real_directory(
+            contracts_precompiled_path(version=None).parent, read_only=False
+        )
+        results = deploy_chains(
+            manifest,
+            FAUCET_PRIVATE_KEY,
+            progress=progress,
+            web3_factory=lambda rpc_provider: web3
+            if rpc_provider.startswith("tester")
+            else unreachable(rpc_provider),
+        )
+        deployment_file = contracts_deployed_path(
+            chain_id=ChainID(web3.eth.chain_id), version=None
+        )
+        assert deployment_file.exists()
+
+    assert isinstance(results["down"], ConnectionError)
+    assert isinstance(results["tester again"], RuntimeError)
+    tester = results["tester"]
+    assert web3.eth.get_code(tester["raiden"][CONTRACT_TOKEN_NETWORK_REGISTRY])
+    assert web3.eth.get_code(tester["services"][CONTRACT_SERVICE_REGISTRY])
+    assert len(tester["token_networks"]) == 1
+    assert progress.stages == {
+        "tester": "done",
+        "down": "failed: down is down",
+        "tester again": f"failed: tester is already connected to chain {web3.eth.chain_id}",
+    }
+    assert "tester: verifying" in " ".join(shown)
@@ -0,0 +1,162 @@
+from pathlib import Path
+from typing import IO
+
+import pytest
+import rlp
+from click.testing import CliRunner
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.types import Wei
+
+from raiden_contracts.constants import (
+    CONTRACT_CUSTOM_TOKEN,
+    CONTRACT_SECRET_REGISTRY,
+    CONTRACT_TOKEN_NETWORK_REGISTRY,
+    ID_TO_CHAINNAME,
+)
+from raiden_contracts.deploy.__main__ import raiden
+from raiden_contracts.deploy.contract_deployer import (
+    TokenRegistration,
+    chain_gas_limit,
+    token_networks_from_receipts,
+)
+from raiden_contracts.deploy.offline import (
+    BundleSigner,
+    broadcast_bundle,
+    deployment_from_receipts,
+    load_bundle,
+)
+from raiden_contracts.tests.utils.constants import FAUCET_ADDRESS, FAUCET_PRIVATE_KEY
+from raiden_contracts.utils.type_aliases import ChainID
+
+
+def test_offline_bundle_deploys_and_registers(web3: Web3, tmp_path: Path) -> None:
+    """A bundle signed without a node deploys the contracts at the predicted addresses"""
+    bundle_path = tmp_path / "bundle.json"
+    signer = BundleSigner(
+        private_key=FAUCET_PRIVATE_KEY,
+        bundle_path=bundle_path,
+        gas_limit=5_860_000,
+        gas_price=1,
+        chain_id=web3.eth.chain_id,
+        nonce=web3.eth.get_transaction_count(FAUCET_ADDRESS),
+    )
+    token_address = signer.sign_token_contract(10**25, 18, "TestToken", "TTT")[
+        CONTRACT_CUSTOM_TOKEN
+    ]
+    signer.save()
+
+    # A second signer continues the bundle
+    signer = BundleSigner(
+        private_key=FAUCET_PRIVATE_KEY, bundle_path=bundle_path, gas_limit=5_860_000, gas_price=1
+    )
+    raiden_addresses = signer.sign_raiden_contracts(
+        max_num_of_token_networks=1, reuse_secret_registry_from_deploy_file=None
+    )
+    registration = TokenRegistration(token_address, 10**20, 10**22)
+    signer.sign_token_network_registrations(
+        raiden_addresses[CONTRACT_TOKEN_NETWORK_REGISTRY], [registration]
+    )
+    signer.save()
+
+    bundle = load_bundle(bundle_path)
+    assert [section["command"] for section in bundle["sections"]] == [
+        "token",
+        "raiden",
+        "register",
+    ]
+    # The first transaction was sent already by an interrupted broadcast
+    web3.eth.send_raw_transaction(bundle["sections"][0]["transactions"][0]["raw_transaction"])
+    token_receipts, raiden_receipts, register_receipts = broadcast_bundle(web3, bundle)
+
+    assert web3.eth.get_code(token_address)
+    raiden_deployment = deployment_from_receipts(bundle["sections"][1], raiden_receipts)
+    for contract_name in [CONTRACT_SECRET_REGISTRY, CONTRACT_TOKEN_NETWORK_REGISTRY]:
+        assert raiden_deployment["contracts"][contract_name]["address"] == (
+            raiden_addresses[contract_name]
+        )
+    token_network_registry = web3.eth.contract(
+        abi=signer.contract_manager.get_contract_abi(CONTRACT_TOKEN_NETWORK_REGISTRY),
+        address=raiden_addresses[CONTRACT_TOKEN_NETWORK_REGISTRY],
+    )
+    (token_network,) = token_networks_from_receipts(
+        token_network_registry, [registration], register_receipts, FAUCET_ADDRESS
+    )
+    assert token_network["token_network_address"] == (
+        token_network_registry.functions.token_to_token_networks(token_address).call()
+    )
+
+    # Broadcasting again sends nothing and finds the same receipts
+    assert broadcast_bundle(web3, bundle)[1] == raiden_receipts
+
+    # Unsent transactions whose nonce was used meanwhile are not sent
+    signer = BundleSigner(
+        private_key=FAUCET_PRIVATE_KEY, bundle_path=bundle_path, gas_limit=5_860_000, gas_price=1
+    )
+    signer.sign_token_contract(10**25, 18, "TestToken", "TTT")
+    web3.eth.send_transaction({"from": FAUCET_ADDRESS, "to": FAUCET_ADDRESS, "value": Wei(1)})
+    with pytest.raises(RuntimeError):
+        broadcast_bundle(web3, signer.bundle)
+
+
+def test_bundle_signer_checks_bundle(tmp_path: Path) -> None:
+    bundle_path = tmp_path / "bundle.json"
+    with pytest.raises(ValueError):
+        BundleSigner(FAUCET_PRIVATE_KEY, bundle_path, gas_limit=1, gas_price=1)
+
+    signer = BundleSigner(
+        FAUCET_PRIVATE_KEY, bundle_path, gas_limit=1, gas_price=1, chain_id=5, nonce=7
+    )
+    signer.sign_token_contract(1, 18, "TestToken", "TTT")
+    signer.save()
+    with pytest.raises(ValueError):
+        BundleSigner(FAUCET_PRIVATE_KEY, bundle_path, gas_limit=1, gas_price=1, chain_id=1)
+    with pytest.raises(ValueError):
+        BundleSigner(FAUCET_PRIVATE_KEY, bundle_path, gas_limit=1, gas_price=1, nonce=7)
+    assert BundleSigner(FAUCET_PRIVATE_KEY, bundle_path, gas_limit=1, gas_price=1).next_nonce == 8
+
+
+def test_bundle_signer_arbitrum_gas_limit(tmp_path: Path) -> None:
+    """Like ContractDeployer, bundles for Arbitrum get the increased gas limit"""
+    arbitrum = next(chain_id for chain_id, name in ID_TO_CHAINNAME.items() if "arbitrum" in name)
+    signer = BundleSigner(
+        FAUCET_PRIVATE_KEY,
+        tmp_path / "bundle.json",
+        gas_limit=5_860_000,
+        gas_price=1,
+        chain_id=arbitrum,
+        nonce=0,
+    )
+    signer.sign_token_contract(1, 18, "TestToken", "TTT")
+    (transaction,) = signer.transactions()
+    # A legacy transaction is [nonce, gasPrice, gas, ...]
+    decoded = rlp.decode(HexBytes(transaction["raw_transaction"]))
+    assert int.from_bytes(decoded[2], "big") == chain_gas_limit(arbitrum, 5_860_000)
+    assert chain_gas_limit(ChainID(5), 5_860_000) == 5_860_000
+
+
+def test_sign_only_does_not_connect(privkey_file: IO, tmp_path: Path) -> None:
+    """`deploy raiden --sign-only` writes a bundle without any node"""
+    bundle_path = tmp_path / "bundle.json"
+    result = CliRunner().invoke(
+        raiden,
+        [
+            "--rpc-provider",
+            "http://unreachable.invalid:8545",
+            "--private-key",
+            privkey_file.name,
+            "--max-token-networks",
+            "1",
+            "--sign-only",
+            str(bundle_path),
+            "--chain-id",
+            "5",
+            "--nonce",
+            "0",
+        ],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    bundle = load_bundle(bundle_path)
+    assert bundle["chain_id"] == 5
+    assert [tx["nonce"] for tx in bundle["sections"][0]["transactions"]] == [0, 1]
@@ -15,7 +15,7 @@ from raiden_contracts.constants import (
     TEST_SETTLE_TIMEOUT,
     MessageTypeId,
 )
-from raiden_contracts.contract_manager import gas_measurements
+from raiden_contracts.contract_manager import GasModel, LinearGasCost, gas_measurements
 from raiden_contracts.tests.utils import call_and_transact
 from raiden_contracts.tests.utils.constants import DEPLOYER_ADDRESS, SERVICE_DEPOSIT, UINT256_MAX
 from raiden_contracts.utils.pending_transfers import get_locked_amount, get_pending_transfers_tree
@@ -64,6 +64,41 @@ def test_gas_json_has_enough_fields(version: Optional[str]) -> None:
     assert set(doc.keys()) == keys
 
 
+@pytest.mark.parametrize("version", [None, "0.50.0", "0.39.0"])
+def test_gas_model_covers_measurements(version: Optional[str]) -> None:
+    """The fitted costs are never below the measured gas, and the budgets are tight"""
+    measurements = gas_measurements(version)
+    model = GasModel.from_version(version)
+    assert set(model.costs) == {
+        "OneToN.bulkClaim",
+        "SecretRegistry.registerSecretBatch",
+        "TokenNetwork.unlock",
+    }
+    for function, items, name in [
+        ("OneToN.bulkClaim", 1, "OneToN.bulkClaim 1 ious"),
+        ("OneToN.bulkClaim", 6, "OneToN.bulkClaim 6 ious"),
+        ("TokenNetwork.unlock", 1, "TokenNetwork.unlock 1 locks"),
+        ("TokenNetwork.unlock", 6, "TokenNetwork.unlock 6 locks"),
+        ("SecretRegistry.registerSecretBatch", 3, "SecretRegistry.registerSecretBatch3"),
+    ]:
+        gas = model.gas(function, items)
+        assert measurements[name] <= gas < measurements[name] + items
+        assert model.max_items(function, gas) == items
+        assert model.max_items(function, gas - 1) == items - 1
+
+    with pytest.raises(KeyError):
+        model.gas("TokenNetwork.openChannel", 1)
+
+
+def test_linear_gas_cost() -> None:
+    cost = LinearGasCost(base=21000, per_item=1000)
+    assert cost.gas(0) == 21000
+    assert cost.max_items(25999) == 4
+    assert cost.max_items(20000) == 0
+    with pytest.raises(ValueError):
+        LinearGasCost(base=21000, per_item=0).max_items(30000)
+
+
 @pytest.fixture
 def print_gas_token_network_registry(
     deploy_tester_contract_txhash: Callable,
@@ -0,0 +1,39 @@
+import pytest
+from eth_utils import to_checksum_address
+from web3 import Web3
+from web3.contract import Contract
+
+from raiden_contracts.tests.utils import get_random_address
+from raiden_contracts.utils.token_ops import (
+    Payment,
+    bulk_transfer,
+    payments_summary,
+    send_payments,
+)
+
+
+def test_bulk_payments(web3: Web3, custom_token: Contract) -> None:
+    """Tokens are minted and transferred to many recipients with pipelined transactions"""
+    sender = web3.eth.accounts[0]
+    recipients = [to_checksum_address(get_random_address()) for _ in range(5)]
+
+    minted = send_payments(web3, sender, custom_token, "mintFor", [Payment(sender, 150)], 10)
+    assert [result.error for result in minted] == [None]
+
+    payments = [Payment(recipient, 10 * (i + 1)) for i, recipient in enumerate(recipients)]
+    nonce = web3.eth.get_transaction_count(sender)
+    results = bulk_transfer(web3, sender, custom_token, payments, 10)
+    assert [result.payment for result in results] == payments
+    assert all(result.error is None for result in results)
+    assert [
+        web3.eth.get_transaction(result.transaction_hash)["nonce"]  # type: ignore
+        for result in results
+    ] == list(range(nonce, nonce + len(payments)))
+    for payment in payments:
+        assert custom_token.functions.balanceOf(payment.address).call() == payment.amount
+    assert payments_summary(results).startswith("5 of 5 payments succeeded (150 tokens)")
+
+    # The balance is checked before anything is sent
+    with pytest.raises(AssertionError, match="Not enough token balances"):
+        bulk_transfer(web3, sender, custom_token, payments, 10)
+    assert web3.eth.get_transaction_count(sender) == nonce + len(payments)
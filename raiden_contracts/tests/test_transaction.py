@@ -1,10 +1,18 @@
-from unittest.mock import Mock
+from typing import List
+from unittest.mock import Mock, patch
 
 import pytest
 from hexbytes import HexBytes
-from web3.types import TxData, TxReceipt, Wei
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+from web3.types import TxData, TxParams, TxReceipt, Wei
 
-from raiden_contracts.utils.transaction import check_successful_tx
+from raiden_contracts.tests.utils import fake_bytes
+from raiden_contracts.utils.transaction import (
+    ReceiptTracker,
+    TransactionPipeline,
+    check_successful_tx,
+)
 
 
 def test_check_successful_tx_with_status_zero() -> None:
@@ -55,3 +63,87 @@ def test_check_successful_tx_successful_case() -> None:
     assert check_successful_tx(web3=web3_mock, txid=txid) == (receipt, txinfo)
     web3_mock.eth.get_transaction_receipt.assert_called_with(txid)
     web3_mock.eth.get_transaction.assert_called_with(txid)
+
+
+def test_receipt_tracker(web3: Web3) -> None:
+    """ReceiptTracker resolves the futures of many transactions like check_successful_tx()"""
+    sender, receiver = list(web3.eth.accounts)[:2]
+    txids = [
+        web3.eth.send_transaction(
+            {"from": sender, "to": receiver, "value": Wei(1), "gas": Wei(30000)}
+        )
+        for _ in range(3)
+    ]
+    # A plain transfer uses all of its 21000 gas, which check_successful_tx() reports
+    failing = web3.eth.send_transaction(
+        {"from": sender, "to": receiver, "value": Wei(1), "gas": Wei(21000)}
+    )
+
+    tracker = ReceiptTracker(web3, timeout=10, poll_interval=0.01)
+    results = tracker.wait(txids)
+    assert results == [check_successful_tx(web3, txid) for txid in txids]
+    with pytest.raises(ValueError, match="Gas is completely used"):
+        tracker.track(failing).result()
+
+
+def test_receipt_tracker_times_out(web3: Web3) -> None:
+    tracker = ReceiptTracker(web3, timeout=0.05, poll_interval=0.01)
+    with pytest.raises(TimeExhausted):
+        tracker.track(HexBytes(fake_bytes(32, "ab"))).result()
+
+
+def test_transaction_pipeline_sends_back_to_back(web3: Web3) -> None:
+    """Transactions get consecutive local nonces, and a failed send leaves no nonce gap"""
+    sender, receiver = list(web3.eth.accounts)[:2]
+    pipeline = TransactionPipeline(web3, sender, timeout=10, resubmit_after=1)
+    nonce = web3.eth.get_transaction_count(sender)
+    transfer = TxParams({"to": receiver, "value": Wei(1), "gas": Wei(30000)})
+
+    first = pipeline.submit(transfer)
+    too_expensive = transfer.copy()
+    too_expensive["value"] = Wei(web3.eth.get_balance(sender) * 2)
+    with pytest.raises(Exception):
+        pipeline.submit(too_expensive)
+    second = pipeline.submit(transfer)
+
+    results = pipeline.wait([first, second])
+    assert [txinfo["nonce"] for _, txinfo in results] == [nonce, nonce + 1]
+
+
+def test_transaction_pipeline_keeps_given_nonce(web3: Web3) -> None:
+    """A transaction with a given nonce is not moved to another nonce when sending fails"""
+    sender, receiver = list(web3.eth.accounts)[:2]
+    pipeline = TransactionPipeline(web3, sender, timeout=10, resubmit_after=1)
+    nonce = web3.eth.get_transaction_count(sender)
+    transfer = TxParams({"to": receiver, "value": Wei(1), "gas": Wei(30000)})
+
+    planned = pipeline.submit(transfer, nonce)
+    with pytest.raises(Exception):
+        pipeline.submit(transfer, nonce)
+    following = pipeline.submit(transfer)
+
+    results = pipeline.wait([planned, following])
+    assert [txinfo["nonce"] for _, txinfo in results] == [nonce, nonce + 1]
+
+
+def test_transaction_pipeline_resubmits_dropped_transaction(web3: Web3) -> None:
+    sender, receiver = list(web3.eth.accounts)[:2]
+    pipeline = TransactionPipeline(web3, sender, timeout=10, resubmit_after=0.05)
+    send_transaction = web3.eth.send_transaction
+    sent: List[TxParams] = []
+
+    def drop_first(transaction: TxParams) -> HexBytes:
+        """The node returns a hash for the first transaction, but forgets it right away"""
+        sent.append(transaction)
+        if len(sent) == 1:
+            return HexBytes(fake_bytes(32, "cc"))
+        return send_transaction(transaction)
+
+    with patch.object(web3.eth, "send_transaction", side_effect=drop_first):
+        txhash = pipeline.submit(TxParams({"to": receiver, "value": Wei(1), "gas": Wei(30000)}))
+        ((receipt, txinfo),) = pipeline.wait([txhash])
+
+    assert len(sent) == 2
+    assert sent[0] == sent[1]
+    assert receipt["status"] == 1
+    assert txinfo["from"] == sender
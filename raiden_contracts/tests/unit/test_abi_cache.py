@@ -0,0 +1,37 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+from eth_typing import ChecksumAddress
+
+from raiden_contracts.tests.utils import get_random_address
+from raiden_contracts.utils.abi_cache import ABI, AbiCache, shipped_abi
+from raiden_contracts.utils.token_ops import MAINNET_WETH_ADDRESS
+from raiden_contracts.utils.type_aliases import ChainID
+
+TOKEN_ABI: ABI = [{"type": "function", "name": "balanceOf", "inputs": [], "outputs": []}]
+
+
+def test_abi_cache(tmp_path: Path) -> None:
+    """ABIs are fetched once per chain and address, and stored once per content"""
+    fetched: List[ChecksumAddress] = []
+
+    def fetch(_chain_id: ChainID, address: ChecksumAddress) -> ABI:
+        fetched.append(address)
+        return TOKEN_ABI
+
+    first, second = get_random_address(), get_random_address()
+    cache = AbiCache(tmp_path, fetch)
+    assert cache.get(ChainID(5), first) == TOKEN_ABI
+    assert cache.get(ChainID(5), second) == TOKEN_ABI
+    assert len(fetched) == 2
+    assert len(list(tmp_path.joinpath("abis").iterdir())) == 1
+
+    def no_fetch(_chain_id: ChainID, _address: ChecksumAddress) -> ABI:
+        raise AssertionError("No fetch expected")
+
+    cache = AbiCache(tmp_path, no_fetch)
+    assert cache.get(ChainID(5), first.lower()) == TOKEN_ABI
+    assert cache.get(ChainID(1), MAINNET_WETH_ADDRESS) == shipped_abi("WETH9")
+    with pytest.raises(AssertionError):
+        cache.get(ChainID(1), first)
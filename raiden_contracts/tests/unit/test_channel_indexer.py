@@ -0,0 +1,153 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from eth_typing import HexAddress, HexStr
+from eth_utils import to_checksum_address
+
+from raiden_contracts.constants import ChannelEvent, ChannelState
+from raiden_contracts.tests.utils import fake_bytes
+from raiden_contracts.utils.channel_indexer import ChannelIndexer
+from raiden_contracts.utils.type_aliases import ChannelID, Timestamp
+
+TOKEN_NETWORK = to_checksum_address("0x" + "11" * 20)
+A = to_checksum_address("0x" + "aa" * 20)
+B = to_checksum_address("0x" + "bb" * 20)
+C = to_checksum_address("0x" + "cc" * 20)
+SETTLE_TIMEOUT = 500
+
+
+def event(name: ChannelEvent, block: int, log_index: int = 0, **args: Any) -> Dict[str, Any]:
+    return {"event": name.value, "blockNumber": block, "logIndex": log_index, "args": args}
+
+
+def channel_history() -> List[Dict[str, Any]]:
+    return [
+        event(ChannelEvent.OPENED, 10, channel_identifier=1, participant1=A, participant2=B),
+        event(ChannelEvent.OPENED, 10, 1, channel_identifier=2, participant1=A, participant2=C),
+        event(ChannelEvent.OPENED, 11, channel_identifier=3, participant1=B, participant2=C),
+        event(ChannelEvent.DEPOSIT, 12, channel_identifier=1, participant=B, total_deposit=70),
+        event(ChannelEvent.WITHDRAW, 13, channel_identifier=1, participant=B, total_withdraw=20),
+        event(
+            ChannelEvent.CLOSED,
+            14,
+            channel_identifier=2,
+            closing_participant=C,
+            nonce=5,
+            balance_hash=fake_bytes(32),
+        ),
+        event(
+            ChannelEvent.CLOSED,
+            15,
+            channel_identifier=3,
+            closing_participant=B,
+            nonce=7,
+            balance_hash=fake_bytes(32),
+        ),
+    ]
+
+
+BLOCK_TIMESTAMPS = {14: Timestamp(1000), 15: Timestamp(2000)}
+
+
+def test_channel_indexer_folds_events() -> None:
+    """Deposits, withdrawals and closes end up in the channel records"""
+    indexer = ChannelIndexer(TOKEN_NETWORK, SETTLE_TIMEOUT)
+    indexer.apply_events(channel_history(), BLOCK_TIMESTAMPS)
+
+    channel = indexer.channels[ChannelID(1)]
+    assert channel.state == ChannelState.OPENED
+    assert channel.deposit_of(B) == 70
+    assert channel.deposit_of(A) == 0
+    assert channel.withdrawal_of(B) == 20
+
+    closed = indexer.channels[ChannelID(2)]
+    assert closed.state == ChannelState.CLOSED
+    assert closed.closing_participant == C
+    assert closed.closing_nonce == 5
+    assert closed.settle_deadline == 1000 + SETTLE_TIMEOUT
+    assert indexer.last_block == 15
+
+
+def test_channel_indexer_queries() -> None:
+    """Channels can be looked up by participant and by settle deadline"""
+    indexer = ChannelIndexer(TOKEN_NETWORK, SETTLE_TIMEOUT)
+    indexer.apply_events(channel_history(), BLOCK_TIMESTAMPS)
+
+    assert [c.channel_identifier for c in indexer.channels_of_participant(A)] == [1, 2]
+    lowercase_c = HexAddress(HexStr(C.lower()))
+    assert [c.channel_identifier for c in indexer.channels_of_participant(lowercase_c)] == [2, 3]
+    assert indexer.channels_of_participant(C, state=ChannelState.OPENED) == []
+
+    assert indexer.channels_closing_before(Timestamp(1500)) == []
+    assert [c.channel_identifier for c in indexer.channels_closing_before(Timestamp(1501))] == [2]
+    assert [c.channel_identifier for c in indexer.channels_closing_before(Timestamp(9999))] == [
+        2,
+        3,
+    ]
+
+    indexer.apply_event(
+        event(
+            ChannelEvent.SETTLED,
+            20,
+            channel_identifier=2,
+            participant1=A,
+            participant1_amount=0,
+            participant1_locksroot=fake_bytes(32),
+            participant2=C,
+            participant2_amount=0,
+            participant2_locksroot=fake_bytes(32),
+        )
+    )
+    assert indexer.channels[ChannelID(2)].state == ChannelState.SETTLED
+    assert [c.channel_identifier for c in indexer.channels_closing_before(Timestamp(9999))] == [3]
+
+
+def test_channel_indexer_balance_proof_update() -> None:
+    """An update of the non-closing participant replaces the nonce of the close"""
+    indexer = ChannelIndexer(TOKEN_NETWORK, SETTLE_TIMEOUT)
+    indexer.apply_events(channel_history(), BLOCK_TIMESTAMPS)
+    assert indexer.channels[ChannelID(2)].closing_nonce == 5
+
+    indexer.apply_event(
+        event(
+            ChannelEvent.BALANCE_PROOF_UPDATED,
+            16,
+            channel_identifier=2,
+            closing_participant=C,
+            nonce=9,
+            balance_hash=fake_bytes(32),
+        )
+    )
+    updated = indexer.channels[ChannelID(2)]
+    assert updated.closing_nonce == 9
+    assert updated.last_block == 16
+    assert updated.state == ChannelState.CLOSED
+
+
+def test_channel_indexer_needs_timestamp_on_close() -> None:
+    indexer = ChannelIndexer(TOKEN_NETWORK, SETTLE_TIMEOUT)
+    with pytest.raises(ValueError):
+        indexer.apply_events(channel_history())
+
+
+def test_channel_indexer_resumes_from_snapshot(tmp_path: Path) -> None:
+    """A snapshot is written periodically and already applied events are skipped on resume"""
+    snapshot = tmp_path / "snapshot.json"
+    history = channel_history()
+    indexer = ChannelIndexer(TOKEN_NETWORK, SETTLE_TIMEOUT, snapshot, snapshot_interval=3)
+    indexer.apply_events(history[:4])
+    assert snapshot.exists()
+
+    resumed = ChannelIndexer.from_snapshot(snapshot)
+    assert resumed.last_position == (12, 0)
+    # Feeding the whole history again must not count the deposit twice
+    resumed.apply_events(history, BLOCK_TIMESTAMPS)
+
+    full = ChannelIndexer(TOKEN_NETWORK, SETTLE_TIMEOUT)
+    full.apply_events(history, BLOCK_TIMESTAMPS)
+    assert resumed.to_dict() == full.to_dict()
+    assert [c.channel_identifier for c in resumed.channels_closing_before(Timestamp(9999))] == [
+        2,
+        3,
+    ]
@@ -0,0 +1,106 @@
+import json
+from typing import AbstractSet, Any, Dict, List
+
+import requests_mock
+from eth_typing import ChecksumAddress
+from eth_utils import to_checksum_address
+from web3 import HTTPProvider, Web3
+
+from raiden_contracts.constants import CONTRACT_CUSTOM_TOKEN
+from raiden_contracts.tests.utils import get_random_address
+from raiden_contracts.utils.contract_reads import (
+    BATCH_SIZE,
+    ContractCall,
+    read_addresses,
+    read_calls,
+    token_balance_calls,
+)
+
+RPC_URL = "http://rpc.test:8545"
+
+
+def random_address() -> ChecksumAddress:
+    return to_checksum_address(get_random_address())
+
+
+class FakeNode:
+    """Answers eth_getCode and eth_call batches, balanceOf returns the holder as a number"""
+
+    def __init__(
+        self, contracts: AbstractSet[ChecksumAddress], reverting: AbstractSet[str] = frozenset()
+    ):
+        self.contracts = contracts
+        self.reverting = reverting
+        self.batches: List[List[Dict[str, Any]]] = []
+
+    def __call__(self, request: Any, context: Any) -> List[Dict[str, Any]]:
+        calls = json.loads(request.body)
+        self.batches.append(calls)
+        return [{"jsonrpc": "2.0", "id": call["id"], **self.respond(call)} for call in calls]
+
+    def respond(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        if call["method"] == "eth_getCode":
+            return {"result": "0x6001" if call["params"][0] in self.contracts else "0x"}
+        holder = call["params"][0]["data"][-40:]
+        if holder in self.reverting:
+            return {"error": {"code": -32000, "message": "execution reverted"}}
+        return {"result": "0x" + holder.rjust(64, "0")}
+
+
+def test_read_calls_batches() -> None:
+    """Calls are split into batches of BATCH_SIZE, all at the same block, results in order"""
+    web3 = Web3(HTTPProvider(RPC_URL))
+    token = random_address()
+    # One eth_getCode for the token and one eth_call per holder
+    holders = [random_address() for _ in range(BATCH_SIZE)]
+    node = FakeNode(contracts={token})
+
+    with requests_mock.Mocker() as m:
+        m.post(RPC_URL, json=node)
+        results = read_calls(web3, token_balance_calls([token], holders), block_identifier=16)
+
+    assert [len(batch) for batch in node.batches] == [BATCH_SIZE, 1]
+    assert {call["params"][-1] for batch in node.batches for call in batch} == {"0x10"}
+    assert [result.error for result in results] == [None] * len(holders)
+    assert [result.value for result in results] == [int(holder, 16) for holder in holders]
+
+    node.batches.clear()
+    with requests_mock.Mocker() as m:
+        m.post(RPC_URL, json=node)
+        read_calls(web3, token_balance_calls([token], holders[:-1]), block_identifier=16)
+    assert [len(batch) for batch in node.batches] == [BATCH_SIZE]
+
+
+def test_read_calls_errors() -> None:
+    """Calls to addresses without code and failing calls only spoil their own results"""
+    web3 = Web3(HTTPProvider(RPC_URL))
+    token, missing = random_address(), random_address()
+    holder, reverting = random_address(), random_address()
+    node = FakeNode(contracts={token}, reverting={reverting[2:].lower()})
+    calls = [
+        ContractCall(CONTRACT_CUSTOM_TOKEN, token, "balanceOf", (holder,)),
+        ContractCall(CONTRACT_CUSTOM_TOKEN, missing, "balanceOf", (holder,)),
+        ContractCall(CONTRACT_CUSTOM_TOKEN, token, "balanceOf", (reverting,)),
+    ]
+
+    with requests_mock.Mocker() as m:
+        m.post(RPC_URL, json=node)
+        results = read_calls(web3, calls, block_identifier=16)
+
+    assert len(node.batches) == 1
+    assert [result.call for result in results] == calls
+    assert results[0].value == int(holder, 16)
+    assert results[0].error is None
+    assert results[1].value is None
+    assert results[1].error == f"No contract at {missing}"
+    assert results[2].value is None
+    assert "execution reverted" in str(results[2].error)
+
+
+def test_read_addresses() -> None:
+    holder, partner = get_random_address(), get_random_address()
+    lines = ["# holders", "", f"{holder}", f" {holder} , {partner}  # with partner"]
+    assert read_addresses(lines) == [
+        (to_checksum_address(holder),),
+        (to_checksum_address(holder), to_checksum_address(partner)),
+    ]
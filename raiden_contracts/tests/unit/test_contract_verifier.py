@@ -0,0 +1,106 @@
+from typing import Any, List
+from unittest.mock import patch
+
+import pytest
+from eth_utils import keccak, to_checksum_address
+from web3 import EthereumTesterProvider, Web3
+from web3._utils.rpc_abi import RPC
+
+from raiden_contracts.constants import CONTRACT_SECRET_REGISTRY
+from raiden_contracts.deploy.contract_verifier import (
+    ContractRead,
+    ContractVerifier,
+    _verify_token_network_deployment,
+)
+from raiden_contracts.tests.utils import get_random_address
+
+
+def secret_registry_read(verifier: ContractVerifier) -> ContractRead:
+    return ContractRead(
+        contract_name=CONTRACT_SECRET_REGISTRY,
+        instance=verifier.web3.eth.contract(
+            abi=verifier.contract_manager.get_contract_abi(CONTRACT_SECRET_REGISTRY),
+            address=to_checksum_address(get_random_address()),
+        ),
+        transaction_hash=None,
+        function_names=[],
+    )
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        {"code": -32601, "message": "the method eth_getProof does not exist/is not available"},
+        {"code": -32000, "message": "Method not found"},
+    ],
+)
+def test_read_contracts_falls_back_without_eth_getproof(error: Any) -> None:
+    verifier = ContractVerifier(web3=Web3(EthereumTesterProvider()))
+    code = b"\x60\x00"
+    batches: List[List] = []
+
+    def batch_request(_web3: Web3, calls: List, return_errors: bool = False) -> List:
+        batches.append([method for method, _ in calls])
+        return [ValueError(error) if method == RPC.eth_getProof else code for method, _ in calls]
+
+    with patch("raiden_contracts.deploy.contract_verifier.batch_request", batch_request):
+        (onchain,) = verifier.read_contracts([secret_registry_read(verifier)])
+
+    assert batches == [[RPC.eth_getProof], [RPC.eth_getCode]]
+    assert onchain.code_hash == keccak(code)
+    assert not verifier.use_proofs
+
+
+@pytest.mark.parametrize(
+    "error", [{"code": -32005, "message": "rate limit exceeded"}, "Internal server error"]
+)
+def test_read_contracts_raises_other_errors(error: Any) -> None:
+    """Only a missing eth_getProof switches to downloading the code"""
+    verifier = ContractVerifier(web3=Web3(EthereumTesterProvider()))
+
+    def batch_request(_web3: Web3, calls: List, return_errors: bool = False) -> List:
+        return [ValueError(error) for _ in calls]
+
+    with patch("raiden_contracts.deploy.contract_verifier.batch_request", batch_request):
+        with pytest.raises(ValueError):
+            verifier.read_contracts([secret_registry_read(verifier)])
+    assert verifier.use_proofs
+
+
+def test_token_network_controller_may_be_the_registry_controller() -> None:
+    """After changeController, the TokenNetwork has the controller of the registry"""
+    owner, new_controller, token, secret_registry = (
+        to_checksum_address(get_random_address()) for _ in range(4)
+    )
+    constructor_arguments = {
+        "_token_address": token,
+        "_secret_registry": secret_registry,
+        "_settle_timeout": 500,
+        "_controller": owner,
+        "_channel_participant_deposit_limit": 100,
+        "_token_network_deposit_limit": 1000,
+    }
+    onchain = {
+        "token": token,
+        "secret_registry": secret_registry,
+        "settle_timeout": 500,
+        "controller": new_controller,
+        "channel_participant_deposit_limit": 100,
+        "token_network_deposit_limit": 1000,
+    }
+
+    def verify(registry_controller: Any) -> None:
+        _verify_token_network_deployment(
+            token_network=onchain,
+            address=token,
+            constructor_arguments=constructor_arguments,
+            secret_registry_address=secret_registry,
+            settle_timeout=500,
+            registry_controller=registry_controller,
+        )
+
+    verify(registry_controller=new_controller)
+    with pytest.raises(RuntimeError, match="controller"):
+        verify(registry_controller=owner)
+    with pytest.raises(RuntimeError, match="controller"):
+        verify(registry_controller=None)
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from hexbytes import HexBytes
+from web3.types import Nonce
+
+from raiden_contracts.deploy.journal import DeploymentJournal
+
+
+def test_journal_survives_interrupted_line(tmp_path: Path) -> None:
+    """An incomplete last line is skipped and does not spoil the following entries"""
+    journal = DeploymentJournal(tmp_path / "journal.jsonl")
+    assert journal.find_run("0x01") is None
+
+    journal.started("0x01", Nonce(4))
+    journal.sent("0x01", 0, Nonce(4), HexBytes("0xaa"))
+    with journal.path.open("a") as journal_file:
+        journal_file.write('{"event": "sent", "run": "0x01", "ind')
+    journal.sent("0x01", 1, Nonce(5), HexBytes("0xbb"))
+
+    run = journal.find_run("0x01")
+    assert run is not None
+    assert run.first_nonce == 4
+    assert run.sent == {0: HexBytes("0xaa"), 1: HexBytes("0xbb")}
+    assert not run.completed
+
+    journal.failed("0x01", "TokenNetworkRegistry was deployed to 0x12 instead of 0x34")
+    run = journal.find_run("0x01")
+    assert run is not None and not run.completed
+    assert run.error == "TokenNetworkRegistry was deployed to 0x12 instead of 0x34"
+
+    journal.completed("0x01")
+    run = journal.find_run("0x01")
+    assert run is not None and run.completed and run.error is None
+
+    # A new run of the same plan starts over
+    journal.started("0x01", Nonce(9))
+    assert journal.find_run("0x01") == (9, {}, False, None)
@@ -0,0 +1,80 @@
+import pytest
+import rlp
+from eth_typing import HexAddress, HexStr
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+from web3.types import Nonce
+
+from raiden_contracts.deploy.deployment_plan import (
+    CallStep,
+    Deployed,
+    DeploymentPlan,
+    DeployStep,
+    contract_address_at,
+)
+
+SENDER = HexAddress(HexStr("0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0"))
+
+
+@pytest.mark.parametrize("nonce", [0, 1, 2, 0x7F, 0x80, 0xFF, 0x100, 2**40])
+def test_contract_address_at(nonce: int) -> None:
+    """The hand-made RLP encoding gives the CREATE address"""
+    expected = keccak(rlp.encode([to_canonical_address(SENDER), nonce]))[12:]
+    assert contract_address_at(SENDER, nonce) == to_checksum_address(expected)
+
+
+def test_contract_address_at_known_values() -> None:
+    assert contract_address_at(SENDER, 0) == to_checksum_address(
+        "0xcd234a471b72ba2f1ccf0a70fcaba648a5eecd8d"
+    )
+    assert contract_address_at(SENDER, 1) == to_checksum_address(
+        "0x343c43a37d37dff08ae8c4a11544c718abb4fcf8"
+    )
+
+
+def test_deployment_plan_orders_and_resolves() -> None:
+    """Steps come after their dependencies and get the predicted addresses as arguments"""
+    plan = DeploymentPlan(
+        [
+            CallStep("UserDeposit", "init", [Deployed("MonitoringService")]),
+            DeployStep("MonitoringService", [Deployed("UserDeposit"), 1]),
+            DeployStep("UserDeposit", []),
+            DeployStep("ServiceRegistry", []),
+        ]
+    )
+    planned = plan.resolve(SENDER, Nonce(7))
+    assert [(t.step.contract_name, t.nonce) for t in planned] == [
+        ("UserDeposit", 7),
+        ("MonitoringService", 8),
+        ("UserDeposit", 9),
+        ("ServiceRegistry", 10),
+    ]
+    user_deposit = contract_address_at(SENDER, 7)
+    monitoring_service = contract_address_at(SENDER, 8)
+    assert planned[0].address == user_deposit
+    assert planned[1].args == [user_deposit, 1]
+    assert planned[2].address == user_deposit
+    assert planned[2].args == [monitoring_service]
+
+
+def test_deployment_plan_rejects_bad_steps() -> None:
+    with pytest.raises(ValueError):
+        DeploymentPlan([DeployStep("A", [Deployed("B")])])
+    with pytest.raises(ValueError):
+        DeploymentPlan([DeployStep("A", []), DeployStep("A", [])])
+    with pytest.raises(ValueError):
+        DeploymentPlan([DeployStep("A", [Deployed("B")]), DeployStep("B", [Deployed("A")])])
+
+
+def test_deployment_plan_calls_existing_contract() -> None:
+    """A call with an address does not need a deployment in the plan"""
+    registry = to_checksum_address("0x90a16f6aea062c429c85dc4124ee4b24a00bcc9a")
+    plan = DeploymentPlan(
+        [
+            CallStep("TokenNetworkRegistry", "createERC20TokenNetwork", [1], address=registry),
+            DeployStep("CustomToken", []),
+        ]
+    )
+    planned = plan.resolve(SENDER, Nonce(3))
+    assert planned[0].address == registry
+    assert planned[0].nonce == 3
+    assert planned[1].address == contract_address_at(SENDER, 4)
@@ -0,0 +1,117 @@
+from typing import Any, List, cast
+
+import pytest
+from eth_abi import encode_abi
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.events import get_event_data
+from web3.exceptions import LogTopicError, MismatchedABI
+from web3.types import ABIEvent, LogReceipt
+
+from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK, ChannelEvent
+from raiden_contracts.contract_manager import ContractManager, contracts_precompiled_path
+from raiden_contracts.tests.utils import fake_bytes
+from raiden_contracts.utils.logs import EventDecoder, get_event_decoder
+
+SAMPLE_VALUES = {
+    "uint256": 2**255 + 17,
+    "address": "0x" + "ab" * 20,
+    "bytes32": fake_bytes(32, "cd"),
+    "bool": True,
+    "string": "a string",
+    "uint256[]": [1, 2, 3],
+}
+
+
+def make_log(event_abi: ABIEvent, values: List[Any]) -> LogReceipt:
+    """Encode `values` into a raw log of the event described by `event_abi`"""
+    inputs = event_abi["inputs"]
+    topics = [HexBytes(event_abi_to_log_topic(event_abi))]  # type: ignore
+    data_types: List[str] = []
+    data_values: List[Any] = []
+    for arg, value in zip(inputs, values):
+        if arg["indexed"]:
+            topics.append(HexBytes(encode_abi([arg["type"]], [value])))
+        else:
+            data_types.append(arg["type"])
+            data_values.append(value)
+    return LogReceipt(  # type: ignore
+        {
+            "topics": topics,
+            "data": "0x" + encode_abi(data_types, data_values).hex(),
+            "logIndex": 3,
+            "transactionIndex": 1,
+            "transactionHash": HexBytes(fake_bytes(32, "01")),
+            "address": "0x" + "ef" * 20,
+            "blockHash": HexBytes(fake_bytes(32, "02")),
+            "blockNumber": 100,
+        }
+    )
+
+
+@pytest.mark.parametrize("event", list(ChannelEvent))
+def test_event_decoder_matches_get_event_data(event: ChannelEvent) -> None:
+    """EventDecoder gives the same results as web3's get_event_data() on TokenNetwork events"""
+    web3 = Web3()
+    manager = ContractManager(contracts_precompiled_path())
+    event_abi = manager.get_event_abi(CONTRACT_TOKEN_NETWORK, event.value)
+    log = make_log(event_abi, [SAMPLE_VALUES[arg["type"]] for arg in event_abi["inputs"]])
+    decoder = EventDecoder(web3.codec, event_abi)
+
+    expected = get_event_data(web3.codec, event_abi, log)
+    assert decoder.decode(log) == expected
+    assert decoder.decode_batch([log, log]) == [expected, expected]
+
+
+def test_event_decoder_with_dynamic_types() -> None:
+    """Arguments that do not fit in one word are decoded through eth_abi"""
+    web3 = Web3()
+    event_abi = ABIEvent(
+        {
+            "anonymous": False,
+            "name": "Dynamic",
+            "type": "event",
+            "inputs": [
+                {"indexed": True, "name": "who", "type": "address"},
+                {"indexed": False, "name": "label", "type": "string"},
+                {"indexed": False, "name": "amounts", "type": "uint256[]"},
+                {"indexed": False, "name": "owner", "type": "address"},
+            ],
+        }
+    )
+    log = make_log(event_abi, [SAMPLE_VALUES[arg["type"]] for arg in event_abi["inputs"]])
+    decoder = EventDecoder(web3.codec, event_abi)
+    assert decoder.decode(log) == get_event_data(web3.codec, event_abi, log)
+
+
+def test_event_decoder_rejects_other_logs() -> None:
+    """Logs of another event or with a wrong number of topics are refused"""
+    web3 = Web3()
+    manager = ContractManager(contracts_precompiled_path())
+    deposit_abi = manager.get_event_abi(CONTRACT_TOKEN_NETWORK, ChannelEvent.DEPOSIT)
+    closed_abi = manager.get_event_abi(CONTRACT_TOKEN_NETWORK, ChannelEvent.CLOSED)
+    log = make_log(closed_abi, [1, SAMPLE_VALUES["address"], 2, fake_bytes(32)])
+
+    with pytest.raises(MismatchedABI):
+        EventDecoder(web3.codec, deposit_abi).decode(log)
+    with pytest.raises(MismatchedABI):
+        EventDecoder(web3.codec, closed_abi).decode({**log, "topics": []})  # type: ignore
+    with pytest.raises(LogTopicError):
+        EventDecoder(web3.codec, closed_abi).decode(
+            {**log, "topics": log["topics"][:-1]}  # type: ignore
+        )
+
+
+def test_get_event_decoder_is_cached() -> None:
+    """get_event_decoder() compiles every event ABI only once"""
+    web3 = Web3()
+    manager = ContractManager(contracts_precompiled_path())
+    event_abi = manager.get_event_abi(CONTRACT_TOKEN_NETWORK, ChannelEvent.OPENED)
+    assert get_event_decoder(web3.codec, event_abi) is get_event_decoder(web3.codec, event_abi)
+    reordered = cast(ABIEvent, dict(reversed(list(event_abi.items()))))
+    assert get_event_decoder(web3.codec, reordered) is get_event_decoder(web3.codec, event_abi)
+    other_codec = Web3().codec
+    assert get_event_decoder(other_codec, event_abi) is not get_event_decoder(
+        web3.codec, event_abi
+    )
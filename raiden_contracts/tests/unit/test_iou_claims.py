@@ -0,0 +1,161 @@
+from typing import Dict, Optional
+
+import pytest
+from eth_typing import ChecksumAddress
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+
+from raiden_contracts.contract_manager import GasModel
+from raiden_contracts.tests.utils import get_random_address, get_random_privkey
+from raiden_contracts.utils.iou_claims import (
+    BULK_CLAIM,
+    IOU,
+    iou_signer,
+    pack_bulk_claims,
+    session_key,
+)
+from raiden_contracts.utils.proofs import sign_one_to_n_iou
+from raiden_contracts.utils.signature import private_key_to_address
+from raiden_contracts.utils.type_aliases import ChainID, PrivateKey, TokenAmount
+
+NOW = 1_600_000_000
+ONE_TO_N = to_checksum_address(get_random_address())
+CHAIN_ID = ChainID(5)
+PRIVATE_KEYS: Dict[ChecksumAddress, PrivateKey] = {}
+
+
+def random_address() -> ChecksumAddress:
+    private_key = get_random_privkey()
+    address = private_key_to_address(private_key)
+    PRIVATE_KEYS[address] = private_key
+    return address
+
+
+def sign(iou: IOU, signer: Optional[ChecksumAddress] = None) -> IOU:
+    signature = sign_one_to_n_iou(
+        PRIVATE_KEYS[signer or iou.sender],
+        sender=iou.sender,
+        receiver=iou.receiver,
+        amount=TokenAmount(iou.amount),
+        claimable_until=iou.claimable_until,
+        one_to_n_address=ONE_TO_N,
+        chain_id=CHAIN_ID,
+    )
+    return iou._replace(signature=signature)
+
+
+def make_iou(
+    sender: ChecksumAddress,
+    amount: int = 10,
+    claimable_until: int = NOW + 100,
+    receiver: Optional[ChecksumAddress] = None,
+) -> IOU:
+    return sign(
+        IOU(
+            sender=sender,
+            receiver=receiver or random_address(),
+            amount=amount,
+            claimable_until=claimable_until,
+            signature=b"",
+        )
+    )
+
+
+def test_session_key() -> None:
+    """The key is keccak(abi.encodePacked(receiver, sender, claimable_until))"""
+    iou = make_iou(random_address())
+    assert session_key(iou) == keccak(
+        to_canonical_address(iou.receiver)
+        + to_canonical_address(iou.sender)
+        + iou.claimable_until.to_bytes(32, "big")
+    )
+
+
+def test_iou_signer() -> None:
+    """The signer is recovered from the message signed by sign_one_to_n_iou"""
+    A, B = random_address(), random_address()
+    iou = make_iou(A)
+    assert iou_signer(iou, ONE_TO_N, CHAIN_ID) == A
+    assert iou_signer(sign(iou, signer=B), ONE_TO_N, CHAIN_ID) == B
+    assert iou_signer(iou, ONE_TO_N, ChainID(1)) != A
+    assert iou_signer(iou._replace(amount=11), ONE_TO_N, CHAIN_ID) != A
+    assert iou_signer(iou._replace(signature=bytes(65)), ONE_TO_N, CHAIN_ID) is None
+
+
+def test_pack_bulk_claims() -> None:
+    """IOUs which cannot be fully claimed are dropped, the others packed by expiration"""
+    model = GasModel.from_version()
+    A, B = random_address(), random_address()
+    expiring_last = make_iou(A, amount=20, claimable_until=NOW + 300)
+    expiring_first = make_iou(A, amount=20, claimable_until=NOW + 50)
+    expired = make_iou(A, claimable_until=NOW - 1)
+    settled = make_iou(B)
+    smaller = make_iou(B, amount=5)
+    larger = sign(smaller._replace(amount=8))
+    unknown_sender = make_iou(random_address())
+    to_self = make_iou(B, receiver=B)
+    unregistered = make_iou(B)
+    forged = sign(make_iou(B, amount=50), signer=A)
+    ious = [expiring_last, expiring_first, expired, settled, smaller, larger, unknown_sender]
+    ious += [to_self, unregistered, forged]
+    ious += [make_iou(B, amount=1, claimable_until=NOW + 200 + i) for i in range(3)]
+
+    plan = pack_bulk_claims(
+        ious,
+        now=NOW,
+        gas_limit=model.gas(BULK_CLAIM, 2),
+        one_to_n=ONE_TO_N,
+        chain_id=CHAIN_ID,
+        balances={A: 30, B: 100},
+        registered={iou.receiver for iou in ious} - {unregistered.receiver},
+        settled={session_key(settled)},
+        gas_model=model,
+    )
+
+    assert dict((iou, reason) for iou, reason in plan.dropped) == {
+        expired: "expired",
+        settled: "session already settled",
+        smaller: "superseded by a larger IOU of the session",
+        unknown_sender: "unknown deposit of the sender",
+        to_self: "sender is the receiver",
+        unregistered: "receiver not registered",
+        forged: "signature mismatch",
+        expiring_last: "insufficient deposit of the sender",
+    }
+    assert [len(claim.senders) for claim in plan.claims] == [2, 2, 1]
+    claimed = [expiring_first, larger] + ious[-3:]
+    assert [amount for claim in plan.claims for amount in claim.amounts] == [
+        iou.amount for iou in claimed
+    ]
+    assert plan.claims[0].signatures == expiring_first.signature + larger.signature
+    assert plan.claims[0].arguments() == (
+        [A, B],
+        [expiring_first.receiver, larger.receiver],
+        [20, 8],
+        [NOW + 50, NOW + 100],
+        expiring_first.signature + larger.signature,
+    )
+    assert all(claim.gas <= model.gas(BULK_CLAIM, 2) for claim in plan.claims)
+
+
+def test_pack_bulk_claims_invalid() -> None:
+    A = random_address()
+    with pytest.raises(ValueError):
+        pack_bulk_claims(
+            [make_iou(A)],
+            now=NOW,
+            gas_limit=50_000,
+            one_to_n=ONE_TO_N,
+            chain_id=CHAIN_ID,
+            balances={A: 10},
+            registered=set(),
+        )
+    with pytest.raises(ValueError):
+        pack_bulk_claims(
+            [make_iou(A)._replace(signature=b"short")],
+            now=NOW,
+            gas_limit=1_000_000,
+            one_to_n=ONE_TO_N,
+            chain_id=CHAIN_ID,
+            balances={A: 10},
+            registered=set(),
+        )
@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from raiden_contracts.deploy.multichain import ChainProgress, load_manifest
+
+
+def write_manifest(path: Path, chains: List[Any]) -> Path:
+    path.write_text(json.dumps({"gas_price": 1, "chains": chains}))
+    return path
+
+
+def test_load_manifest(tmp_path: Path) -> None:
+    manifest_path = tmp_path / "manifest.json"
+    manifest = load_manifest(
+        write_manifest(
+            manifest_path,
+            [{"chain": "goerli", "rpc_provider": "http://goerli"}, {"rpc_provider": "http://dev"}],
+        )
+    )
+    assert [chain["rpc_provider"] for chain in manifest["chains"]] == [
+        "http://goerli",
+        "http://dev",
+    ]
+
+    with pytest.raises(ValueError, match="does not list any chains"):
+        load_manifest(write_manifest(manifest_path, []))
+    with pytest.raises(ValueError, match="No rpc_provider"):
+        load_manifest(write_manifest(manifest_path, [{"chain": "goerli"}]))
+    with pytest.raises(ValueError, match="Unknown chain"):
+        load_manifest(write_manifest(manifest_path, [{"chain": "nochain", "rpc_provider": "x"}]))
+    with pytest.raises(ValueError, match="No token_network_registry_address for register"):
+        load_manifest(
+            write_manifest(
+                manifest_path, [{"rpc_provider": "http://a", "register": {"tokens": []}}]
+            )
+        )
+    load_manifest(
+        write_manifest(
+            manifest_path,
+            [
+                {"rpc_provider": "http://a", "raiden": {}, "register": {"tokens": []}},
+                {
+                    "rpc_provider": "http://b",
+                    "register": {"token_network_registry_address": "0x", "tokens": []},
+                },
+            ],
+        )
+    )
+    with pytest.raises(ValueError, match="appears twice"):
+        load_manifest(
+            write_manifest(
+                manifest_path,
+                [
+                    {"chain": "goerli", "rpc_provider": "http://a"},
+                    {"chain": "goerli", "rpc_provider": "http://b"},
+                ],
+            )
+        )
+
+
+def test_chain_progress() -> None:
+    shown: List[str] = []
+    progress = ChainProgress(["goerli", "mainnet"], echo=shown.append)
+    progress.update("mainnet", "verifying")
+    progress.update("goerli", "done")
+    assert shown == [
+        "goerli: waiting | mainnet: verifying",
+        "goerli: done | mainnet: verifying",
+    ]
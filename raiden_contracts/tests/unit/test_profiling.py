@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import requests_mock
+from click.testing import CliRunner
+
+from raiden_contracts.tests.utils import get_random_address
+from raiden_contracts.utils import profiling
+from raiden_contracts.utils.token_ops import cli
+
+RPC_URL = "http://rpc.test:8545"
+
+
+def test_phases_are_only_recorded_while_profiling() -> None:
+    with profiling.phase("unprofiled"):
+        pass
+    profile = profiling.start()
+    try:
+        for _ in range(3):
+            with profiling.phase("work"):
+                pass
+        profile.record_request("batch", 0.003, calls=["eth_call", "eth_call"])
+    finally:
+        assert profiling.stop() is profile
+
+    summary = profile.summary()
+    assert list(summary["phases"]) == ["work"]
+    assert summary["phases"]["work"]["count"] == 3
+    assert summary["rpc"]["eth_call"]["calls"] == 2
+    assert summary["rpc"]["batch"]["histogram_ms"] == {"<=5": 1}
+    assert "batch" in profile.report()
+
+
+def test_token_ops_profile_json(tmp_path: Path) -> None:
+    """--profile-json writes the RPC calls made by the command"""
+    profile_path = tmp_path / "profile.json"
+
+    def respond(request: Any, _context: Any) -> Dict[str, Any]:
+        call = json.loads(request.body)
+        results = {"eth_chainId": "0x1", "eth_call": "0x" + "00" * 31 + "2a"}
+        return {"jsonrpc": "2.0", "id": call["id"], "result": results[call["method"]]}
+
+    with requests_mock.Mocker() as m:
+        m.post(RPC_URL, json=respond)
+        result = CliRunner().invoke(
+            cli,
+            [
+                "--profile-json",
+                str(profile_path),
+                "balance",
+                "--rpc-url",
+                RPC_URL,
+                "--token-address",
+                get_random_address(),
+                "--address",
+                get_random_address(),
+            ],
+            catch_exceptions=False,
+        )
+    assert result.exit_code == 0
+    assert "42" in result.output
+    profile = json.loads(profile_path.read_text())
+    assert profile["rpc"]["eth_call"]["calls"] == 1
+    assert profile["phases"]["load contracts"]["count"] == 1
+    assert profiling.active() is None
@@ -0,0 +1,118 @@
+import json
+import threading
+from typing import Any, Dict, List
+
+import pytest
+import requests_mock
+from eth_typing import URI, HexStr
+from requests import HTTPError
+from web3 import HTTPProvider, Web3
+from web3._utils.rpc_abi import RPC
+
+from raiden_contracts.utils.rpc import PooledHTTPProvider, batch_request, pooled_session
+
+RPC_URL = "http://rpc.test:8545"
+
+
+def test_batch_request_sends_one_http_request() -> None:
+    """All calls go out in one JSON array, and the results are formatted and put in order"""
+    web3 = Web3(HTTPProvider(RPC_URL))
+
+    def respond(request: Any, context: Any) -> List[Dict[str, Any]]:
+        calls = json.loads(request.body)
+        results = {"eth_blockNumber": "0x10", "eth_getTransactionReceipt": None}
+        # Nodes may answer in any order
+        return [
+            {"jsonrpc": "2.0", "id": call["id"], "result": results[call["method"]]}
+            for call in reversed(calls)
+        ]
+
+    with requests_mock.Mocker() as m:
+        m.post(RPC_URL, json=respond)
+        results = batch_request(
+            web3,
+            [(RPC.eth_blockNumber, []), (RPC.eth_getTransactionReceipt, ["0x" + "ab" * 32])],
+        )
+        assert m.call_count == 1
+    assert results == [16, None]
+
+
+def test_batch_request_raises_on_error() -> None:
+    web3 = Web3(HTTPProvider(RPC_URL))
+    with requests_mock.Mocker() as m:
+        m.post(
+            RPC_URL,
+            json=lambda request, _: [
+                {"jsonrpc": "2.0", "id": json.loads(request.body)[0]["id"], "error": "boom"}
+            ],
+        )
+        with pytest.raises(ValueError):
+            batch_request(web3, [(RPC.eth_blockNumber, [])])
+
+        m.post(RPC_URL, json={"jsonrpc": "2.0", "id": None, "error": "batches not supported"})
+        with pytest.raises(ValueError):
+            batch_request(web3, [(RPC.eth_blockNumber, [])])
+
+
+def test_batch_request_returns_errors() -> None:
+    """With return_errors, a failed call does not spoil the results of the others"""
+    web3 = Web3(HTTPProvider(RPC_URL))
+
+    def respond(request: Any, context: Any) -> List[Dict[str, Any]]:
+        first, second = json.loads(request.body)
+        return [
+            {"jsonrpc": "2.0", "id": first["id"], "error": "execution reverted"},
+            {"jsonrpc": "2.0", "id": second["id"], "result": "0x10"},
+        ]
+
+    with requests_mock.Mocker() as m:
+        m.post(RPC_URL, json=respond)
+        error, block_number = batch_request(
+            web3,
+            [(RPC.eth_call, [{"to": "0x" + "00" * 20}]), (RPC.eth_blockNumber, [])],
+            return_errors=True,
+        )
+    assert isinstance(error, ValueError)
+    assert block_number == 16
+
+
+def test_batch_request_without_calls() -> None:
+    assert batch_request(Web3(HTTPProvider(RPC_URL)), []) == []
+
+
+def test_pooled_provider_retries_transient_errors() -> None:
+    """Reads are retried after transient errors, transactions only if the node rejected them"""
+    web3 = Web3(PooledHTTPProvider(URI(RPC_URL), backoff=0))
+    overloaded = {"status_code": 429}
+    block_number = {"json": {"jsonrpc": "2.0", "id": 0, "result": "0x10"}}
+    block_numbers = {
+        "json": lambda request, _: [
+            {"jsonrpc": "2.0", "id": json.loads(request.body)[0]["id"], "result": "0x10"}
+        ]
+    }
+
+    with requests_mock.Mocker() as m:
+        m.post(RPC_URL, [overloaded, overloaded, block_number])
+        assert web3.eth.block_number == 16
+        assert m.call_count == 3
+
+        m.post(RPC_URL, [overloaded, block_numbers])
+        assert batch_request(web3, [(RPC.eth_blockNumber, [])]) == [16]
+
+        m.post(RPC_URL, [{"status_code": 503}, block_number])
+        with pytest.raises(HTTPError):
+            web3.eth.send_raw_transaction(HexStr("0x00"))
+
+        m.post(RPC_URL, status_code=400)
+        with pytest.raises(HTTPError):
+            web3.eth.block_number  # pylint: disable=pointless-statement
+        assert m.call_count == 3 + 2 + 1 + 1
+
+
+def test_pooled_session_is_shared_by_threads() -> None:
+    sessions: List[Any] = []
+    thread = threading.Thread(target=lambda: sessions.append(pooled_session(RPC_URL)))
+    thread.start()
+    thread.join()
+    assert sessions == [pooled_session(RPC_URL)]
+    assert pooled_session(RPC_URL, pool_size=1) is not sessions[0]
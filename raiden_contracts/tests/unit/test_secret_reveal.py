@@ -0,0 +1,82 @@
+from os import urandom
+
+import pytest
+
+from raiden_contracts.contract_manager import GasModel
+from raiden_contracts.utils.secret_reveal import (
+    REGISTER_SECRET_BATCH,
+    PendingLock,
+    plan_secret_reveals,
+)
+
+NOW = 1_600_000_000
+
+
+def test_plan_secret_reveals_urgent_first() -> None:
+    """Batches are filled up to the gas limit with the most urgent secrets first"""
+    model = GasModel.from_version()
+    gas_limit = model.gas(REGISTER_SECRET_BATCH, 3)
+    locks = [PendingLock(expiration=NOW + 1000 - i, secret=urandom(32)) for i in range(7)]
+
+    plan = plan_secret_reveals(locks, now=NOW, gas_limit=gas_limit, gas_model=model)
+
+    assert plan.missed == []
+    assert [len(batch.secrets) for batch in plan.batches] == [3, 3, 1]
+    urgent_first = [lock.secret for lock in reversed(locks)]
+    assert [secret for batch in plan.batches for secret in batch.secrets] == urgent_first
+    assert [batch.deadline for batch in plan.batches] == [NOW + 994, NOW + 997, NOW + 1000]
+    assert all(batch.gas <= gas_limit for batch in plan.batches)
+    assert plan.batches[2].gas == model.gas(REGISTER_SECRET_BATCH, 1)
+
+
+def test_plan_secret_reveals_deadlines() -> None:
+    """Locks expiring before their batch is mined are missed, shared secrets sent once"""
+    model = GasModel.from_version()
+    shared = urandom(32)
+    expired = PendingLock(expiration=NOW + 10, secret=urandom(32))
+    too_late = PendingLock(expiration=NOW + 25, secret=urandom(32))
+    locks = [
+        PendingLock(expiration=NOW + 20, secret=shared),
+        PendingLock(expiration=NOW + 500, secret=shared),
+        expired,
+        PendingLock(expiration=NOW + 16, secret=urandom(32)),
+        too_late,
+        PendingLock(expiration=NOW + 40, secret=urandom(32)),
+    ]
+
+    plan = plan_secret_reveals(
+        locks,
+        now=NOW,
+        gas_limit=model.gas(REGISTER_SECRET_BATCH, 2),
+        seconds_per_batch=15,
+        gas_model=model,
+    )
+
+    # The first batch is mined at NOW + 15, the second at NOW + 30
+    assert plan.missed == [expired, too_late]
+    assert [batch.secrets for batch in plan.batches] == [
+        [locks[3].secret, shared],
+        [locks[5].secret],
+    ]
+    assert plan.batches[0].deadline == NOW + 16
+
+
+def test_plan_secret_reveals_shared_secret_missed_once() -> None:
+    """A missed lock does not keep its secret from being revealed for a later lock"""
+    shared = urandom(32)
+    missed = PendingLock(expiration=NOW + 10, secret=shared)
+    met = PendingLock(expiration=NOW + 500, secret=shared)
+
+    plan = plan_secret_reveals([missed, met], now=NOW, gas_limit=200_000)
+
+    assert plan.missed == [missed]
+    assert plan.missed[0] is missed
+    assert [batch.secrets for batch in plan.batches] == [[shared]]
+    assert plan.batches[0].deadline == NOW + 500
+
+
+def test_plan_secret_reveals_invalid() -> None:
+    with pytest.raises(ValueError):
+        plan_secret_reveals([PendingLock(NOW + 100, urandom(32))], now=NOW, gas_limit=21000)
+    with pytest.raises(ValueError):
+        plan_secret_reveals([PendingLock(NOW + 100, b"short")], now=NOW, gas_limit=1_000_000)
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pytest
+from eth_utils import to_checksum_address
+
+from raiden_contracts.tests.utils import get_random_address
+from raiden_contracts.utils.token_ops import Payment, read_payments
+
+
+def test_read_payments(tmp_path: Path) -> None:
+    """CSV files with or without a header and both JSON layouts list the same payments"""
+    first, second = get_random_address(), get_random_address()
+    expected = [Payment(to_checksum_address(first), 10), Payment(to_checksum_address(second), 20)]
+
+    with_header = tmp_path / "with_header.csv"
+    with_header.write_text(f"address,amount\n{first},10\n\n{second}, 20\n")
+    without_header = tmp_path / "without_header.csv"
+    without_header.write_text(f"{first},10\n{second},20\n")
+    as_list = tmp_path / "list.json"
+    as_list.write_text(
+        f'[{{"address": "{first}", "amount": 10}}, {{"address": "{second}", "amount": "20"}}]'
+    )
+    as_mapping = tmp_path / "mapping.json"
+    as_mapping.write_text(f'{{"{first}": 10, "{second}": 20}}')
+
+    for path in (with_header, without_header, as_list, as_mapping):
+        assert read_payments(path) == expected
+
+    negative = tmp_path / "negative.csv"
+    negative.write_text(f"{first},-1\n")
+    with pytest.raises(ValueError, match="must be positive"):
+        read_payments(negative)
+    invalid = tmp_path / "invalid.csv"
+    invalid.write_text("0x1234,10\n")
+    with pytest.raises(ValueError):
+        read_payments(invalid)
+    empty = tmp_path / "empty.csv"
+    empty.write_text("address,amount\n")
+    with pytest.raises(ValueError, match="does not list any recipients"):
+        read_payments(empty)
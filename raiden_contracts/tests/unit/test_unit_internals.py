@@ -2,10 +2,15 @@ from itertools import chain, product
 
 import pytest
 from eth_tester.constants import UINT256_MAX, UINT256_MIN
+from eth_utils import encode_hex, keccak
 from web3.contract import Contract
 from web3.exceptions import ValidationError
 
-from raiden_contracts.contract_source_manager import check_runtime_codesize
+from raiden_contracts.contract_manager import ContractManager, contracts_precompiled_path
+from raiden_contracts.contract_source_manager import (
+    add_runtime_code_hashes,
+    check_runtime_codesize,
+)
 
 
 def test_min_uses_usigned(token_network: Contract) -> None:
@@ -33,3 +38,17 @@ def test_too_big_runtime_code() -> None:
     compilation = {"TestContract": {"bin-runtime": "33" * 0x6001}}
     with pytest.raises(RuntimeError):
         check_runtime_codesize(compilation)
+
+
+def test_runtime_code_hashes() -> None:
+    """The stored hash of the runtime code is the codeHash of a deployed contract"""
+    compilation = {"TestContract": {"bin-runtime": "6080"}}
+    add_runtime_code_hashes(compilation)
+    assert compilation["TestContract"]["bin-runtime-hash"] == encode_hex(keccak(b"\x60\x80"))
+
+    for version in [None, "0.37.0"]:
+        manager = ContractManager(contracts_precompiled_path(version))
+        for contract_name, compiled in manager.contracts.items():
+            assert manager.get_runtime_code_hash(contract_name) == encode_hex(
+                keccak(hexstr=compiled["bin-runtime"])
+            )
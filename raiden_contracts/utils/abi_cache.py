@@ -0,0 +1,108 @@
+"""ABIs of contracts which are not part of this package
+
+Some token commands need the ABI of a foreign contract, like WETH. Common ones
+ship in ``data/abis.json``. All others are fetched from the block explorer of
+the chain once and kept in the user cache directory:
+
+    <cache dir>/abis/<keccak of the ABI>.json       the ABIs, stored once per content
+    <cache dir>/addresses/<chain id>/<address>      the keccak of the ABI at an address
+
+Many contracts share an ABI, e.g. all instances of a token contract, so an ABI
+is only stored once.
+"""
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from eth_typing import ChecksumAddress
+from eth_utils import encode_hex, keccak, to_checksum_address
+
+from raiden_contracts.contract_manager import contracts_data_path
+from raiden_contracts.utils.explorer import USER_AGENT, api_of_chain_id
+from raiden_contracts.utils.type_aliases import ChainID
+
+ABI = List[Dict[str, Any]]
+
+
+def shipped_abis_path() -> Path:
+    return contracts_data_path().joinpath("abis.json")
+
+
+@lru_cache(maxsize=None)
+def _shipped_abis() -> Dict[str, Any]:
+    with shipped_abis_path().open() as abis_file:
+        return json.load(abis_file)
+
+
+def shipped_abi(name: str) -> ABI:
+    """The ABI `name` from data/abis.json, e.g. WETH9"""
+    return _shipped_abis()["abis"][name]
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home().joinpath(".cache")
+    return Path(base).joinpath("raiden-contracts")
+
+
+def fetch_from_etherscan(chain_id: ChainID, address: ChecksumAddress) -> ABI:
+    if chain_id not in api_of_chain_id:
+        raise ValueError(f"No block explorer known for chain {chain_id}")
+    response = requests.get(
+        api_of_chain_id[chain_id],
+        {"module": "contract", "action": "getabi", "address": address},
+        headers={"User-Agent": USER_AGENT},
+        timeout=30,
+    )
+    response.raise_for_status()
+    content = response.json()
+    if content.get("status") != "1":
+        raise ValueError(f"Fetching the ABI of {address} failed: {content.get('result')}")
+    return json.loads(content["result"])
+
+
+class AbiCache:
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        fetch: Callable[[ChainID, ChecksumAddress], ABI] = fetch_from_etherscan,
+    ) -> None:
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.fetch = fetch
+
+    def get(self, chain_id: ChainID, address: str) -> ABI:
+        """The ABI of the contract at `address`, fetched if it is neither shipped nor cached"""
+        address = to_checksum_address(address)
+        shipped = _shipped_abis()["addresses"].get(str(chain_id), {}).get(address)
+        if shipped:
+            return shipped_abi(shipped)
+
+        index_path = self.cache_dir.joinpath("addresses", str(chain_id), address)
+        if index_path.exists():
+            abi_path = self._abi_path(index_path.read_text().strip())
+            if abi_path.exists():
+                with abi_path.open() as abi_file:
+                    return json.load(abi_file)
+
+        abi = self.fetch(chain_id, address)
+        self.store(chain_id, address, abi)
+        return abi
+
+    def store(self, chain_id: ChainID, address: ChecksumAddress, abi: ABI) -> None:
+        content = json.dumps(abi, sort_keys=True)
+        abi_hash = encode_hex(keccak(text=content))
+        _write_atomically(self._abi_path(abi_hash), content)
+        _write_atomically(self.cache_dir.joinpath("addresses", str(chain_id), address), abi_hash)
+
+    def _abi_path(self, abi_hash: str) -> Path:
+        return self.cache_dir.joinpath("abis", f"{abi_hash}.json")
+
+
+def _write_atomically(path: Path, content: str) -> None:
+    """Write to a temporary file first, so that concurrent readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_text(content)
+    os.replace(temporary, path)
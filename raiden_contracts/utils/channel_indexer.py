@@ -0,0 +1,311 @@
+"""Fold the events of a TokenNetwork into a table of channel states.
+
+The ChannelIndexer consumes decoded TokenNetwork logs, as returned by
+`LogFilter.get_logs()` or `EventDecoder.decode_batch()`, and keeps one compact
+record per channel. Queries are answered from memory, without RPC calls.
+"""
+import bisect
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from eth_typing.evm import ChecksumAddress, HexAddress
+from eth_utils import to_checksum_address
+
+from raiden_contracts.constants import ChannelEvent, ChannelState
+from raiden_contracts.utils.type_aliases import ChannelID, Timestamp
+
+# (blockNumber, logIndex) of a log, used to order and deduplicate events
+LogPosition = Tuple[int, int]
+
+
+class ChannelRecord:
+    """The state of one channel, as far as it can be known from events"""
+
+    __slots__ = (
+        "channel_identifier",
+        "participant1",
+        "participant2",
+        "state",
+        "deposits",
+        "withdrawals",
+        "closing_participant",
+        "closing_nonce",
+        "settle_deadline",
+        "opened_block",
+        "last_block",
+    )
+
+    def __init__(
+        self,
+        channel_identifier: ChannelID,
+        participant1: ChecksumAddress,
+        participant2: ChecksumAddress,
+        opened_block: int,
+    ) -> None:
+        self.channel_identifier = channel_identifier
+        self.participant1 = participant1
+        self.participant2 = participant2
+        self.state = ChannelState.OPENED
+        # Indexed like (participant1, participant2)
+        self.deposits = [0, 0]
+        self.withdrawals = [0, 0]
+        self.closing_participant: Optional[ChecksumAddress] = None
+        self.closing_nonce: Optional[int] = None
+        # The channel can be settled after this timestamp
+        self.settle_deadline: Optional[Timestamp] = None
+        self.opened_block = opened_block
+        self.last_block = opened_block
+
+    def participant_index(self, participant: ChecksumAddress) -> int:
+        if participant == self.participant1:
+            return 0
+        if participant == self.participant2:
+            return 1
+        raise ValueError(
+            f"{participant} is not a participant of channel {self.channel_identifier}"
+        )
+
+    def deposit_of(self, participant: ChecksumAddress) -> int:
+        return self.deposits[self.participant_index(participant)]
+
+    def withdrawal_of(self, participant: ChecksumAddress) -> int:
+        return self.withdrawals[self.participant_index(participant)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "channel_identifier": self.channel_identifier,
+            "participant1": self.participant1,
+            "participant2": self.participant2,
+            "state": int(self.state),
+            "deposits": list(self.deposits),
+            "withdrawals": list(self.withdrawals),
+            "closing_participant": self.closing_participant,
+            "closing_nonce": self.closing_nonce,
+            "settle_deadline": self.settle_deadline,
+            "opened_block": self.opened_block,
+            "last_block": self.last_block,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "ChannelRecord":
+        record = cls(
+            channel_identifier=ChannelID(data["channel_identifier"]),
+            participant1=data["participant1"],
+            participant2=data["participant2"],
+            opened_block=data["opened_block"],
+        )
+        record.state = ChannelState(data["state"])
+        record.deposits = list(data["deposits"])
+        record.withdrawals = list(data["withdrawals"])
+        record.closing_participant = data["closing_participant"]
+        record.closing_nonce = data["closing_nonce"]
+        record.settle_deadline = data["settle_deadline"]
+        record.last_block = data["last_block"]
+        return record
+
+
+class ChannelIndexer:
+    """Incrementally fold TokenNetwork events into ChannelRecords
+
+    Events must be applied in chain order. Events at or before the last
+    applied log position are ignored, so overlapping block ranges can be fed
+    again after resuming from a snapshot.
+
+    The events do not tell whether unlock data remains after settlement, so
+    settled channels stay in the SETTLED state and are never reported as
+    REMOVED.
+    """
+
+    def __init__(
+        self,
+        token_network_address: ChecksumAddress,
+        settle_timeout: int,
+        snapshot_path: Optional[Path] = None,
+        snapshot_interval: int = 1000,
+    ) -> None:
+        """Params:
+        settle_timeout: settle timeout of the TokenNetwork in seconds
+        snapshot_path: if given, a snapshot is written there every
+            `snapshot_interval` blocks
+        """
+        self.token_network_address = to_checksum_address(token_network_address)
+        self.settle_timeout = settle_timeout
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self.channels: Dict[ChannelID, ChannelRecord] = {}
+        self.last_position: LogPosition = (-1, -1)
+        self.snapshot_block = -1
+
+        self._channels_of_participant: Dict[ChecksumAddress, Set[ChannelID]] = {}
+        # Sorted (settle_deadline, channel_identifier) of closed channels
+        self._closed_by_deadline: List[Tuple[int, ChannelID]] = []
+
+    @property
+    def last_block(self) -> int:
+        """The block of the last applied event. Resume scanning from here."""
+        return self.last_position[0]
+
+    def apply_events(
+        self,
+        events: Iterable[Mapping[str, Any]],
+        block_timestamps: Optional[Mapping[int, Timestamp]] = None,
+    ) -> None:
+        """Apply decoded logs in chain order
+
+        `block_timestamps` must contain the timestamps of the blocks with
+        ChannelClosed events, which determine the settle deadline.
+        """
+        block_timestamps = block_timestamps or {}
+        for event in events:
+            self.apply_event(event, block_timestamps.get(event["blockNumber"]))
+        self._maybe_snapshot()
+
+    def apply_event(
+        self, event: Mapping[str, Any], block_timestamp: Optional[Timestamp] = None
+    ) -> None:
+        """Apply one decoded log. Does not write snapshots, see `apply_events()`."""
+        position = (event["blockNumber"], event["logIndex"])
+        if position <= self.last_position:
+            return
+
+        name = event["event"]
+        args = event["args"]
+        block_number = event["blockNumber"]
+        if name == ChannelEvent.OPENED:
+            self._on_opened(args, block_number)
+        elif name == ChannelEvent.DEPOSIT:
+            record = self._record(args, block_number)
+            record.deposits[record.participant_index(args["participant"])] = args["total_deposit"]
+        elif name == ChannelEvent.WITHDRAW:
+            record = self._record(args, block_number)
+            record.withdrawals[record.participant_index(args["participant"])] = args[
+                "total_withdraw"
+            ]
+        elif name == ChannelEvent.CLOSED:
+            if block_timestamp is None:
+                raise ValueError(f"Timestamp of block {block_number} is needed for {name}")
+            self._on_closed(args, block_number, block_timestamp)
+        elif name == ChannelEvent.BALANCE_PROOF_UPDATED:
+            self._record(args, block_number).closing_nonce = args["nonce"]
+        elif name == ChannelEvent.SETTLED:
+            self._on_settled(args, block_number)
+        elif name == ChannelEvent.UNLOCKED:
+            self._record(args, block_number)
+        self.last_position = position
+
+    def _record(self, args: Mapping[str, Any], block_number: int) -> ChannelRecord:
+        record = self.channels[args["channel_identifier"]]
+        record.last_block = block_number
+        return record
+
+    def _on_opened(self, args: Mapping[str, Any], block_number: int) -> None:
+        channel_identifier = args["channel_identifier"]
+        record = ChannelRecord(
+            channel_identifier=channel_identifier,
+            participant1=args["participant1"],
+            participant2=args["participant2"],
+            opened_block=block_number,
+        )
+        self.channels[channel_identifier] = record
+        self._index_participants(record)
+
+    def _on_closed(
+        self, args: Mapping[str, Any], block_number: int, block_timestamp: Timestamp
+    ) -> None:
+        record = self._record(args, block_number)
+        record.state = ChannelState.CLOSED
+        record.closing_participant = args["closing_participant"]
+        record.closing_nonce = args["nonce"]
+        record.settle_deadline = Timestamp(block_timestamp + self.settle_timeout)
+        bisect.insort(
+            self._closed_by_deadline, (record.settle_deadline, record.channel_identifier)
+        )
+
+    def _on_settled(self, args: Mapping[str, Any], block_number: int) -> None:
+        record = self._record(args, block_number)
+        if record.state == ChannelState.CLOSED:
+            assert record.settle_deadline is not None
+            entry = (record.settle_deadline, record.channel_identifier)
+            index = bisect.bisect_left(self._closed_by_deadline, entry)
+            if index < len(self._closed_by_deadline) and self._closed_by_deadline[index] == entry:
+                del self._closed_by_deadline[index]
+        record.state = ChannelState.SETTLED
+
+    def _index_participants(self, record: ChannelRecord) -> None:
+        for participant in (record.participant1, record.participant2):
+            self._channels_of_participant.setdefault(participant, set()).add(
+                record.channel_identifier
+            )
+
+    def channels_of_participant(
+        self, participant: HexAddress, state: Optional[ChannelState] = None
+    ) -> List[ChannelRecord]:
+        """All channels of `participant`, optionally only those in `state`"""
+        identifiers = self._channels_of_participant.get(to_checksum_address(participant), ())
+        records = [self.channels[identifier] for identifier in sorted(identifiers)]
+        if state is not None:
+            records = [record for record in records if record.state == state]
+        return records
+
+    def channels_closing_before(self, timestamp: Timestamp) -> List[ChannelRecord]:
+        """Closed, not yet settled channels whose settle deadline is before `timestamp`"""
+        end = bisect.bisect_left(self._closed_by_deadline, (timestamp, -1))
+        return [self.channels[identifier] for _, identifier in self._closed_by_deadline[:end]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "token_network_address": self.token_network_address,
+            "settle_timeout": self.settle_timeout,
+            "last_position": list(self.last_position),
+            "channels": [record.to_dict() for record in self.channels.values()],
+        }
+
+    def save_snapshot(self, path: Optional[Path] = None) -> None:
+        """Write the indexer state to `path` (by default `snapshot_path`)"""
+        path = path or self.snapshot_path
+        assert path is not None, "No snapshot path given"
+        # Write a temporary file first, so that a crash never leaves a torn snapshot
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+        self.snapshot_block = self.last_block
+
+    def _maybe_snapshot(self) -> None:
+        if self.snapshot_path is None:
+            return
+        if self.last_block - self.snapshot_block >= self.snapshot_interval:
+            self.save_snapshot()
+
+    @classmethod
+    def from_snapshot(
+        cls, path: Path, snapshot_path: Optional[Path] = None, snapshot_interval: int = 1000
+    ) -> "ChannelIndexer":
+        """Resume from a snapshot written by `save_snapshot()`
+
+        By default, further snapshots are written to the same `path`.
+        """
+        with path.open() as f:
+            data = json.load(f)
+        indexer = cls(
+            token_network_address=data["token_network_address"],
+            settle_timeout=data["settle_timeout"],
+            snapshot_path=snapshot_path or path,
+            snapshot_interval=snapshot_interval,
+        )
+        for record_data in data["channels"]:
+            record = ChannelRecord.from_dict(record_data)
+            indexer.channels[record.channel_identifier] = record
+            indexer._index_participants(record)
+            if record.state == ChannelState.CLOSED:
+                assert record.settle_deadline is not None
+                indexer._closed_by_deadline.append(
+                    (record.settle_deadline, record.channel_identifier)
+                )
+        indexer._closed_by_deadline.sort()
+        indexer.last_position = (data["last_position"][0], data["last_position"][1])
+        indexer.snapshot_block = indexer.last_block
+        return indexer
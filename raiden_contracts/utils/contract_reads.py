@@ -0,0 +1,204 @@
+"""Read many contract values with batched JSON-RPC requests
+
+Dashboards need values like token balances for thousands of (contract, holder)
+pairs. Every value is an eth_call, and all of them are made in JSON-RPC
+batches, together with one eth_getCode per contract to tell missing contracts
+apart from failing calls. All values are read at the same block, so that they
+are consistent with each other even if several batches are needed.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from eth_typing import BlockNumber, ChecksumAddress
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.rpc_abi import RPC
+from web3.contract import Contract
+from web3.types import BlockIdentifier
+
+from raiden_contracts.constants import (
+    CONTRACT_CUSTOM_TOKEN,
+    CONTRACT_TOKEN_NETWORK,
+    CONTRACT_USER_DEPOSIT,
+)
+from raiden_contracts.contract_manager import ContractManager, contracts_precompiled_path
+from raiden_contracts.utils.rpc import RPCCall, batch_request
+
+# Calls per JSON-RPC batch. Nodes limit the size of batches, e.g. geth to 1000 calls.
+BATCH_SIZE = 500
+
+
+class ContractCall(NamedTuple):
+    contract_name: str
+    address: ChecksumAddress
+    function_name: str
+    args: Tuple[Any, ...] = ()
+
+
+class CallResult(NamedTuple):
+    call: ContractCall
+    value: Any
+    error: Optional[str]
+
+
+def decode_call_result(web3: Web3, instance: Contract, function_name: str, result: bytes) -> Any:
+    """Decode the result of an eth_call, unpacking a single return value"""
+    output_types = [
+        output["type"] for output in instance.get_function_by_name(function_name).abi["outputs"]
+    ]
+    decoded = web3.codec.decode_abi(output_types, HexBytes(result))
+    return decoded[0] if len(decoded) == 1 else decoded
+
+
+def read_calls(
+    web3: Web3,
+    calls: Sequence[ContractCall],
+    contract_manager: Optional[ContractManager] = None,
+    block_identifier: BlockIdentifier = "latest",
+    batch_size: int = BATCH_SIZE,
+) -> List[CallResult]:
+    """Make all `calls` in JSON-RPC batches and decode their results with the contract ABIs
+
+    A failing call does not spoil the others; its error is returned in its result.
+    """
+    contract_manager = contract_manager or ContractManager(contracts_precompiled_path())
+    block = hex(_block_number(web3, block_identifier))
+    abis: Dict[str, Any] = {}
+    instances: Dict[Tuple[str, ChecksumAddress], Contract] = {}
+    for call in calls:
+        if call.contract_name not in abis:
+            abis[call.contract_name] = contract_manager.get_contract_abi(call.contract_name)
+        key = (call.contract_name, call.address)
+        if key not in instances:
+            instances[key] = web3.eth.contract(address=call.address, abi=abis[call.contract_name])
+    addresses = list(dict.fromkeys(call.address for call in calls))
+
+    rpc_calls: List[RPCCall] = [(RPC.eth_getCode, [address, block]) for address in addresses]
+    rpc_calls.extend(
+        (
+            RPC.eth_call,
+            [
+                {
+                    "to": call.address,
+                    "data": instances[call.contract_name, call.address].encodeABI(
+                        fn_name=call.function_name, args=list(call.args)
+                    ),
+                },
+                block,
+            ],
+        )
+        for call in calls
+    )
+    responses: List[Any] = []
+    for start in range(0, len(rpc_calls), batch_size):
+        responses.extend(
+            batch_request(web3, rpc_calls[start : start + batch_size], return_errors=True)
+        )
+
+    has_code = {
+        address: not isinstance(code, Exception) and len(code) > 0
+        for address, code in zip(addresses, responses)
+    }
+    results = []
+    for call, response in zip(calls, responses[len(addresses) :]):
+        if not has_code[call.address]:
+            results.append(CallResult(call, None, f"No contract at {call.address}"))
+        elif isinstance(response, Exception):
+            results.append(CallResult(call, None, str(response)))
+        else:
+            try:
+                value = decode_call_result(
+                    web3, instances[call.contract_name, call.address], call.function_name, response
+                )
+            except Exception as ex:  # pylint: disable=broad-except
+                results.append(CallResult(call, None, f"Undecodable result: {ex}"))
+            else:
+                results.append(CallResult(call, value, None))
+    return results
+
+
+def _block_number(web3: Web3, block_identifier: BlockIdentifier) -> BlockNumber:
+    if isinstance(block_identifier, int):
+        return BlockNumber(block_identifier)
+    return web3.eth.get_block(block_identifier)["number"]
+
+
+def token_balance_calls(
+    tokens: Sequence[ChecksumAddress], holders: Sequence[ChecksumAddress]
+) -> List[ContractCall]:
+    return [
+        ContractCall(CONTRACT_CUSTOM_TOKEN, token, "balanceOf", (holder,))
+        for token in tokens
+        for holder in holders
+    ]
+
+
+def user_deposit_calls(
+    user_deposit: ChecksumAddress, holders: Sequence[ChecksumAddress]
+) -> List[ContractCall]:
+    return [
+        ContractCall(CONTRACT_USER_DEPOSIT, user_deposit, function_name, (holder,))
+        for holder in holders
+        for function_name in ("balances", "effectiveBalance")
+    ]
+
+
+def read_channel_deposits(
+    web3: Web3,
+    token_network: ChecksumAddress,
+    pairs: Sequence[Tuple[ChecksumAddress, ChecksumAddress]],
+    contract_manager: Optional[ContractManager] = None,
+    block_identifier: BlockIdentifier = "latest",
+) -> List[CallResult]:
+    """Read the deposit of every participant in their channel with the partner
+
+    The channel identifiers are read in one round of batches and the deposits
+    in another. The values of the results are the deposits.
+    """
+    block = _block_number(web3, block_identifier)
+    identifiers = read_calls(
+        web3,
+        [
+            ContractCall(CONTRACT_TOKEN_NETWORK, token_network, "getChannelIdentifier", pair)
+            for pair in pairs
+        ],
+        contract_manager=contract_manager,
+        block_identifier=block,
+    )
+    info_calls = [
+        ContractCall(
+            CONTRACT_TOKEN_NETWORK,
+            token_network,
+            "getChannelParticipantInfo",
+            (identifier.value or 0, participant, partner),
+        )
+        for identifier, (participant, partner) in zip(identifiers, pairs)
+    ]
+    infos = read_calls(web3, info_calls, contract_manager=contract_manager, block_identifier=block)
+    return [
+        identifier
+        if identifier.error
+        else info._replace(value=info.value[0] if info.error is None else None)
+        for identifier, info in zip(identifiers, infos)
+    ]
+
+
+def results_table(results: Sequence[CallResult]) -> str:
+    """One line with the value or error of every call"""
+    lines = [f"{'Contract':<42} {'Function':<26} {'Arguments':<88} Value"]
+    for result in results:
+        call = result.call
+        arguments = ",".join(str(arg) for arg in call.args)
+        value = result.value if result.error is None else f"error: {result.error}"
+        lines.append(f"{call.address:<42} {call.function_name:<26} {arguments:<88} {value}")
+    return "\n".join(lines)
+
+
+def read_addresses(lines: Sequence[str]) -> List[Tuple[ChecksumAddress, ...]]:
+    """Parse lines of comma separated addresses, skipping empty lines and comments"""
+    rows = []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            rows.append(tuple(to_checksum_address(field.strip()) for field in line.split(",")))
+    return rows
@@ -0,0 +1,399 @@
+"""Export the events of a deployment into Parquet or Arrow files for offline analysis
+
+Files are laid out as
+
+    <output_dir>/<contract name>/<event name>/<address>_<from block>_<to block>.<format>
+
+so that all files below `<contract name>/<event name>` share one schema and
+can be read as a single dataset, e.g. with `pyarrow.dataset.dataset()`. The
+columns of every event are derived from its ABI.
+
+Exports are incremental: the last exported block of every contract is kept in
+`export_state.json`, and following runs only fetch newer blocks. Existing files
+are never modified.
+
+pyarrow is only needed when this module is used and is not installed with
+raiden-contracts.
+"""
+import json
+import os
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import click
+from eth_typing import URI
+from eth_typing.evm import BlockNumber, ChecksumAddress
+from eth_utils import to_checksum_address
+from web3 import Web3
+from web3.types import ABIEvent, ABIEventParams, EventData, FilterParams, LogReceipt
+
+from raiden_contracts.constants import (
+    CONTRACT_TOKEN_NETWORK,
+    CONTRACT_TOKEN_NETWORK_REGISTRY,
+    DeploymentModule,
+)
+from raiden_contracts.contract_manager import (
+    ContractManager,
+    contracts_deployed_path,
+    contracts_precompiled_path,
+    get_contracts_deployment_info,
+)
+from raiden_contracts.utils.file_ops import load_json_from_path
+from raiden_contracts.utils.logs import EventDecoder, get_event_decoder
+from raiden_contracts.utils.rpc import connect
+from raiden_contracts.utils.type_aliases import ChainID
+
+FILE_FORMATS = ("parquet", "arrow")
+STATE_FILE = "export_state.json"
+
+# Columns describing the log itself, present in the files of every event
+LOG_COLUMNS = ("block_number", "log_index", "transaction_hash", "address")
+
+
+class ExportTarget(NamedTuple):
+    contract_name: str
+    address: ChecksumAddress
+    # The first block that can contain events of the contract
+    start_block: BlockNumber
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+    except ImportError as ex:
+        raise RuntimeError(
+            "Exporting events requires pyarrow. Install it with `pip install pyarrow`."
+        ) from ex
+    return pyarrow
+
+
+def arrow_type(abi_type: str) -> Any:
+    """Return the Arrow type for values of the ABI type `abi_type`
+
+    Integers of up to 64 bits are stored natively. Wider integers are stored as
+    decimal256(76, 0), which holds all values below 10**76. This includes all
+    token amounts, nonces and identifiers occurring in practice.
+    """
+    pa = _import_pyarrow()
+    if abi_type.endswith("]"):
+        return pa.list_(arrow_type(abi_type[: abi_type.rindex("[")]))
+    if abi_type == "address" or abi_type == "string":
+        return pa.string()
+    if abi_type == "bool":
+        return pa.bool_()
+    if abi_type == "bytes":
+        return pa.binary()
+    if abi_type.startswith("bytes"):
+        return pa.binary(int(abi_type[len("bytes") :]))
+    bits = _integer_bits(abi_type)
+    if bits is not None:
+        if bits > 64:
+            return pa.decimal256(76, 0)
+        return pa.uint64() if abi_type.startswith("uint") else pa.int64()
+    raise ValueError(f"ABI type {abi_type} can not be exported")
+
+
+def _integer_bits(abi_type: str) -> Optional[int]:
+    """The size of the integer type `abi_type`, None for other types"""
+    for prefix in ("uint", "int"):
+        if abi_type.startswith(prefix):
+            return int(abi_type[len(prefix) :] or 256)
+    return None
+
+
+def _arrow_value_converter(abi_type: str) -> Callable[[Any], Any]:
+    """Return a function converting a decoded value into what pyarrow expects for the column"""
+    if abi_type.endswith("]"):
+        convert_item = _arrow_value_converter(abi_type[: abi_type.rindex("[")])
+        return lambda values: [convert_item(value) for value in values]
+    bits = _integer_bits(abi_type)
+    if bits is not None and bits > 64:
+        return Decimal
+    return lambda value: value
+
+
+def event_schema(event_abi: ABIEvent) -> Any:
+    """The Arrow schema of the exported `event_abi` logs"""
+    pa = _import_pyarrow()
+    fields = [
+        pa.field("block_number", pa.uint64(), nullable=False),
+        pa.field("log_index", pa.uint32(), nullable=False),
+        pa.field("transaction_hash", pa.binary(32), nullable=False),
+        pa.field("address", pa.string(), nullable=False),
+    ]
+    for arg in event_abi["inputs"]:
+        if arg["name"] in LOG_COLUMNS:
+            raise ValueError(
+                f"Argument {arg['name']} of event {event_abi['name']} clashes with a log column"
+            )
+        fields.append(pa.field(arg["name"], arrow_type(arg["type"]), nullable=False))
+    return pa.schema(fields, metadata={"event": event_abi["name"]})
+
+
+class _EventTable:
+    """Collects the decoded logs of one event and turns them into an Arrow table"""
+
+    def __init__(self, event_abi: ABIEvent) -> None:
+        self.schema = event_schema(event_abi)
+        self.inputs: List[ABIEventParams] = list(event_abi["inputs"])
+        self.converters = [_arrow_value_converter(arg["type"]) for arg in self.inputs]
+        self.columns: Dict[str, List[Any]] = {name: [] for name in self.schema.names}
+
+    def __len__(self) -> int:
+        return len(self.columns["block_number"])
+
+    def append(self, event: EventData) -> None:
+        columns = self.columns
+        columns["block_number"].append(event["blockNumber"])
+        columns["log_index"].append(event["logIndex"])
+        columns["transaction_hash"].append(bytes(event["transactionHash"]))
+        columns["address"].append(event["address"])
+        args = event["args"]
+        for arg, convert in zip(self.inputs, self.converters):
+            columns[arg["name"]].append(convert(args[arg["name"]]))
+
+    def to_arrow(self) -> Any:
+        pa = _import_pyarrow()
+        return pa.table(self.columns, schema=self.schema)
+
+
+class EventExporter:
+    """Incrementally exports the events of contracts into Parquet or Arrow files"""
+
+    def __init__(
+        self,
+        web3: Web3,
+        contract_manager: ContractManager,
+        output_dir: Path,
+        file_format: str = "parquet",
+        blocks_per_file: int = 100_000,
+    ) -> None:
+        """Params:
+        blocks_per_file: size of the block range covered by one file and
+            requested from the RPC node with one `eth_getLogs` call
+        """
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Unknown file format {file_format}, choose one of {FILE_FORMATS}")
+        if blocks_per_file < 1:
+            raise ValueError("blocks_per_file must be positive")
+        _import_pyarrow()
+        self.web3 = web3
+        self.contract_manager = contract_manager
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.blocks_per_file = blocks_per_file
+        self.state_path = output_dir / STATE_FILE
+        # Last exported block by contract address
+        self.exported_until: Dict[ChecksumAddress, BlockNumber] = {}
+        state = load_json_from_path(self.state_path)
+        if state is not None:
+            self.exported_until = state["exported_until"]
+
+    def export(
+        self, targets: Iterable[ExportTarget], to_block: BlockNumber
+    ) -> Dict[ChecksumAddress, int]:
+        """Export the events of all `targets` up to and including `to_block`
+
+        Returns the number of exported events by contract address.
+        """
+        return {
+            target.address: self.export_contract(target, to_block=to_block) for target in targets
+        }
+
+    def export_contract(self, target: ExportTarget, to_block: BlockNumber) -> int:
+        """Export the events of one contract, continuing after the last exported block"""
+        decoders = self._decoders(target.contract_name)
+        from_block = max(target.start_block, self.exported_until.get(target.address, -1) + 1)
+        self._remove_unrecorded_files(target, from_block)
+
+        exported = 0
+        for range_start in range(from_block, to_block + 1, self.blocks_per_file):
+            range_end = min(range_start + self.blocks_per_file - 1, to_block)
+            logs = self.web3.eth.get_logs(
+                FilterParams(
+                    {"address": target.address, "fromBlock": range_start, "toBlock": range_end}
+                )
+            )
+            tables = self._decode(logs, decoders)
+            for event_name, table in tables.items():
+                self._write(
+                    table.to_arrow(), self._file_path(target, event_name, range_start, range_end)
+                )
+                exported += len(table)
+            self.exported_until[target.address] = BlockNumber(range_end)
+            self._save_state()
+        return exported
+
+    def _decoders(self, contract_name: str) -> Dict[bytes, EventDecoder]:
+        abi = self.contract_manager.get_contract_abi(contract_name)
+        decoders = [
+            get_event_decoder(self.web3.codec, ABIEvent(entry))  # type: ignore
+            for entry in abi
+            if entry["type"] == "event" and not entry.get("anonymous", False)
+        ]
+        return {decoder.topic: decoder for decoder in decoders if decoder.topic is not None}
+
+    @staticmethod
+    def _decode(
+        logs: Sequence[LogReceipt], decoders: Dict[bytes, EventDecoder]
+    ) -> Dict[str, _EventTable]:
+        tables: Dict[str, _EventTable] = {}
+        for log in logs:
+            if not log["topics"]:
+                continue
+            decoder = decoders.get(bytes(log["topics"][0]))
+            if decoder is None:
+                # Not an event of the exported contract's ABI
+                continue
+            if decoder.event_name not in tables:
+                tables[decoder.event_name] = _EventTable(decoder.event_abi)
+            tables[decoder.event_name].append(decoder.decode(log))
+        return tables
+
+    def _file_path(
+        self, target: ExportTarget, event_name: str, from_block: int, to_block: int
+    ) -> Path:
+        return (
+            self.output_dir
+            / target.contract_name
+            / event_name
+            / f"{target.address}_{from_block:012d}_{to_block:012d}.{self.file_format}"
+        )
+
+    def _remove_unrecorded_files(self, target: ExportTarget, from_block: int) -> None:
+        """Remove files written after the last state update, e.g. before a crash
+
+        Their block range is exported again, possibly with a different end block.
+        """
+        contract_dir = self.output_dir / target.contract_name
+        for path in contract_dir.glob(f"*/{target.address}_*.{self.file_format}"):
+            if int(path.stem.split("_")[1]) >= from_block:
+                path.unlink()
+
+    def _write(self, table: Any, path: Path) -> None:
+        pa = _import_pyarrow()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write a temporary file first, so that a crash never leaves a torn file
+        tmp_path = path.with_name(path.name + ".tmp")
+        if self.file_format == "parquet":
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+
+            pyarrow.parquet.write_table(table, tmp_path)
+        else:
+            with pa.OSFile(str(tmp_path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    def _save_state(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(STATE_FILE + ".tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"exported_until": self.exported_until}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+
+def deployment_export_targets(
+    chain_id: ChainID, version: Optional[str] = None
+) -> List[ExportTarget]:
+    """All contracts of a deployment that emit events, including its TokenNetworks
+
+    The TokenNetworks are searched from the block the TokenNetworkRegistry was
+    deployed in, since their own deployment block is not recorded.
+    """
+    deployment = get_contracts_deployment_info(
+        chain_id=chain_id, version=version, module=DeploymentModule.ALL
+    )
+    if deployment is None:
+        raise ValueError(f"No deployment data found for chain {chain_id}")
+    manager = ContractManager(contracts_precompiled_path(version))
+
+    targets = [
+        ExportTarget(
+            contract_name=name,
+            address=to_checksum_address(contract["address"]),
+            start_block=BlockNumber(contract["block_number"]),
+        )
+        for name, contract in deployment["contracts"].items()
+        if any(entry["type"] == "event" for entry in manager.get_contract_abi(name))
+    ]
+
+    raiden_deployment = load_json_from_path(contracts_deployed_path(chain_id, version)) or {}
+    registry = deployment["contracts"].get(CONTRACT_TOKEN_NETWORK_REGISTRY)
+    for token_network in raiden_deployment.get("token_networks", []):
+        assert registry is not None
+        targets.append(
+            ExportTarget(
+                contract_name=CONTRACT_TOKEN_NETWORK,
+                address=to_checksum_address(token_network["token_network_address"]),
+                start_block=BlockNumber(registry["block_number"]),
+            )
+        )
+    return targets
+
+
+@click.command()
+@click.option(
+    "--rpc-provider",
+    default="http://127.0.0.1:8545",
+    help="Address of the Ethereum RPC provider",
+)
+@click.option(
+    "--output-dir",
+    required=True,
+    type=click.Path(file_okay=False),
+    help="Directory to export to. Following exports into the same directory are incremental.",
+    callback=lambda ctx, param, value: Path(value) if value is not None else None,
+)
+@click.option("--contracts-version", help="Contracts version of the deployment")
+@click.option("--file-format", default="parquet", type=click.Choice(FILE_FORMATS))
+@click.option("--blocks-per-file", default=100_000, type=click.IntRange(min=1))
+@click.option(
+    "--confirmations",
+    default=5,
+    type=click.IntRange(min=0),
+    help="Only export blocks with this many confirmations, since files are never rewritten",
+)
+@click.option(
+    "--token-network",
+    "token_networks",
+    multiple=True,
+    help="Additional TokenNetwork to export, if not listed in the deployment data",
+)
+def main(
+    rpc_provider: URI,
+    output_dir: Path,
+    contracts_version: Optional[str],
+    file_format: str,
+    blocks_per_file: int,
+    confirmations: int,
+    token_networks: Tuple[str, ...],
+) -> None:
+    web3 = connect(rpc_provider)
+    chain_id = ChainID(web3.eth.chain_id)
+
+    targets = deployment_export_targets(chain_id, contracts_version)
+    known = {target.address for target in targets}
+    registry_block = next(
+        (t.start_block for t in targets if t.contract_name == CONTRACT_TOKEN_NETWORK_REGISTRY),
+        BlockNumber(0),
+    )
+    for address in map(to_checksum_address, token_networks):
+        if address not in known:
+            targets.append(ExportTarget(CONTRACT_TOKEN_NETWORK, address, registry_block))
+
+    exporter = EventExporter(
+        web3=web3,
+        contract_manager=ContractManager(contracts_precompiled_path(contracts_version)),
+        output_dir=output_dir,
+        file_format=file_format,
+        blocks_per_file=blocks_per_file,
+    )
+    to_block = BlockNumber(web3.eth.block_number - confirmations)
+    for address, count in exporter.export(targets, to_block=to_block).items():
+        click.echo(f"{address}: exported {count} events")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
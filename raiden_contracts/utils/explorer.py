@@ -0,0 +1,13 @@
+"""The Etherscan-compatible block explorer APIs of the supported chains"""
+from typing import Dict
+
+USER_AGENT = "curl/7.37.0"  # Etherscan blocks us without this user agent in some cases
+
+api_of_chain_id: Dict[int, str] = {
+    1: "https://api.etherscan.io/api",
+    3: "https://api-ropsten.etherscan.io/api",
+    4: "https://api-rinkeby.etherscan.io/api",
+    5: "https://api-goerli.etherscan.io/api",
+    42: "https://api-kovan.etherscan.io/api",
+    42161: "https://api.arbiscan.io/api",
+}
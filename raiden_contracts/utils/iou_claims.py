@@ -0,0 +1,279 @@
+"""Claim many IOUs with OneToN.bulkClaim
+
+A pathfinding service collects IOUs signed with `sign_one_to_n_iou()` and
+claims them in bulk. One IOU that cannot be claimed makes the whole bulkClaim
+revert, and a claim which can only be paid partially settles the session
+anyway. So before packing the IOUs into calls, the planner drops:
+
+- IOUs which expire before they can be claimed,
+- IOUs whose receiver is their sender or not registered in the ServiceRegistry,
+- IOUs which are not signed by their sender,
+- IOUs for sessions which are already settled, or appear twice,
+- IOUs which the UserDeposit balance of their sender cannot fully cover.
+
+The balances, settled sessions and registrations are read with one batched
+request. The remaining IOUs, those expiring first at the front, fill bulkClaim
+calls up to the gas limit.
+"""
+from typing import (
+    AbstractSet,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from eth_abi.packed import encode_abi_packed
+from eth_typing import ChecksumAddress
+from eth_utils import keccak, to_checksum_address
+from web3 import Web3
+from web3.types import BlockIdentifier
+
+from raiden_contracts.constants import (
+    CONTRACT_ONE_TO_N,
+    CONTRACT_SERVICE_REGISTRY,
+    CONTRACT_USER_DEPOSIT,
+)
+from raiden_contracts.contract_manager import ContractManager, GasModel
+from raiden_contracts.utils.contract_reads import ContractCall, read_calls
+from raiden_contracts.utils.proofs import eth_sign_hash_message, pack_one_to_n_iou
+from raiden_contracts.utils.signature import recover
+from raiden_contracts.utils.type_aliases import ChainID, TokenAmount
+
+BULK_CLAIM = CONTRACT_ONE_TO_N + ".bulkClaim"
+SIGNATURE_LENGTH = 65
+
+
+class IOU(NamedTuple):
+    sender: ChecksumAddress
+    receiver: ChecksumAddress
+    amount: int
+    claimable_until: int
+    # As returned by sign_one_to_n_iou()
+    signature: bytes
+
+
+class BulkClaim(NamedTuple):
+    """The arguments and gas of one bulkClaim call"""
+
+    senders: List[ChecksumAddress]
+    receivers: List[ChecksumAddress]
+    amounts: List[int]
+    claimable_until_list: List[int]
+    # The signatures of all IOUs, concatenated
+    signatures: bytes
+    gas: int
+
+    def arguments(self) -> Tuple:
+        return (
+            self.senders,
+            self.receivers,
+            self.amounts,
+            self.claimable_until_list,
+            self.signatures,
+        )
+
+
+class BulkClaimPlan(NamedTuple):
+    claims: List[BulkClaim]
+    # The IOUs which are not claimed, with the reason
+    dropped: List[Tuple[IOU, str]]
+
+
+def session_key(iou: IOU) -> bytes:
+    """The key of the session of `iou` in OneToN.settled_sessions"""
+    return keccak(
+        encode_abi_packed(
+            ["address", "address", "uint256"], [iou.receiver, iou.sender, iou.claimable_until]
+        )
+    )
+
+
+def iou_signer(
+    iou: IOU, one_to_n: ChecksumAddress, chain_id: ChainID
+) -> Optional[ChecksumAddress]:
+    """The address which signed `iou`, as OneToN checks it, or None for an invalid signature"""
+    message = pack_one_to_n_iou(
+        sender=iou.sender,
+        receiver=iou.receiver,
+        amount=TokenAmount(iou.amount),
+        claimable_until=iou.claimable_until,
+        one_to_n_address=one_to_n,
+        chain_id=chain_id,
+    )
+    return recover(eth_sign_hash_message(message), iou.signature)
+
+
+def read_claim_state(
+    web3: Web3,
+    ious: Sequence[IOU],
+    one_to_n: ChecksumAddress,
+    user_deposit: ChecksumAddress,
+    service_registry: ChecksumAddress,
+    contract_manager: Optional[ContractManager] = None,
+    block_identifier: BlockIdentifier = "latest",
+) -> Tuple[Dict[ChecksumAddress, int], Set[bytes], Set[ChecksumAddress]]:
+    """The balances of the senders, the settled sessions and the registered receivers
+
+    All are read at the same block in JSON-RPC batches. Senders whose balance
+    cannot be read are missing from the balances, sessions which cannot be
+    read count as settled and receivers whose registration cannot be read as
+    not registered.
+    """
+    senders = list(dict.fromkeys(iou.sender for iou in ious))
+    sessions = list(dict.fromkeys(session_key(iou) for iou in ious))
+    receivers = list(dict.fromkeys(iou.receiver for iou in ious))
+    results = read_calls(
+        web3,
+        [
+            ContractCall(CONTRACT_USER_DEPOSIT, user_deposit, "balances", (sender,))
+            for sender in senders
+        ]
+        + [
+            ContractCall(CONTRACT_ONE_TO_N, one_to_n, "settled_sessions", (session,))
+            for session in sessions
+        ]
+        + [
+            ContractCall(
+                CONTRACT_SERVICE_REGISTRY, service_registry, "hasValidRegistration", (receiver,)
+            )
+            for receiver in receivers
+        ],
+        contract_manager=contract_manager,
+        block_identifier=block_identifier,
+    )
+    balances = {
+        sender: result.value for sender, result in zip(senders, results) if result.error is None
+    }
+    settled = {
+        session
+        for session, result in zip(sessions, results[len(senders) :])
+        if result.error is not None or result.value != 0
+    }
+    registered = {
+        receiver
+        for receiver, result in zip(receivers, results[len(senders) + len(sessions) :])
+        if result.error is None and result.value
+    }
+    return balances, settled, registered
+
+
+def pack_bulk_claims(
+    ious: Iterable[IOU],
+    now: int,
+    gas_limit: int,
+    one_to_n: ChecksumAddress,
+    chain_id: ChainID,
+    balances: Dict[ChecksumAddress, int],
+    registered: AbstractSet[ChecksumAddress],
+    settled: AbstractSet[bytes] = frozenset(),
+    gas_model: Optional[GasModel] = None,
+) -> BulkClaimPlan:
+    """Drop the IOUs which cannot be fully claimed and pack the others into bulkClaim calls
+
+    IOUs with a `claimable_until` before `now` are expired. Only IOUs to the
+    `registered` receivers, signed for the OneToN contract at `one_to_n` on
+    `chain_id`, can be claimed. Every sender's balance pays for their IOUs in
+    the order of expiration. Every call needs at most `gas_limit` gas.
+    """
+    cost = (gas_model or GasModel.from_version()).cost(BULK_CLAIM)
+    max_ious = cost.max_items(gas_limit)
+    if max_ious == 0:
+        raise ValueError(f"A gas limit of {gas_limit} does not fit a single IOU")
+
+    dropped: List[Tuple[IOU, str]] = []
+    sessions: Dict[bytes, IOU] = {}
+    for iou in ious:
+        if len(iou.signature) != SIGNATURE_LENGTH:
+            raise ValueError(f"Signatures are 65 bytes long, not {len(iou.signature)}")
+        key = session_key(iou)
+        if iou.claimable_until < now:
+            dropped.append((iou, "expired"))
+        elif iou.sender == iou.receiver:
+            dropped.append((iou, "sender is the receiver"))
+        elif iou.receiver not in registered:
+            dropped.append((iou, "receiver not registered"))
+        elif iou_signer(iou, one_to_n, chain_id) != iou.sender:
+            dropped.append((iou, "signature mismatch"))
+        elif key in settled:
+            dropped.append((iou, "session already settled"))
+        elif key in sessions:
+            # A session can only be claimed once, so keep its largest IOU
+            smaller, sessions[key] = sorted((sessions[key], iou), key=lambda other: other.amount)
+            dropped.append((smaller, "superseded by a larger IOU of the session"))
+        else:
+            sessions[key] = iou
+
+    remaining = dict(balances)
+    claimable: List[IOU] = []
+    for iou in sorted(sessions.values(), key=lambda other: other.claimable_until):
+        balance = remaining.get(iou.sender)
+        if balance is None:
+            dropped.append((iou, "unknown deposit of the sender"))
+        elif balance < iou.amount:
+            dropped.append((iou, "insufficient deposit of the sender"))
+        else:
+            remaining[iou.sender] = balance - iou.amount
+            claimable.append(iou)
+
+    claims = [
+        _bulk_claim(claimable[start : start + max_ious], cost.gas)
+        for start in range(0, len(claimable), max_ious)
+    ]
+    return BulkClaimPlan(claims=claims, dropped=dropped)
+
+
+def _bulk_claim(ious: List[IOU], gas: Callable[[int], int]) -> BulkClaim:
+    return BulkClaim(
+        senders=[iou.sender for iou in ious],
+        receivers=[iou.receiver for iou in ious],
+        amounts=[iou.amount for iou in ious],
+        claimable_until_list=[iou.claimable_until for iou in ious],
+        # Copies every signature once, unlike concatenating them one by one
+        signatures=b"".join(iou.signature for iou in ious),
+        gas=gas(len(ious)),
+    )
+
+
+def plan_bulk_claims(
+    web3: Web3,
+    ious: Sequence[IOU],
+    one_to_n: ChecksumAddress,
+    user_deposit: ChecksumAddress,
+    service_registry: ChecksumAddress,
+    now: int,
+    gas_limit: int,
+    contract_manager: Optional[ContractManager] = None,
+    gas_model: Optional[GasModel] = None,
+) -> BulkClaimPlan:
+    """Read the state of the IOUs from the chain and pack the claimable ones into bulkClaims"""
+    balances, settled, registered = read_claim_state(
+        web3, ious, one_to_n, user_deposit, service_registry, contract_manager=contract_manager
+    )
+    return pack_bulk_claims(
+        ious,
+        now=now,
+        gas_limit=gas_limit,
+        one_to_n=one_to_n,
+        chain_id=ChainID(web3.eth.chain_id),
+        balances=balances,
+        registered=registered,
+        settled=settled,
+        gas_model=gas_model,
+    )
+
+
+def iou_from_dict(iou: Dict) -> IOU:
+    """An IOU from a dict with the keys of the IOU fields, as made by the tests"""
+    return IOU(
+        sender=to_checksum_address(iou["sender"]),
+        receiver=to_checksum_address(iou["receiver"]),
+        amount=iou["amount"],
+        claimable_until=iou["claimable_until"],
+        signature=iou["signature"],
+    )
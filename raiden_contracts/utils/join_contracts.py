@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 import json
 import re
-import sys
-from typing import Dict, List, Set, TextIO
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Set, TextIO, Tuple
 
 import click
 from click.types import File
@@ -18,35 +18,131 @@ example usage:
 $ cd raiden-contracts/raiden_contracts
 $ python ./utils/join_contracts.py ./contracts/TokenNetwork.sol joined.sol
 
+With --standard-json, the output is the input for `solc --standard-json`
+instead, with every imported file as a separate source.
 """
 
 
-class ContractJoiner:
-    def __init__(self, import_map: Dict[str, str] = None):
-        self.seen_pragmas: Set[str] = set()
-        self.seen_contracts: Set[str] = set()
-        self.import_map = import_map if import_map else {}
+class SourceFile(NamedTuple):
+    content: str
+    # ("pragma", line), ("import", imported name) or ("line", line), in file order
+    entries: Tuple[Tuple[str, str], ...]
 
-    def join(self, contract_file: TextIO) -> List[str]:
-        out: List[str] = []
-        if contract_file.name in self.seen_contracts:
-            print("Skipping duplicate {}".format(contract_file.name), file=sys.stderr)
-            return []
 
-        self.seen_contracts.add(contract_file.name)
-        print("Reading {}".format(contract_file.name), file=sys.stderr)
+class SourceGraph:
+    """Parses every Solidity file once and remembers its pragmas and imports
 
-        for line in contract_file:
-            line = line.strip("\r\n")
+    Any file of the graph can then be flattened or turned into a solc
+    standard-JSON input without reading files again.
+    """
+
+    def __init__(self, import_map: Optional[Dict[str, str]] = None) -> None:
+        self.import_map = import_map if import_map else {}
+        self.files: Dict[str, SourceFile] = {}
+
+    def resolve(self, import_name: str) -> str:
+        """The path of an imported file"""
+        path = import_name
+        for prefix, directory in self.import_map.items():
+            if path.startswith(prefix):
+                path = path.replace(prefix, directory)
+        return path
+
+    def source_unit_name(self, path: str) -> str:
+        """The name under which other files import the file at `path`"""
+        for prefix, directory in self.import_map.items():
+            if path.startswith(directory + "/"):
+                return prefix + path[len(directory) :]
+        return path
+
+    def parse(self, path: str) -> SourceFile:
+        if path not in self.files:
+            with open(path) as source_file:
+                self.files[path] = self.parse_lines(source_file.read())
+        return self.files[path]
+
+    @staticmethod
+    def parse_lines(content: str) -> SourceFile:
+        entries = []
+        for line in content.splitlines():
             stripped_line = line.strip()
             if stripped_line.startswith("pragma") or stripped_line.startswith(
                 "// SPDX-License-Identifier: MIT"
             ):
-                self._on_pragma_line(line=line, out=out)
+                entries.append(("pragma", line))
             elif stripped_line.startswith("import"):
-                self._on_import_line(stripped_line=stripped_line, out=out)
+                match = IMPORT_RE.match(stripped_line)
+                if match:
+                    entries.append(("import", match.group("contract")))
             else:
-                out.append(line)
+                entries.append(("line", line))
+        return SourceFile(content=content, entries=tuple(entries))
+
+    def flatten(self, path: str) -> str:
+        """The file at `path` with all imports inlined and every pragma only once"""
+        return "\n".join(ContractJoiner(graph=self).join_file(path))
+
+    def standard_json_input(self, path: str, optimize_runs: int = 200) -> Dict[str, Any]:
+        """The solc standard-JSON input for compiling the file at `path`"""
+        sources: Dict[str, Dict[str, str]] = {}
+
+        def add(name: str, source_path: str) -> None:
+            if name in sources:
+                return
+            source = self.parse(source_path)
+            sources[name] = {"content": source.content}
+            for kind, value in source.entries:
+                if kind == "import":
+                    add(value, self.resolve(value))
+
+        add(self.source_unit_name(path), path)
+        return {
+            "language": "Solidity",
+            "sources": sources,
+            "settings": {
+                "optimizer": {"enabled": True, "runs": optimize_runs},
+                "outputSelection": {
+                    "*": {
+                        "*": [
+                            "abi",
+                            "evm.bytecode.object",
+                            "evm.deployedBytecode.object",
+                            "metadata",
+                        ]
+                    }
+                },
+            },
+        }
+
+
+class ContractJoiner:
+    def __init__(
+        self, import_map: Optional[Dict[str, str]] = None, graph: Optional[SourceGraph] = None
+    ):
+        self.seen_pragmas: Set[str] = set()
+        self.seen_contracts: Set[str] = set()
+        self.graph = graph if graph else SourceGraph(import_map)
+
+    def join(self, contract_file: TextIO) -> List[str]:
+        source = self.graph.parse_lines(contract_file.read())
+        return self._join_source(contract_file.name, source)
+
+    def join_file(self, path: str) -> List[str]:
+        return self._join_source(path, self.graph.parse(path))
+
+    def _join_source(self, name: str, source: SourceFile) -> List[str]:
+        if name in self.seen_contracts:
+            return []
+        self.seen_contracts.add(name)
+
+        out: List[str] = []
+        for kind, value in source.entries:
+            if kind == "pragma":
+                self._on_pragma_line(line=value, out=out)
+            elif kind == "import":
+                out.extend(self.join_file(self.graph.resolve(value)))
+            else:
+                out.append(value)
         return out
 
     def _on_pragma_line(self, line: str, out: List[str]) -> None:
@@ -54,27 +150,25 @@ class ContractJoiner:
             self.seen_pragmas.add(line)
             out.append(line)
 
-    def _on_import_line(self, stripped_line: str, out: List[str]) -> None:
-        match = IMPORT_RE.match(stripped_line)
-        if match:
-            next_file = match.groupdict().get("contract")
-            assert next_file
-            for prefix, path in self.import_map.items():
-                if next_file.startswith(prefix):
-                    next_file = next_file.replace(prefix, path)
-            with open(next_file) as next_contract:
-                out.extend(self.join(next_contract))
-
 
 @click.command()
 @click.option(
     "--import-map", default="{}", help='JSON mapping {"path-prefix": "/file/system/path"}'
 )
+@click.option(
+    "--standard-json",
+    is_flag=True,
+    help="Write the input for solc --standard-json instead of a joined file",
+)
 @click.argument("contract", type=File())
 @click.argument("output", type=File("w"))
-def main(contract: TextIO, output: TextIO, import_map: str) -> None:
-    import_map_json = json.loads(import_map)
-    output.write("\n".join(ContractJoiner(import_map_json).join(contract)))
+def main(contract: TextIO, output: TextIO, import_map: str, standard_json: bool) -> None:
+    graph = SourceGraph(json.loads(import_map))
+    if standard_json:
+        path = str(Path(contract.name))
+        output.write(json.dumps(graph.standard_json_input(path), indent=4))
+    else:
+        output.write("\n".join(ContractJoiner(graph=graph).join(contract)))
 
 
 if __name__ == "__main__":
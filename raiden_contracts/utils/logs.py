@@ -1,18 +1,33 @@
 import functools
+import json
 from collections import defaultdict, namedtuple
 from inspect import getframeinfo, stack
-from typing import Any, Callable, Dict, List, Optional, cast
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, cast
 
 from click import echo
+from eth_abi.codec import ABICodec
+from eth_abi.decoding import ContextFramesBytesIO, TupleDecoder
+from eth_abi.exceptions import InsufficientDataBytes
 from eth_typing.evm import BlockNumber, ChecksumAddress, HexAddress
-from eth_utils import to_checksum_address
+from eth_utils import event_abi_to_log_topic, to_bytes, to_checksum_address
 from web3 import Web3
-from web3._utils.events import get_event_data
+from web3._utils.abi import (
+    exclude_indexed_event_inputs,
+    get_abi_input_names,
+    get_indexed_event_inputs,
+    map_abi_data,
+    normalize_event_input_types,
+)
+from web3._utils.encoding import hexstr_if_str
+from web3._utils.events import get_event_abi_types_for_decoding
 from web3._utils.filters import LogFilter as Web3LogFilter, construct_event_filter_params
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
 from web3._utils.threads import Timeout
+from web3.datastructures import AttributeDict
+from web3.exceptions import InvalidEventABI, LogTopicError, MismatchedABI
 
 # A concrete event added in a transaction.
-from web3.types import ABI, ABIEvent, BlockIdentifier
+from web3.types import ABI, ABIEvent, BlockIdentifier, EventData, LogReceipt
 
 LogRecorded = namedtuple("LogRecorded", "message callback count")
 GenesisBlock = BlockNumber(0)
@@ -136,6 +151,171 @@ def sandwitch_echo(msg: str) -> None:
     echo("----------------------------------", err=True)
 
 
+@functools.lru_cache(maxsize=4096)
+def _checksum_address_of_word(word: bytes) -> ChecksumAddress:
+    """Checksum the address in the lower 20 bytes of an ABI word.
+
+    Logs of a contract mention the same few addresses again and again, so the
+    keccak behind the checksum is cached.
+    """
+    return to_checksum_address(word[12:])
+
+
+# Decoders for the ABI types which always occupy exactly one 32 byte word.
+_WORD_DECODERS: Dict[str, Callable[[bytes], Any]] = {
+    "uint256": lambda word: int.from_bytes(word, "big"),
+    "int256": lambda word: int.from_bytes(word, "big", signed=True),
+    "bytes32": bytes,
+    "bool": lambda word: word[31] != 0,
+    "address": _checksum_address_of_word,
+}
+
+
+class EventDecoder:
+    """Decodes the logs of a single event
+
+    `get_event_data()` from web3 derives the layout of indexed and non-indexed
+    arguments from the ABI again for every log. EventDecoder does this once,
+    when it is created, and keeps a decoder for every topic slot and for the
+    data section. The results are identical to those of `get_event_data()`.
+    Use `get_event_decoder()` to share one decoder per event ABI.
+    """
+
+    def __init__(self, abi_codec: ABICodec, event_abi: ABIEvent) -> None:
+        self.event_abi = event_abi
+        self.event_name = event_abi["name"]
+        self.anonymous = event_abi.get("anonymous", False)
+        self.topic = None if self.anonymous else event_abi_to_log_topic(event_abi)  # type: ignore
+
+        topic_inputs = get_indexed_event_inputs(event_abi)
+        topic_types = list(
+            get_event_abi_types_for_decoding(normalize_event_input_types(topic_inputs))
+        )
+        topic_names = get_abi_input_names(ABIEvent({"inputs": topic_inputs}))
+        data_inputs = exclude_indexed_event_inputs(event_abi)
+        data_types = list(
+            get_event_abi_types_for_decoding(normalize_event_input_types(data_inputs))
+        )
+        self.data_names = get_abi_input_names(ABIEvent({"inputs": data_inputs}))
+
+        duplicate_names = set(topic_names).intersection(self.data_names)
+        if duplicate_names:
+            raise InvalidEventABI(
+                "The following argument names are duplicated "
+                f"between event inputs: '{', '.join(duplicate_names)}'"
+            )
+
+        self.topic_slots: List[Tuple[str, Callable[[bytes], Any]]] = [
+            (name, _word_decoder(abi_codec, type_str))
+            for name, type_str in zip(topic_names, topic_types)
+        ]
+
+        # The data section is sliced into words directly, unless an argument
+        # needs the head-tail mechanism of the ABI (dynamic or multi-word types).
+        self.data_words: Optional[List[Callable[[bytes], Any]]] = None
+        self.data_decoder: Optional[Callable[[bytes], Tuple[Any, ...]]] = None
+        if all(type_str in _WORD_DECODERS for type_str in data_types):
+            self.data_words = [_WORD_DECODERS[type_str] for type_str in data_types]
+        else:
+            self.data_decoder = _tuple_decoder(abi_codec, data_types)
+
+    def decode_args(self, log: LogReceipt) -> Dict[str, Any]:
+        """Return the arguments of the event, as found in `args` of `decode()`"""
+        topics = log["topics"]
+        if topics and isinstance(topics[0], str):
+            topics = [to_bytes(hexstr=topic) for topic in topics]
+        if not self.anonymous:
+            if not topics:
+                raise MismatchedABI("Expected non-anonymous event to have 1 or more topics")
+            if topics[0] != self.topic:
+                raise MismatchedABI("The event signature did not match the provided ABI")
+            topics = topics[1:]
+        if len(topics) != len(self.topic_slots):
+            raise LogTopicError(
+                "Expected {0} log topics.  Got {1}".format(len(self.topic_slots), len(topics))
+            )
+
+        args = {name: decode(topic) for (name, decode), topic in zip(self.topic_slots, topics)}
+
+        data = hexstr_if_str(to_bytes, log["data"])
+        if self.data_words is not None:
+            if len(data) < 32 * len(self.data_words):
+                raise InsufficientDataBytes(
+                    f"Tried to read {32 * len(self.data_words)} bytes of event data.  "
+                    f"Only got {len(data)} bytes"
+                )
+            for index, (name, decode) in enumerate(zip(self.data_names, self.data_words)):
+                args[name] = decode(data[32 * index : 32 * (index + 1)])
+        else:
+            assert self.data_decoder is not None
+            args.update(zip(self.data_names, self.data_decoder(data)))
+        return args
+
+    def decode(self, log: LogReceipt) -> EventData:
+        """Decode a raw log. Equivalent to web3's `get_event_data()`."""
+        return cast(
+            EventData,
+            AttributeDict(
+                {
+                    "args": AttributeDict(self.decode_args(log)),
+                    "event": self.event_name,
+                    "logIndex": log["logIndex"],
+                    "transactionIndex": log["transactionIndex"],
+                    "transactionHash": log["transactionHash"],
+                    "address": log["address"],
+                    "blockHash": log["blockHash"],
+                    "blockNumber": log["blockNumber"],
+                }
+            ),
+        )
+
+    def decode_batch(self, logs: Iterable[LogReceipt]) -> List[EventData]:
+        """Decode many raw logs of this event in one pass"""
+        decode = self.decode
+        return [decode(log) for log in logs]
+
+
+def _word_decoder(abi_codec: ABICodec, type_str: str) -> Callable[[bytes], Any]:
+    """Return a function decoding a single 32 byte word (e.g. a topic) of type `type_str`"""
+    if type_str in _WORD_DECODERS:
+        return _WORD_DECODERS[type_str]
+
+    decode_tuple = _tuple_decoder(abi_codec, [type_str])
+
+    def decode(word: bytes) -> Any:
+        return decode_tuple(word)[0]
+
+    return decode
+
+
+def _tuple_decoder(
+    abi_codec: ABICodec, types: Sequence[str]
+) -> Callable[[bytes], Tuple[Any, ...]]:
+    """Return a function decoding `types` from ABI encoded data, with addresses checksummed"""
+    # pylint: disable=W0212
+    decoder = TupleDecoder(decoders=[abi_codec._registry.get_decoder(t) for t in types])
+
+    def decode(data: bytes) -> Tuple[Any, ...]:
+        decoded = decoder(ContextFramesBytesIO(data))
+        return tuple(map_abi_data(BASE_RETURN_NORMALIZERS, types, decoded))
+
+    return decode
+
+
+def get_event_decoder(abi_codec: ABICodec, event_abi: ABIEvent) -> EventDecoder:
+    """Return the EventDecoder for `event_abi`, creating it only on first use"""
+    return _cached_event_decoder(abi_codec, json.dumps(event_abi, sort_keys=True))
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_event_decoder(abi_codec: ABICodec, event_abi_json: str) -> EventDecoder:
+    """The cache behind get_event_decoder()
+
+    Bounded, since every Web3 instance brings its own codec.
+    """
+    return EventDecoder(abi_codec=abi_codec, event_abi=json.loads(event_abi_json))
+
+
 class LogFilter:
     def __init__(
         self,
@@ -171,11 +351,11 @@ class LogFilter:
             fromBlock=from_block,
             toBlock=to_block,
         )
-        log_data_extract_fn = functools.partial(get_event_data, web3.codec, event_abi)
+        self.decoder = get_event_decoder(web3.codec, self.event_abi)
 
         self.filter: Web3LogFilter = web3.eth.filter(filter_params)
         self.filter.set_data_filters(data_filter_set)  # type: ignore
-        self.filter.log_entry_formatter = log_data_extract_fn
+        self.filter.log_entry_formatter = self.decoder.decode
         self.filter.filter_params = filter_params
 
     def init(self, post_callback: Optional[Callable[[], None]] = None) -> None:
@@ -190,14 +370,15 @@ class LogFilter:
         assert self.filter.filter_id is not None
         logs = self.web3.eth.get_filter_logs(self.filter.filter_id)
         formatted_logs = []
-        for log in [dict(log) for log in logs]:
-            formatted_logs.append(self.set_log_data(log))
+        for log, event in zip(logs, self.decoder.decode_batch(logs)):
+            formatted_log = dict(log)
+            formatted_log["args"] = event["args"]
+            formatted_log["event"] = self.event_name
+            formatted_logs.append(formatted_log)
         return formatted_logs
 
     def set_log_data(self, log: Dict[str, Any]) -> Dict[str, Any]:
-        log["args"] = get_event_data(
-            abi_codec=self.web3.codec, event_abi=self.event_abi, log_entry=log
-        )["args"]
+        log["args"] = self.decoder.decode(cast(LogReceipt, log))["args"]
         log["event"] = self.event_name
         return log
 
@@ -5,12 +5,12 @@ import click
 from eth_typing import URI, ChecksumAddress
 from eth_utils import encode_hex
 from hexbytes import HexBytes
-from web3 import HTTPProvider, Web3
 from web3.middleware import construct_sign_and_send_raw_middleware
 
 from raiden_contracts.constants import CONTRACT_CUSTOM_TOKEN
 from raiden_contracts.contract_manager import ContractManager, contracts_precompiled_path
 from raiden_contracts.utils.private_key import get_private_key
+from raiden_contracts.utils.rpc import connect
 from raiden_contracts.utils.signature import private_key_to_address
 
 WEI_TO_ETH = 10**18
@@ -24,7 +24,7 @@ WEI_TO_ETH = 10**18
 @click.option("--token-address", help="address of the token contract", required=True)
 @click.option("--amount", help="Amount of tokens to mint", required=True, type=click.INT)
 def main(rpc_url: URI, private_key: Path, token_address: ChecksumAddress, amount: int) -> None:
-    web3 = Web3(HTTPProvider(rpc_url))
+    web3 = connect(rpc_url)
     privkey = get_private_key(private_key)
     assert privkey is not None
     owner = private_key_to_address(privkey)
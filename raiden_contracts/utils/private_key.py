@@ -9,6 +9,7 @@ from typing import Optional
 from eth_keyfile import decode_keyfile_json
 from eth_utils import decode_hex, is_hex
 
+from raiden_contracts.utils.profiling import phase
 from raiden_contracts.utils.type_aliases import PrivateKey
 
 log = logging.getLogger(__name__)
@@ -68,7 +69,8 @@ def get_private_key(key_path: Path, password_path: Optional[Path] = None) -> Opt
                     password = getpass.getpass("Enter the private key password: ")
                 if json_data["crypto"]["kdf"] == "pbkdf2":
                     password = password.encode()  # type: ignore
-                return PrivateKey(decode_keyfile_json(json_data, password))
+                with phase("decrypt key"):
+                    return PrivateKey(decode_keyfile_json(json_data, password))
             except ValueError:
                 log.critical("Invalid private key format or password!")
                 return None
@@ -0,0 +1,167 @@
+"""Where the time of a deployment, verification or token command goes
+
+When profiling is enabled with `start()`, the RPC requests made through
+`connect()` and the phases marked with `phase()` are recorded: key
+decryption, loading contracts, sending and signing transactions and waiting
+for receipts. Without an active profile, recording costs a global lookup.
+"""
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Profile:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Durations of the HTTP requests, by JSON-RPC method or "batch"
+        self.requests: Dict[str, List[float]] = defaultdict(list)
+        # Number of JSON-RPC calls, including those made in batches
+        self.calls: Counter = Counter()
+        self.phases: Dict[str, List[float]] = defaultdict(list)
+
+    def record_request(
+        self, method: str, seconds: float, calls: Optional[List[str]] = None
+    ) -> None:
+        with self._lock:
+            self.requests[method].append(seconds)
+            self.calls.update(calls if calls is not None else [method])
+
+    def record_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name].append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            methods = sorted(set(self.requests) | set(self.calls))
+            return {
+                "rpc": {
+                    method: {
+                        "calls": self.calls[method],
+                        **_statistics(self.requests.get(method, [])),
+                        "histogram_ms": _histogram(self.requests.get(method, [])),
+                    }
+                    for method in methods
+                },
+                "phases": {
+                    name: _statistics(durations) for name, durations in self.phases.items()
+                },
+            }
+
+    def report(self) -> str:
+        """The summary as tables, slowest first"""
+        summary = self.summary()
+        lines = [
+            f"{'RPC method':<32} {'calls':>7} {'requests':>8} {'total s':>9} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        ]
+        for method, stats in sorted(summary["rpc"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(
+                f"{method:<32} {stats['calls']:>7} {stats['count']:>8} {stats['total']:>9.3f} "
+                f"{stats['p50'] * 1000:>8.1f} {stats['p95'] * 1000:>8.1f} "
+                f"{stats['max'] * 1000:>8.1f}"
+            )
+        lines.append("")
+        lines.append(f"{'Phase':<32} {'count':>7} {'total s':>9} {'max s':>8}")
+        for name, stats in sorted(summary["phases"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(
+                f"{name:<32} {stats['count']:>7} {stats['total']:>9.3f} {stats['max']:>8.3f}"
+            )
+        return "\n".join(lines)
+
+    def write_json(self, path: Path) -> None:
+        path.write_text(json.dumps(self.summary(), indent=4))
+
+
+def _statistics(durations: List[float]) -> Dict[str, Any]:
+    ordered = sorted(durations)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+    return {
+        "count": len(ordered),
+        "total": sum(ordered),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def _histogram(durations: List[float]) -> Dict[str, int]:
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for seconds in durations:
+        counts[bisect_left(HISTOGRAM_BUCKETS_MS, seconds * 1000)] += 1
+    labels = [f"<={bound}" for bound in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}"]
+    return {label: count for label, count in zip(labels, counts) if count}
+
+
+_active: Optional[Profile] = None
+
+
+def start() -> Profile:
+    global _active  # pylint: disable=global-statement
+    _active = Profile()
+    return _active
+
+
+def stop() -> Optional[Profile]:
+    global _active  # pylint: disable=global-statement
+    profile, _active = _active, None
+    return profile
+
+
+def active() -> Optional[Profile]:
+    return _active
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Record the duration of the block as phase `name` of the active profile"""
+    profile = _active
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record_phase(name, time.perf_counter() - started)
+
+
+def profiling_middleware(make_request: Callable, _web3: Any) -> Callable:
+    """Web3 middleware recording the duration of every request in the active profile"""
+
+    def middleware(method: str, params: Any) -> Any:
+        profile = _active
+        if profile is None:
+            return make_request(method, params)
+        started = time.perf_counter()
+        try:
+            return make_request(method, params)
+        finally:
+            profile.record_request(method, time.perf_counter() - started)
+
+    return middleware
+
+
+def profile_command(ctx: Any, print_report: bool, json_path: Optional[Path]) -> None:
+    """Profile the click command of `ctx` and report when it is done, even if it failed"""
+    profile = start()
+
+    def finish() -> None:
+        stop()
+        if print_report:
+            print(profile.report(), file=sys.stderr)
+        if json_path:
+            profile.write_json(json_path)
+
+    ctx.call_on_close(finish)
@@ -242,17 +242,15 @@ def sign_reward_proof(
     return sign(privkey=privatekey, msg_hash=message_hash, v=v)
 
 
-def sign_one_to_n_iou(
-    privatekey: PrivateKey,
+def pack_one_to_n_iou(
     sender: HexAddress,
     receiver: HexAddress,
     amount: TokenAmount,
     claimable_until: int,
     one_to_n_address: HexAddress,
     chain_id: ChainID,
-    v: int = 27,
 ) -> bytes:
-    iou_hash = eth_sign_hash_message(
+    return (
         Web3.toBytes(hexstr=one_to_n_address)
         + encode_single("uint256", chain_id)
         + encode_single("uint256", MessageTypeId.IOU)
@@ -261,4 +259,26 @@ def sign_one_to_n_iou(
         + encode_single("uint256", amount)
         + encode_single("uint256", claimable_until)
     )
+
+
+def sign_one_to_n_iou(
+    privatekey: PrivateKey,
+    sender: HexAddress,
+    receiver: HexAddress,
+    amount: TokenAmount,
+    claimable_until: int,
+    one_to_n_address: HexAddress,
+    chain_id: ChainID,
+    v: int = 27,
+) -> bytes:
+    iou_hash = eth_sign_hash_message(
+        pack_one_to_n_iou(
+            sender=sender,
+            receiver=receiver,
+            amount=amount,
+            claimable_until=claimable_until,
+            one_to_n_address=one_to_n_address,
+            chain_id=chain_id,
+        )
+    )
     return sign(privkey=privatekey, msg_hash=iou_hash, v=v)
@@ -0,0 +1,231 @@
+"""Connections to JSON-RPC nodes and batched JSON-RPC requests
+
+All tools connect with `connect()`. Its provider keeps one pool of keep-alive
+connections per node, shared by all threads and Web3 instances, and retries
+requests which failed for transient reasons, like a dropped connection or a
+rate limit, with jittered exponential backoff.
+
+web3.py sends one HTTP request per RPC call. Nodes also accept a JSON array of
+calls in a single request, which saves a round trip for every call after the
+first one. This is worthwhile whenever many independent values are read, e.g.
+the receipts of many transactions.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Sequence, Tuple, cast
+
+import requests
+from eth_typing import URI
+from eth_utils import to_text
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider, Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3._utils.method_formatters import get_result_formatters
+from web3._utils.request import make_post_request
+from web3._utils.rpc_abi import RPC
+from web3.middleware import geth_poa_middleware
+from web3.types import RPCEndpoint, RPCResponse
+
+from raiden_contracts.utils import profiling
+
+LOG = getLogger(__name__)
+
+# Connections kept open to each node. More concurrent requests wait for a free connection.
+POOL_SIZE = 16
+RETRIES = 5
+RETRY_BACKOFF = 0.5
+# HTTP status codes of responses which are worth retrying
+TRANSIENT_STATUS_CODES = (429, 502, 503, 504)
+RATE_LIMITED = 429
+# A failed request with these methods may have reached the node. Sending the same
+# transaction again would fail, so they are only retried if the node rejected them.
+NON_IDEMPOTENT_METHODS = (RPC.eth_sendRawTransaction, RPC.eth_sendTransaction)
+
+# A JSON-RPC method with its parameters
+RPCCall = Tuple[RPCEndpoint, Sequence[Any]]
+
+_request_ids = itertools.count()
+
+_sessions: Dict[Tuple[str, int], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def pooled_session(endpoint_uri: str, pool_size: int = POOL_SIZE) -> requests.Session:
+    """The session of `endpoint_uri`, whose connections are shared by all threads"""
+    with _sessions_lock:
+        key = (endpoint_uri, pool_size)
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """An HTTPProvider with a connection pool shared by all threads, which retries
+
+    web3 keeps one session per thread, so that threads do not share
+    connections. This provider uses `pooled_session()` instead. It replaces the
+    retry middleware of HTTPProvider, which retries without backoff.
+    """
+
+    _middlewares = ()
+
+    def __init__(
+        self,
+        endpoint_uri: URI,
+        timeout: float = 60,
+        pool_size: int = POOL_SIZE,
+        retries: int = RETRIES,
+        backoff: float = RETRY_BACKOFF,
+    ) -> None:
+        super().__init__(endpoint_uri, request_kwargs={"timeout": timeout})
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request_data = self.encode_rpc_request(method, params)
+        raw_response = self.post(request_data, idempotent=method not in NON_IDEMPOTENT_METHODS)
+        return self.decode_rpc_response(raw_response)
+
+    def post(self, data: bytes, idempotent: bool = True) -> bytes:
+        """POST `data` to the node, retrying transient failures"""
+        assert self.endpoint_uri is not None
+        session = pooled_session(self.endpoint_uri, self.pool_size)
+        attempt = 0
+        while True:
+            try:
+                response = session.post(
+                    self.endpoint_uri, data=data, **dict(self.get_request_kwargs())
+                )
+                response.raise_for_status()
+                return response.content
+            except requests.RequestException as ex:
+                if attempt >= self.retries or not _is_transient(ex, idempotent):
+                    raise
+                delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+                LOG.info(f"Request to {self.endpoint_uri} failed ({ex}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+
+def _is_transient(ex: requests.RequestException, idempotent: bool) -> bool:
+    if isinstance(ex, requests.HTTPError) and ex.response is not None:
+        if not idempotent:
+            return ex.response.status_code == RATE_LIMITED
+        return ex.response.status_code in TRANSIENT_STATUS_CODES
+    return idempotent and isinstance(ex, (requests.ConnectionError, requests.Timeout))
+
+
+def connect(
+    rpc_provider: str,
+    timeout: float = 60,
+    pool_size: int = POOL_SIZE,
+    retries: int = RETRIES,
+    poa: bool = True,
+) -> Web3:
+    """A Web3 instance for `rpc_provider`, as used by all tools"""
+    web3 = Web3(
+        PooledHTTPProvider(
+            URI(rpc_provider), timeout=timeout, pool_size=pool_size, retries=retries
+        )
+    )
+    if poa:
+        web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    # Innermost, to time the requests as sent, e.g. after signing a transaction
+    web3.middleware_onion.inject(profiling.profiling_middleware, "profiling", layer=0)
+    return web3
+
+
+def batch_request(web3: Web3, calls: Sequence[RPCCall], return_errors: bool = False) -> List[Any]:
+    """Make all `calls` in one JSON-RPC batch and return their results in order
+
+    Results are formatted like the results of the corresponding `web3.eth`
+    methods, e.g. receipts are AttributeDicts with int fields. A null result,
+    like the receipt of a pending transaction, is returned as None. An error
+    response raises a ValueError, as in web3. With `return_errors`, the
+    ValueError of a failed call is returned in place of its result instead.
+
+    Batches bypass the web3 middlewares. Do not use them for calls relying on a
+    middleware, like reading blocks of a PoA chain or sending transactions
+    through the signing middleware.
+
+    Providers other than HTTPProvider get the calls one after another.
+    """
+    if not calls:
+        return []
+    if isinstance(web3.provider, HTTPProvider):
+        responses = _post_batch(web3.provider, calls)
+    else:
+        responses = [_request(web3, method, params, return_errors) for method, params in calls]
+
+    results: List[Any] = []
+    for (method, _), response in zip(calls, responses):
+        if "error" in response:
+            if not return_errors:
+                raise ValueError(response["error"])
+            results.append(ValueError(response["error"]))
+            continue
+        result = response.get("result")
+        if result is not None:
+            formatter = cast(Callable[[Any], Any], get_result_formatters(method, web3.eth))
+            result = formatter(result)
+        results.append(result)
+    return results
+
+
+def _request(
+    web3: Web3, method: RPCEndpoint, params: Sequence[Any], return_errors: bool
+) -> RPCResponse:
+    try:
+        return RPCResponse({"result": web3.manager.request_blocking(method, list(params))})
+    except Exception as ex:  # pylint: disable=broad-except
+        # Providers raise their own exceptions, e.g. for a reverted eth_call
+        if not return_errors:
+            raise
+        return RPCResponse({"error": str(ex)})
+
+
+def _post_batch(provider: HTTPProvider, calls: Sequence[RPCCall]) -> List[RPCResponse]:
+    ids = [next(_request_ids) for _ in calls]
+    request_data = json.dumps(
+        [
+            {"jsonrpc": "2.0", "method": method, "params": list(params), "id": request_id}
+            for request_id, (method, params) in zip(ids, calls)
+        ],
+        cls=Web3JsonEncoder,
+    )
+    started = time.perf_counter()
+    if isinstance(provider, PooledHTTPProvider):
+        idempotent = not any(method in NON_IDEMPOTENT_METHODS for method, _ in calls)
+        raw_response = provider.post(request_data.encode(), idempotent=idempotent)
+    else:
+        assert provider.endpoint_uri is not None
+        raw_response = make_post_request(
+            provider.endpoint_uri,
+            request_data.encode(),
+            **dict(provider.get_request_kwargs()),
+        )
+    profile = profiling.active()
+    if profile is not None:
+        profile.record_request(
+            "batch", time.perf_counter() - started, calls=[method for method, _ in calls]
+        )
+    decoded = json.loads(to_text(raw_response))
+    if not isinstance(decoded, list):
+        # Nodes answer with a single error object if they reject the whole batch
+        raise ValueError(decoded.get("error", decoded))
+
+    # The responses of a batch may come in any order
+    by_id: Dict[int, RPCResponse] = {response["id"]: response for response in decoded}
+    missing = [request_id for request_id in ids if request_id not in by_id]
+    if missing:
+        raise ValueError(f"No response for the batched requests {missing}")
+    return [by_id[request_id] for request_id in ids]
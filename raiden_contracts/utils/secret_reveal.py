@@ -0,0 +1,91 @@
+"""Plan the registration of many secrets with SecretRegistry.registerSecretBatch
+
+A lock can only be unlocked if its secret was registered in a block with a
+timestamp before the lock's expiration (``unlockable_until``). Registering
+secrets in batches costs much less gas per secret than one registerSecret call
+per secret, but a batch must still be mined before the earliest expiration of
+its locks. The planner sorts the locks by expiration, so that the most urgent
+secrets go into the first batch, and fills every batch up to the gas limit.
+"""
+from typing import Iterable, List, NamedTuple, Optional, Set
+
+from raiden_contracts.constants import CONTRACT_SECRET_REGISTRY
+from raiden_contracts.contract_manager import GasModel
+
+REGISTER_SECRET_BATCH = CONTRACT_SECRET_REGISTRY + ".registerSecretBatch"
+
+
+class PendingLock(NamedTuple):
+    # The timestamp the secret has to be registered before
+    expiration: int
+    secret: bytes
+
+
+class SecretRevealBatch(NamedTuple):
+    """The arguments and gas of one registerSecretBatch call"""
+
+    secrets: List[bytes]
+    gas: int
+    # The earliest expiration of the locks of the batch
+    deadline: int
+
+
+class SecretRevealPlan(NamedTuple):
+    batches: List[SecretRevealBatch]
+    # Locks which cannot be revealed in time any more
+    missed: List[PendingLock]
+
+
+def plan_secret_reveals(
+    locks: Iterable[PendingLock],
+    now: int,
+    gas_limit: int,
+    seconds_per_batch: int = 15,
+    gas_model: Optional[GasModel] = None,
+) -> SecretRevealPlan:
+    """Group the secrets of `locks` into registerSecretBatch calls
+
+    The batches are meant to be sent in order, and batch ``i`` is expected to
+    be mined ``(i + 1) * seconds_per_batch`` after `now`. Locks which expire
+    before their batch would be mined are returned as missed instead of taking
+    space from the others. A secret shared by several locks is registered once,
+    for the earliest of its locks which can still be met. Every batch needs at
+    most `gas_limit` gas.
+    """
+    cost = (gas_model or GasModel.from_version()).cost(REGISTER_SECRET_BATCH)
+    max_secrets = cost.max_items(gas_limit)
+    if max_secrets == 0:
+        raise ValueError(f"A gas limit of {gas_limit} does not fit a single secret")
+
+    urgent_first = sorted(locks, key=lambda lock: lock.expiration)
+    for lock in urgent_first:
+        if len(lock.secret) != 32:
+            raise ValueError(f"Secrets are 32 bytes long, not {len(lock.secret)}")
+
+    batches: List[SecretRevealBatch] = []
+    missed: List[PendingLock] = []
+    current: List[PendingLock] = []
+    # Secrets in a batch, which are registered in time for all their later locks
+    revealed: Set[bytes] = set()
+    for lock in urgent_first:
+        if lock.secret in revealed:
+            continue
+        mined_at = now + (len(batches) + 1) * seconds_per_batch
+        if lock.expiration <= mined_at:
+            # A later lock with the same secret may still be met
+            missed.append(lock)
+            continue
+        revealed.add(lock.secret)
+        current.append(lock)
+        if len(current) == max_secrets:
+            batches.append(_batch(current, cost.gas(len(current))))
+            current = []
+    if current:
+        batches.append(_batch(current, cost.gas(len(current))))
+    return SecretRevealPlan(batches=batches, missed=missed)
+
+
+def _batch(locks: List[PendingLock], gas: int) -> SecretRevealBatch:
+    return SecretRevealBatch(
+        secrets=[lock.secret for lock in locks], gas=gas, deadline=locks[0].expiration
+    )
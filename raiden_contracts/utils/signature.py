@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Optional, Union
 
 from coincurve import PrivateKey, PublicKey
 from eth_typing import ChecksumAddress, HexStr
@@ -30,6 +30,24 @@ def sign(privkey: ContractsPrivateKey, msg_hash: bytes, v: int = 0) -> bytes:
     return sig
 
 
+def recover(msg_hash: bytes, signature: bytes) -> Optional[ChecksumAddress]:
+    """The signer of `msg_hash` as found by ECVerify, None for an invalid signature"""
+    if len(signature) != 65:
+        return None
+    v = signature[64]
+    if v >= 27:
+        v -= 27
+    if v not in {0, 1}:
+        return None
+    try:
+        public_key = PublicKey.from_signature_and_message(
+            signature[:64] + bytes([v]), msg_hash, hasher=None
+        )
+    except ValueError:
+        return None
+    return public_key_to_address(public_key)
+
+
 def private_key_to_address(
     private_key: Union[PrivateKey, ContractsPrivateKey, bytes, str]
 ) -> ChecksumAddress:
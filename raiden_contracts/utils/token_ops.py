@@ -1,36 +1,177 @@
+import csv
 import functools
+import json
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
 
 import click
-import requests
 from eth_typing import URI, ChecksumAddress
 from eth_utils import to_checksum_address
 from hexbytes import HexBytes
-from web3 import HTTPProvider, Web3
-from web3.middleware import construct_sign_and_send_raw_middleware, geth_poa_middleware
-from web3.types import TxReceipt, Wei
+from web3 import Web3
+from web3.contract import Contract
+from web3.middleware import construct_sign_and_send_raw_middleware
+from web3.types import BlockIdentifier, TxReceipt, Wei
 
 from raiden_contracts.constants import CONTRACT_CUSTOM_TOKEN
 from raiden_contracts.contract_manager import ContractManager, contracts_precompiled_path
+from raiden_contracts.utils.abi_cache import AbiCache
+from raiden_contracts.utils.contract_reads import (
+    read_addresses,
+    read_calls,
+    read_channel_deposits,
+    results_table,
+    token_balance_calls,
+    user_deposit_calls,
+)
 from raiden_contracts.utils.private_key import get_private_key
+from raiden_contracts.utils.profiling import profile_command
+from raiden_contracts.utils.rpc import connect
 from raiden_contracts.utils.signature import private_key_to_address
-from raiden_contracts.utils.transaction import check_successful_tx
+from raiden_contracts.utils.transaction import TransactionPipeline, check_successful_tx
+from raiden_contracts.utils.type_aliases import ChainID
+
+# The ABI of this WETH contract is used for all WETH contracts
+MAINNET_WETH_ADDRESS = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+
+
+class Payment(NamedTuple):
+    address: ChecksumAddress
+    amount: int
+
+
+class PaymentResult(NamedTuple):
+    payment: Payment
+    transaction_hash: Optional[HexBytes]
+    error: Optional[Exception]
+
+
+def read_payments(path: Path) -> List[Payment]:
+    """Read recipients and amounts from a CSV or JSON file
+
+    A CSV file has the columns address and amount, optionally with a header
+    line. A JSON file contains either a list of {"address": ..., "amount": ...}
+    objects or an object mapping addresses to amounts.
+    """
+    rows: List[Sequence[Any]]
+    with path.open() as recipients_file:
+        if path.suffix.lower() == ".json":
+            entries = json.load(recipients_file)
+            if isinstance(entries, dict):
+                rows = list(entries.items())
+            else:
+                rows = [(entry["address"], entry["amount"]) for entry in entries]
+        else:
+            rows = [row for row in csv.reader(recipients_file) if row]
+            if rows and rows[0][0].strip().lower() == "address":
+                rows = rows[1:]
+
+    payments = []
+    for row in rows:
+        if len(row) != 2:
+            raise ValueError(f"{path}: expected an address and an amount, got {row}")
+        address, amount = row
+        payment = Payment(to_checksum_address(str(address).strip()), int(amount))
+        if payment.amount <= 0:
+            raise ValueError(f"{path}: amount for {payment.address} must be positive")
+        payments.append(payment)
+    if not payments:
+        raise ValueError(f"{path} does not list any recipients")
+    return payments
+
+
+def send_payments(
+    web3: Web3,
+    sender: ChecksumAddress,
+    token_proxy: Contract,
+    function_name: str,
+    payments: List[Payment],
+    wait: int,
+) -> List[PaymentResult]:
+    """Call `function_name` of the token for every payment and wait for all of them
+
+    The transactions are sent back-to-back with local nonces. Gas and fees are
+    determined once, for the first payment, and the ether balance is checked
+    against all of them before anything is sent. A failing payment does not stop
+    the others; its error is returned with its result.
+    """
+
+    def arguments(payment: Payment) -> List[Any]:
+        if function_name == "mintFor":
+            return [payment.amount, payment.address]
+        return [payment.address, payment.amount]
+
+    first = getattr(token_proxy.functions, function_name)(*arguments(payments[0]))
+    # Paying a recipient without tokens costs more than one with tokens, so leave a margin
+    gas = first.estimate_gas({"from": sender}) * 2
+    base = first.build_transaction({"from": sender, "gas": gas})
+    max_cost = gas * base.get("gasPrice", base.get("maxFeePerGas", 0)) * len(payments)
+    assert (
+        web3.eth.get_balance(sender) >= max_cost
+    ), f"Not sufficient ether to pay for {len(payments)} transactions"
+
+    pipeline = TransactionPipeline(web3=web3, sender=sender, timeout=wait)
+    sent: List[PaymentResult] = []
+    for payment in payments:
+        transaction = base.copy()
+        transaction["data"] = token_proxy.encodeABI(fn_name=function_name, args=arguments(payment))
+        try:
+            txhash = pipeline.submit(transaction)
+        except Exception as ex:  # pylint: disable=broad-except
+            sent.append(PaymentResult(payment, None, ex))
+        else:
+            sent.append(PaymentResult(payment, txhash, None))
+
+    results = []
+    for result in sent:
+        if result.transaction_hash is not None:
+            try:
+                pipeline.wait([result.transaction_hash])
+            except Exception as ex:  # pylint: disable=broad-except
+                result = result._replace(error=ex)
+        results.append(result)
+    return results
+
+
+def bulk_transfer(
+    web3: Web3,
+    sender: ChecksumAddress,
+    token_proxy: Contract,
+    payments: List[Payment],
+    wait: int,
+) -> List[PaymentResult]:
+    """Transfer tokens to all recipients after checking the token balance once"""
+    total = sum(payment.amount for payment in payments)
+    balance = token_proxy.functions.balanceOf(sender).call()
+    assert balance >= total, f"Not enough token balances ({balance} < {total})"
+    return send_payments(web3, sender, token_proxy, "transfer", payments, wait)
+
+
+def payments_summary(results: List[PaymentResult]) -> str:
+    failed = [result for result in results if result.error is not None]
+    paid = sum(result.payment.amount for result in results if result.error is None)
+    lines = [f"{len(results) - len(failed)} of {len(results)} payments succeeded ({paid} tokens)"]
+    for result in failed:
+        txhash = result.transaction_hash.hex() if result.transaction_hash else "not sent"
+        lines.append(
+            f"  {result.payment.address} {result.payment.amount}: {result.error} ({txhash})"
+        )
+    return "\n".join(lines)
 
 
 class TokenOperations:
     def __init__(
         self, rpc_url: URI, private_key: Path, password: Optional[Path] = None, wait: int = 10
     ):
-        self.web3 = Web3(HTTPProvider(rpc_url))
+        self.web3 = connect(rpc_url)
         self.private_key = get_private_key(private_key, password)
         assert self.private_key is not None
         self.owner = private_key_to_address(self.private_key)
         self.wait = wait
         self.web3.middleware_onion.add(construct_sign_and_send_raw_middleware(self.private_key))
         self.web3.eth.default_account = self.owner
-
-        self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        self.contract_manager = ContractManager(contracts_precompiled_path())
+        self.abi_cache = AbiCache()
 
     def is_valid_contract(self, token_address: ChecksumAddress) -> bool:
         return self.web3.eth.get_code(token_address, "latest") != HexBytes("")
@@ -40,9 +181,7 @@ class TokenOperations:
         assert self.is_valid_contract(
             token_address
         ), "The custom token contract does not seem to exist on this address"
-        token_contract = ContractManager(contracts_precompiled_path()).get_contract(
-            CONTRACT_CUSTOM_TOKEN
-        )
+        token_contract = self.contract_manager.get_contract(CONTRACT_CUSTOM_TOKEN)
         token_proxy = self.web3.eth.contract(address=token_address, abi=token_contract["abi"])
         txhash = token_proxy.functions.mint(amount).transact({"from": self.owner})
         receipt, _ = check_successful_tx(web3=self.web3, txid=txhash, timeout=self.wait)
@@ -56,11 +195,7 @@ class TokenOperations:
         assert self.is_valid_contract(
             token_address
         ), "The WETH token does not exist on this contract"
-        result = requests.get(
-            "http://api.etherscan.io/api?module=contract&action=getabi&"
-            "address=0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
-        )
-        weth_abi = result.json()["result"]
+        weth_abi = self.abi_cache.get(ChainID(1), MAINNET_WETH_ADDRESS)
         weth_proxy = self.web3.eth.contract(address=token_address, abi=weth_abi)
         assert weth_proxy.functions.symbol().call() == "WETH", "This contract is not a WETH token"
         txhash = weth_proxy.functions.deposit().transact(
@@ -76,9 +211,7 @@ class TokenOperations:
         assert self.is_valid_contract(
             token_address
         ), "The token contract does not seem to exist on this address"
-        token_contract = ContractManager(contracts_precompiled_path()).get_contract(
-            CONTRACT_CUSTOM_TOKEN
-        )
+        token_contract = self.contract_manager.get_contract(CONTRACT_CUSTOM_TOKEN)
         token_proxy = self.web3.eth.contract(address=token_address, abi=token_contract["abi"])
         assert (
             token_proxy.functions.balanceOf(self.owner).call() >= amount
@@ -93,12 +226,32 @@ class TokenOperations:
         assert self.is_valid_contract(
             token_address
         ), "The Token Contract does not seem to exist on this address"
-        token_contract = ContractManager(contracts_precompiled_path()).get_contract(
-            CONTRACT_CUSTOM_TOKEN
-        )
+        token_contract = self.contract_manager.get_contract(CONTRACT_CUSTOM_TOKEN)
         token_proxy = self.web3.eth.contract(address=token_address, abi=token_contract["abi"])
         return token_proxy.functions.balanceOf(address).call()
 
+    def token_proxy(self, token_address: ChecksumAddress) -> Contract:
+        token_address = to_checksum_address(token_address)
+        assert self.is_valid_contract(
+            token_address
+        ), "The token contract does not seem to exist on this address"
+        token_contract = self.contract_manager.get_contract(CONTRACT_CUSTOM_TOKEN)
+        return self.web3.eth.contract(address=token_address, abi=token_contract["abi"])
+
+    def bulk_transfer_tokens(
+        self, token_address: ChecksumAddress, payments: List[Payment]
+    ) -> List[PaymentResult]:
+        return bulk_transfer(
+            self.web3, self.owner, self.token_proxy(token_address), payments, self.wait
+        )
+
+    def bulk_mint_tokens(
+        self, token_address: ChecksumAddress, payments: List[Payment]
+    ) -> List[PaymentResult]:
+        return send_payments(
+            self.web3, self.owner, self.token_proxy(token_address), "mintFor", payments, self.wait
+        )
+
 
 def common_options(func: Callable) -> Callable:
     """A decorator that combines commonly appearing @click.option decorators."""
@@ -128,8 +281,17 @@ def common_options(func: Callable) -> Callable:
 
 
 @click.group()
-def cli() -> None:
-    pass
+@click.option("--profile", is_flag=True, help="Print RPC and phase timings when done.")
+@click.option(
+    "--profile-json",
+    type=click.Path(dir_okay=False),
+    help="Write RPC and phase timings as JSON to this file.",
+    callback=lambda ctx, param, value: Path(value) if value is not None else None,
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, profile_json: Optional[Path]) -> None:
+    if profile or profile_json:
+        profile_command(ctx, print_report=profile, json_path=profile_json)
 
 
 @cli.command()
@@ -208,7 +370,7 @@ def transfer(
 def balance(rpc_url: URI, token_address: str, address: str) -> None:
     token_address = to_checksum_address(token_address)
     address = to_checksum_address(address)
-    web3 = Web3(HTTPProvider(rpc_url))
+    web3 = connect(rpc_url)
     token_contract = ContractManager(contracts_precompiled_path()).get_contract(
         CONTRACT_CUSTOM_TOKEN
     )
@@ -217,5 +379,131 @@ def balance(rpc_url: URI, token_address: str, address: str) -> None:
     print(f"Balance of the {address} : {balance}")
 
 
+@cli.command()
+@click.option(
+    "--rpc-url",
+    default="http://127.0.0.1:8545",
+    help="Address of the Ethereum RPC provider",
+    type=click.STRING,
+)
+@click.option(
+    "--addresses",
+    required=True,
+    help="File with one holder address per line, optionally followed by a channel partner",
+    type=click.Path(exists=True, dir_okay=False),
+    callback=lambda ctx, param, value: Path(value) if value is not None else None,
+)
+@click.option(
+    "--token-address", multiple=True, help="Token to read balances of", type=click.STRING
+)
+@click.option("--user-deposit-address", help="UserDeposit to read balances of", type=click.STRING)
+@click.option(
+    "--token-network-address",
+    help="TokenNetwork to read the deposits of holders in channels with their partners",
+    type=click.STRING,
+)
+@click.option("--block", help="Block number to read at, the latest by default", type=click.INT)
+def balances(
+    rpc_url: URI,
+    addresses: Path,
+    token_address: List[str],
+    user_deposit_address: Optional[str],
+    token_network_address: Optional[str],
+    block: Optional[int],
+) -> None:
+    """Read many balances in batched requests and print them as a table"""
+    rows = read_addresses(addresses.read_text().splitlines())
+    holders = [row[0] for row in rows]
+    web3 = connect(rpc_url)
+    block_identifier: BlockIdentifier = block if block is not None else "latest"
+
+    calls = token_balance_calls([to_checksum_address(token) for token in token_address], holders)
+    if user_deposit_address:
+        calls += user_deposit_calls(to_checksum_address(user_deposit_address), holders)
+    results = read_calls(web3, calls, block_identifier=block_identifier)
+    if token_network_address:
+        pairs = [(row[0], row[1]) for row in rows if len(row) > 1]
+        results += read_channel_deposits(
+            web3,
+            to_checksum_address(token_network_address),
+            pairs,
+            block_identifier=block_identifier,
+        )
+    print(results_table(results))
+
+
+def bulk_options(func: Callable) -> Callable:
+    """The options of the bulk commands, which read amounts from a file"""
+
+    @click.option(
+        "--private-key", required=True, help="Path to a private key store.", type=click.STRING
+    )
+    @click.option("--password", help="password file for the keystore json file", type=click.STRING)
+    @click.option(
+        "--rpc-url",
+        default="http://127.0.0.1:8545",
+        help="Address of the Ethereum RPC provider",
+        type=click.STRING,
+    )
+    @click.option(
+        "--token-address", required=True, help="Address of the token contract", type=click.STRING
+    )
+    @click.option(
+        "--recipients",
+        required=True,
+        help="CSV or JSON file with the address and amount of every recipient",
+        type=click.Path(exists=True, dir_okay=False),
+        callback=lambda ctx, param, value: Path(value) if value is not None else None,
+    )
+    @click.option("--wait", default=300, help="Max tx wait time in s.", type=click.INT)
+    @functools.wraps(func)
+    def wrapper(*args: List, **kwargs: Dict) -> Any:
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+@cli.command("bulk-transfer")
+@bulk_options
+def bulk_transfer_command(
+    private_key: str,
+    password: Optional[str],
+    rpc_url: URI,
+    token_address: ChecksumAddress,
+    recipients: Path,
+    wait: int,
+) -> None:
+    payments = read_payments(recipients)
+    password_path = Path(password) if password else None
+    token_ops = TokenOperations(rpc_url, Path(private_key), password_path, wait)
+    print(f"Transferring tokens to {len(payments)} recipients")
+    results = token_ops.bulk_transfer_tokens(token_address, payments)
+    print(payments_summary(results))
+    balance = token_ops.get_balance(token_address, token_ops.owner)
+    print(f"Balance of the {token_ops.owner} : {balance}")
+    if any(result.error for result in results):
+        raise click.ClickException("Some transfers failed")
+
+
+@cli.command("bulk-mint")
+@bulk_options
+def bulk_mint_command(
+    private_key: str,
+    password: Optional[str],
+    rpc_url: URI,
+    token_address: ChecksumAddress,
+    recipients: Path,
+    wait: int,
+) -> None:
+    payments = read_payments(recipients)
+    password_path = Path(password) if password else None
+    token_ops = TokenOperations(rpc_url, Path(private_key), password_path, wait)
+    print(f"Minting tokens for {len(payments)} recipients")
+    results = token_ops.bulk_mint_tokens(token_address, payments)
+    print(payments_summary(results))
+    if any(result.error for result in results):
+        raise click.ClickException("Some mints failed")
+
+
 if __name__ == "__main__":
     cli()
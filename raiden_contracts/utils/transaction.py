@@ -1,10 +1,26 @@
-from typing import Optional, Tuple
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import Future, wait as wait_futures
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
 
+from eth_typing import ChecksumAddress
 from hexbytes import HexBytes
 from web3 import Web3
+from web3._utils.rpc_abi import RPC
 from web3._utils.threads import Timeout
-from web3.exceptions import TransactionNotFound
-from web3.types import TxData, TxReceipt
+from web3.exceptions import TimeExhausted, TransactionNotFound
+from web3.types import Nonce, TxData, TxParams, TxReceipt
+
+from raiden_contracts.utils.profiling import phase
+from raiden_contracts.utils.rpc import batch_request
+
+LOG = logging.getLogger(__name__)
+
+# Receipts are polled this often at first, backing off up to the maximum while nothing is mined
+POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 5.0
 
 
 def check_successful_tx(
@@ -13,10 +29,17 @@ def check_successful_tx(
     """See if transaction went through (Solidity code did not throw).
     :return: Transaction receipt and transaction info
     """
-    receipt = wait_for_transaction_receipt(web3=web3, txid=txid, timeout=timeout)
+    with phase("wait for receipts"):
+        receipt = wait_for_transaction_receipt(web3=web3, txid=txid, timeout=timeout)
     if receipt is None:
         raise RuntimeError("Could not obtain a transaction receipt.")
     txinfo = web3.eth.get_transaction(txid)
+    check_transaction_result(receipt, txinfo)
+    return receipt, txinfo
+
+
+def check_transaction_result(receipt: TxReceipt, txinfo: TxData) -> None:
+    """Raise if the receipt of a mined transaction indicates a failure"""
     if "status" not in receipt:
         raise KeyError(
             'A transaction receipt does not contain the "status" field. '
@@ -26,18 +49,368 @@ def check_successful_tx(
         raise ValueError("Status 0 indicates failure")
     if txinfo["gas"] == receipt["gasUsed"]:
         raise ValueError(f'Gas is completely used ({txinfo["gas"]}). Failure?')
-    return receipt, txinfo
 
 
 def wait_for_transaction_receipt(
     web3: Web3, txid: HexBytes, timeout: int = 180
 ) -> Optional[TxReceipt]:
     receipt = None
-    with Timeout(timeout) as time:
+    interval = POLL_INTERVAL
+    with Timeout(timeout) as timer:
         while not receipt or not receipt["blockNumber"]:  # pylint: disable=E1136
             try:
                 receipt = web3.eth.get_transaction_receipt(txid)
             except TransactionNotFound:
-                time.sleep(5)
+                timer.sleep(interval)
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
 
     return receipt
+
+
+class ReceiptTracker:
+    """Waits for the receipts of many transactions at once
+
+    `track()` returns a future for every transaction. A background thread
+    polls the block number and, whenever a block arrives, fetches the receipts
+    of all pending transactions in one JSON-RPC batch, followed by one batch for
+    the transactions of the new receipts. The futures resolve to the same
+    `(receipt, txinfo)` as `check_successful_tx()` and fail with the same
+    errors, or with TimeExhausted after `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        web3: Web3,
+        timeout: float = 180,
+        poll_interval: float = POLL_INTERVAL,
+        max_poll_interval: float = MAX_POLL_INTERVAL,
+    ) -> None:
+        self.web3 = web3
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+
+        self._lock = threading.Lock()
+        self._pending: Dict[HexBytes, Tuple["Future[Tuple[TxReceipt, TxData]]", float]] = {}
+        # Transactions which have not been looked up since they were tracked
+        self._unchecked: Set[HexBytes] = set()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, txid: HexBytes) -> "Future[Tuple[TxReceipt, TxData]]":
+        """Start waiting for the receipt of `txid`"""
+        txid = HexBytes(txid)
+        with self._lock:
+            if txid in self._pending:
+                return self._pending[txid][0]
+            future: "Future[Tuple[TxReceipt, TxData]]" = Future()
+            self._pending[txid] = (future, time.monotonic() + self.timeout)
+            self._unchecked.add(txid)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="ReceiptTracker", daemon=True
+                )
+                self._thread.start()
+        return future
+
+    def forget(self, txid: HexBytes) -> None:
+        """Stop waiting for `txid` and cancel its future"""
+        with self._lock:
+            entry = self._pending.pop(HexBytes(txid), None)
+            self._unchecked.discard(HexBytes(txid))
+        if entry is not None:
+            entry[0].cancel()
+
+    def wait(self, txids: Iterable[HexBytes]) -> List[Tuple[TxReceipt, TxData]]:
+        """Wait for all `txids` and return their results in order
+
+        Raises the error of the first failed transaction.
+        """
+        futures = [self.track(txid) for txid in txids]
+        with phase("wait for receipts"):
+            return [future.result() for future in futures]
+
+    def _run(self) -> None:
+        interval = self.poll_interval
+        last_block = None
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                has_unchecked = bool(self._unchecked)
+            try:
+                block_number = self.web3.eth.block_number
+                if block_number != last_block or has_unchecked:
+                    last_block = block_number
+                    self.poll()
+                    interval = self.poll_interval
+                else:
+                    interval = min(interval * 2, self.max_poll_interval)
+            except Exception:  # pylint: disable=broad-except
+                # Keep waiting, the node may be temporarily unavailable
+                LOG.exception("Polling transaction receipts failed")
+                interval = min(interval * 2, self.max_poll_interval)
+            self._expire()
+            time.sleep(interval)
+
+    def poll(self) -> None:
+        """Look up the receipts of all pending transactions once"""
+        with self._lock:
+            txids = list(self._pending)
+            self._unchecked.clear()
+        receipts = batch_request(
+            self.web3, [(RPC.eth_getTransactionReceipt, [txid.hex()]) for txid in txids]
+        )
+        mined = [
+            (txid, receipt)
+            for txid, receipt in zip(txids, receipts)
+            if receipt is not None and receipt["blockNumber"]
+        ]
+        txinfos = batch_request(
+            self.web3, [(RPC.eth_getTransactionByHash, [txid.hex()]) for txid, _ in mined]
+        )
+        for (txid, receipt), txinfo in zip(mined, txinfos):
+            with self._lock:
+                entry = self._pending.pop(txid, None)
+            if entry is None:
+                # Expired in the meantime
+                continue
+            future, _ = entry
+            try:
+                check_transaction_result(receipt, txinfo)
+            except (KeyError, ValueError) as ex:
+                future.set_exception(ex)
+            else:
+                future.set_result((receipt, txinfo))
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired = [txid for txid, (_, deadline) in self._pending.items() if deadline < now]
+            for txid in expired:
+                future, _ = self._pending.pop(txid)
+                future.set_exception(
+                    TimeExhausted(
+                        f"Transaction {txid.hex()} is not mined after {self.timeout} seconds"
+                    )
+                )
+
+
+# Resubmit a transaction if the node does not know it anymore after this many seconds
+RESUBMIT_AFTER = 60.0
+
+
+class _InFlight(NamedTuple):
+    transaction: TxParams
+    future: "Future[Tuple[TxReceipt, TxData]]"
+    submitted_at: float
+
+
+class TransactionPipeline:
+    """Sends the transactions of one account back-to-back and waits for them together
+
+    Nonces are assigned locally, so that a transaction can be sent before the
+    previous one is mined. While no transaction is in flight, the next nonce is
+    taken from the node again, so that other users of the account are noticed.
+
+    Transactions are sent with `web3.eth.send_transaction()`, so they are
+    signed by a signing middleware, if there is one for `sender`.
+
+    - If sending fails, the nonce is used for the next transaction, so that no
+      gap blocks the following transactions.
+    - If the node rejects a nonce as too low, the nonce is fetched again.
+      Transactions submitted with a given nonce are never moved to another one.
+    - If the node forgets a pending transaction, `wait()` sends it again.
+    """
+
+    def __init__(
+        self,
+        web3: Web3,
+        sender: ChecksumAddress,
+        timeout: float = 180,
+        resubmit_after: float = RESUBMIT_AFTER,
+        tracker: Optional[ReceiptTracker] = None,
+    ) -> None:
+        self.web3 = web3
+        self.sender = sender
+        self.resubmit_after = resubmit_after
+        self.tracker = tracker or ReceiptTracker(web3, timeout=timeout)
+
+        self._lock = threading.RLock()
+        self._next_nonce: Optional[Nonce] = None
+        # Nonces of transactions which could not be sent, to be used first
+        self._free_nonces: List[Nonce] = []
+        # Unresolved transactions sent by this pipeline
+        self._in_flight: Dict[HexBytes, _InFlight] = {}
+        self._futures: Dict[HexBytes, "Future[Tuple[TxReceipt, TxData]]"] = {}
+        # Hashes of resubmitted transactions which changed, by original hash
+        self._replaced: Dict[HexBytes, HexBytes] = {}
+
+    def submit(self, transaction: TxParams, nonce: Optional[Nonce] = None) -> HexBytes:
+        """Send `transaction` with the next nonce and return its hash without waiting
+
+        With `nonce`, the transaction is sent with exactly that nonce, e.g. because
+        addresses were predicted from it. If that fails, the error is raised
+        instead of trying another nonce.
+        """
+        with self._lock:
+            if nonce is not None:
+                return self._submit(transaction, nonce)
+            try:
+                return self._submit(transaction)
+            except ValueError as ex:
+                if not _is_nonce_too_low(ex):
+                    raise
+                LOG.info(f"Nonce was used outside of the pipeline ({ex}). Fetching nonce again.")
+                self._next_nonce = None
+                self._free_nonces.clear()
+                return self._submit(transaction)
+
+    def _submit(self, transaction: TxParams, nonce: Optional[Nonce] = None) -> HexBytes:
+        planned = nonce is not None
+        if nonce is None:
+            nonce = self._take_nonce()
+        transaction = transaction.copy()
+        transaction["from"] = self.sender
+        transaction["nonce"] = nonce
+        try:
+            with phase("sign and send transactions"):
+                txhash = HexBytes(self.web3.eth.send_transaction(transaction))
+        except Exception:
+            if not planned:
+                bisect.insort(self._free_nonces, nonce)
+            raise
+        if planned:
+            self._use_nonce(nonce)
+        self._track(txhash, transaction)
+        return txhash
+
+    def _track(self, txhash: HexBytes, transaction: TxParams) -> None:
+        future = self.tracker.track(txhash)
+        self._futures[txhash] = future
+        self._in_flight[txhash] = _InFlight(
+            transaction=transaction, future=future, submitted_at=time.monotonic()
+        )
+
+    def in_flight(self) -> List[HexBytes]:
+        """Hashes of the sent transactions which are not mined yet"""
+        with self._lock:
+            self._prune()
+            return list(self._in_flight)
+
+    def next_nonce(self) -> Nonce:
+        """The nonce the next submitted transaction will get
+
+        If nothing is in flight, the following transactions get consecutive nonces.
+        """
+        with self._lock:
+            self._sync_nonce()
+            assert self._next_nonce is not None
+            return self._free_nonces[0] if self._free_nonces else self._next_nonce
+
+    def _prune(self) -> None:
+        for txhash in [txhash for txhash, entry in self._in_flight.items() if entry.future.done()]:
+            del self._in_flight[txhash]
+
+    def _sync_nonce(self) -> None:
+        self._prune()
+        if not self._in_flight or self._next_nonce is None:
+            self._free_nonces.clear()
+            self._next_nonce = self.web3.eth.get_transaction_count(self.sender, "pending")
+
+    def _take_nonce(self) -> Nonce:
+        self._sync_nonce()
+        assert self._next_nonce is not None
+        if self._free_nonces:
+            return self._free_nonces.pop(0)
+        nonce = self._next_nonce
+        self._next_nonce = Nonce(nonce + 1)
+        return nonce
+
+    def _use_nonce(self, nonce: Nonce) -> None:
+        """Account for a transaction sent with a nonce chosen by the caller"""
+        self._sync_nonce()
+        assert self._next_nonce is not None
+        if nonce in self._free_nonces:
+            self._free_nonces.remove(nonce)
+        elif nonce >= self._next_nonce:
+            self._free_nonces.extend(Nonce(skipped) for skipped in range(self._next_nonce, nonce))
+            self._next_nonce = Nonce(nonce + 1)
+
+    def wait(self, txhashes: Sequence[HexBytes]) -> List[Tuple[TxReceipt, TxData]]:
+        """Wait for the given transactions and return their results in order
+
+        Raises the error of the first failed transaction, like `ReceiptTracker.wait()`.
+        """
+        with phase("wait for receipts"):
+            return self._wait(txhashes)
+
+    def _wait(self, txhashes: Sequence[HexBytes]) -> List[Tuple[TxReceipt, TxData]]:
+        pending = [self._current_hash(txhash) for txhash in txhashes]
+        while True:
+            futures = [self._future(txhash) for txhash in pending]
+            _, not_done = wait_futures(futures, timeout=self.resubmit_after)
+            if not not_done:
+                break
+            pending = [self._current_hash(txhash) for txhash in pending]
+            self._resubmit_dropped(
+                [txhash for txhash in pending if not self._future(txhash).done()]
+            )
+            pending = [self._current_hash(txhash) for txhash in pending]
+        return [self._future(txhash).result() for txhash in pending]
+
+    def _current_hash(self, txhash: HexBytes) -> HexBytes:
+        txhash = HexBytes(txhash)
+        with self._lock:
+            while txhash in self._replaced:
+                txhash = self._replaced[txhash]
+        return txhash
+
+    def _future(self, txhash: HexBytes) -> "Future[Tuple[TxReceipt, TxData]]":
+        with self._lock:
+            if txhash not in self._futures:
+                # Not sent through this pipeline, but waiting works all the same
+                self._futures[txhash] = self.tracker.track(txhash)
+            return self._futures[txhash]
+
+    def _resubmit_dropped(self, txhashes: List[HexBytes]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                txhash
+                for txhash in txhashes
+                if txhash in self._in_flight
+                and now - self._in_flight[txhash].submitted_at >= self.resubmit_after
+            ]
+        known = batch_request(
+            self.web3,
+            [(RPC.eth_getTransactionByHash, [txhash.hex()]) for txhash in candidates],
+        )
+        for txhash, txinfo in zip(candidates, known):
+            if txinfo is None:
+                self._resubmit(txhash)
+
+    def _resubmit(self, txhash: HexBytes) -> None:
+        with self._lock:
+            entry = self._in_flight[txhash]
+            LOG.info(f"Transaction {txhash.hex()} was dropped by the node. Sending it again.")
+            try:
+                new_txhash = HexBytes(self.web3.eth.send_transaction(entry.transaction))
+            except ValueError as ex:
+                # E.g. "already known" if the node received it again in the meantime
+                LOG.info(f"Resubmitting {txhash.hex()} failed: {ex}")
+                return
+            if new_txhash == txhash:
+                self._in_flight[txhash] = entry._replace(submitted_at=time.monotonic())
+                return
+            del self._in_flight[txhash]
+            self.tracker.forget(txhash)
+            self._replaced[txhash] = new_txhash
+            self._track(new_txhash, entry.transaction)
+
+
+def _is_nonce_too_low(ex: ValueError) -> bool:
+    message = str(
+        ex.args[0].get("message", "") if ex.args and isinstance(ex.args[0], dict) else ex
+    )
+    return "nonce" in message.lower() and "low" in message.lower()